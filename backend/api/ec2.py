@@ -10,6 +10,7 @@ from ..services.ec2_service import (
     batch_instance_action
 )
 from ..services.scaling_service import get_stack_info
+from ..services.aws_client import get_aws_api_metrics
 
 router = APIRouter(prefix="/ec2", tags=["EC2 Instance Control"])
 
@@ -206,3 +207,16 @@ async def reboot_all_instances_in_stack(stack_id: str) -> Dict[str, Any]:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error rebooting stack instances: {str(e)}")
 
+
+@router.get("/aws-api/metrics")
+async def aws_api_metrics() -> Dict[str, Any]:
+    """
+    AWS API call statistics for this backend process.
+    
+    Per (region, operation): call / error / throttle counts and latency
+    histogram, plus the current state of each region's adaptive rate limiter.
+    """
+    return {
+        "success": True,
+        **get_aws_api_metrics()
+    }
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
+from typing import Literal, Optional
 from ..services.terraform import deploy_aws_from_template
 from ..services.scaling_service import get_stack_info, list_active_stacks
 
@@ -17,6 +18,7 @@ class DeployReq(BaseModel):
     user_data_inline: str | None = None
     user_data_path: str | None = None
     auto_install_monitoring: bool = True
+    key_type: Optional[Literal["rsa", "ed25519"]] = None  # None = DEFAULT_KEY_TYPE
 
 @router.post("/deploy")
 def deploy(req: DeployReq):
@@ -26,6 +28,7 @@ def deploy(req: DeployReq):
     Per-instance keypairs will be created automatically:
     - <name_prefix>-vm-1, <name_prefix>-vm-2, etc.
     - Stored in: .infra/work/<stack_id>/private-key/
+    - key_type: "rsa" (RSA-2048) or "ed25519"
     
     Returns stack_id and instance details
     """
@@ -0,0 +1,83 @@
+"""
+Ingest API - Prometheus remote_write receiver
+
+Cấu hình trên stack (Prometheus / Grafana Agent):
+  remote_write:
+    - url: http://<backend>/ingest/<stack_id>/api/v1/write
+      authorization: {credentials: <REMOTE_WRITE_TOKEN>}   # bắt buộc
+"""
+
+import hmac
+from fastapi import APIRouter, HTTPException, Request, Response
+from typing import Optional
+from ..services.remote_write import decode_write_request, remote_write_store, RemoteWriteDecodeError
+from ..services.leader_election import scheduler_lease
+from ..core.config import settings
+
+router = APIRouter(prefix="/ingest", tags=["ingest"])
+
+
+def _check_token(request: Request):
+    token = settings.REMOTE_WRITE_TOKEN
+    if not token:
+        # Fail closed: pushed samples override Mimir and drive scaling decisions
+        raise HTTPException(status_code=403, detail="remote_write receiver requires REMOTE_WRITE_TOKEN to be set")
+    supplied = request.headers.get("authorization", "")
+    if supplied.lower().startswith("bearer "):
+        supplied = supplied[7:]
+    if not hmac.compare_digest(supplied.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid remote_write token")
+
+
+async def _receive(request: Request, stack_id: Optional[str]) -> Response:
+    if not settings.REMOTE_WRITE_ENABLED:
+        raise HTTPException(status_code=404, detail="remote_write receiver is disabled")
+    _check_token(request)
+    # Buffers live in the leader, which makes the scaling decisions
+    scheduler_lease.require_state()
+
+    body = await request.body()
+    if len(body) > settings.REMOTE_WRITE_MAX_BODY_BYTES:
+        raise HTTPException(status_code=413, detail="remote_write payload too large")
+
+    # Prometheus always snappy-compresses; allow raw protobuf for tooling / tests
+    compressed = request.headers.get("content-encoding", "snappy").lower() == "snappy"
+    try:
+        series = decode_write_request(body, compressed=compressed)
+    except RemoteWriteDecodeError as e:
+        # 400 tells Prometheus not to retry a malformed batch
+        raise HTTPException(status_code=400, detail=str(e))
+
+    remote_write_store.ingest(series, default_stack_id=stack_id)
+    return Response(status_code=204)
+
+
+@router.post("/api/v1/write")
+async def remote_write(request: Request):
+    """
+    remote_write endpoint; the stack is taken from each series' METRICS_STACK_LABEL label
+    (series are dropped while METRICS_STACK_LABEL is empty - use the per-stack endpoint).
+    """
+    return await _receive(request, None)
+
+
+@router.post("/{stack_id}/api/v1/write")
+async def remote_write_for_stack(stack_id: str, request: Request):
+    """
+    remote_write endpoint for one stack (used when series carry no stack label).
+    """
+    return await _receive(request, stack_id)
+
+
+@router.get("/stats")
+def ingest_stats():
+    """
+    Receiver counters, buffered series and seconds since each stack's last push
+    (of this worker; only the scheduler leader accepts pushes).
+    """
+    return {
+        "success": True,
+        "enabled": settings.REMOTE_WRITE_ENABLED,
+        "is_leader": scheduler_lease.is_leader or not settings.SCHEDULER_LEADER_ELECTION,
+        **remote_write_store.stats()
+    }
@@ -1,9 +1,37 @@
-from fastapi import APIRouter, HTTPException
+import math
+import time
+import numpy as np
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Literal, Optional
-from ..services.scaling_service import get_stack_info, list_active_stacks, scale_stack
-from ..services.metrics_service import get_stack_metrics, query_custom_metric
+from typing import Literal, Optional, List, Dict, Any
+from ..services.scaling_service import (
+    get_stack_info,
+    list_active_stacks,
+    scale_stack,
+    update_stack_metadata,
+    ScalingInProgressError
+)
+from ..services.scaling_policy import normalize_policy, policy_from_metadata, default_policy
+from ..services.scaling_guard import scaling_guard, ScalingCooldownError
+from ..services.scaling_schedule import normalize_schedules, normalize_seasonality, capacity_floor, cron_trigger
+from ..services.scaling_cadence import normalize_cadence, cadence_planner
+from ..services.scheduler import sync_schedule_jobs, scheduler_status
+from ..services.leader_election import scheduler_lease
+from ..services.metrics_service import (
+    get_stack_metrics,
+    query_custom_metric,
+    normalize_range,
+    query_custom_range,
+    stream_range_result
+)
 from ..services.ai_advisor import analyze_and_recommend
+from ..services.metrics_cache import metrics_cache, range_cache
+from ..services.metrics_history import metrics_history
+from ..services.metrics_archive import metrics_archive
+from ..services.recommendation_cache import recommendation_cache
+from ..services.advisor_client import llm_advisor
 from ..core.config import settings
 
 router = APIRouter(prefix="/scaling", tags=["scaling"])
@@ -13,6 +41,7 @@ class ScaleRequest(BaseModel):
     stack_id: str
     target_count: int = Field(ge=1, le=20, description="Target number of EC2 instances")
     reason: Optional[str] = Field(None, description="Reason for scaling")
+    force: bool = Field(False, description="Ignore the stack's scaling cooldown")
 
 
 class MetricsQueryRequest(BaseModel):
@@ -20,6 +49,71 @@ class MetricsQueryRequest(BaseModel):
     promql_query: str = Field(..., description="PromQL query to execute")
 
 
+class MetricsRangeQueryRequest(BaseModel):
+    stack_id: str
+    promql_query: str = Field(..., description="PromQL query to execute")
+    start: float = Field(..., description="Range start (unix seconds)")
+    end: float = Field(..., description="Range end (unix seconds)")
+    step: float = Field(60, gt=0, description="Resolution step in seconds")
+
+
+class ScalingStep(BaseModel):
+    lower: Optional[float] = Field(None, description="Band applies when metric >= lower")
+    upper: Optional[float] = Field(None, description="Band applies when metric < upper")
+    adjustment: int = Field(..., description="Instances to add (negative to remove)")
+
+
+class ScalingRule(BaseModel):
+    type: Literal["target_tracking", "step"]
+    metric: str = Field(..., description="Metric name, e.g. avg_cpu_percent, max_memory_percent")
+    target: Optional[float] = Field(None, description="Target value (target_tracking)")
+    tolerance: Optional[float] = Field(None, ge=0, lt=1, description="No change within target +- tolerance (target_tracking)")
+    steps: Optional[List[ScalingStep]] = Field(None, description="Bands (step)")
+
+
+class ScalingCooldown(BaseModel):
+    scale_up_sec: Optional[float] = Field(None, ge=0, description="Wait after the last scaling before scaling up")
+    scale_down_sec: Optional[float] = Field(None, ge=0, description="Wait after the last scaling before scaling down")
+
+
+class ScalingStabilization(BaseModel):
+    scale_up_samples: Optional[int] = Field(None, ge=1, description="Consecutive evaluations required to scale up")
+    scale_down_samples: Optional[int] = Field(None, ge=1, description="Consecutive evaluations required to scale down")
+
+
+class ScalingPolicyRequest(BaseModel):
+    min_instances: int = Field(1, ge=1, description="Lower bound for this stack")
+    max_instances: int = Field(20, ge=1, description="Upper bound for this stack")
+    combine: Literal["max", "min"] = Field("max", description="How rule votes are combined")
+    cooldown: Optional[ScalingCooldown] = None
+    stabilization: Optional[ScalingStabilization] = None
+    rules: List[ScalingRule] = Field(..., min_length=1)
+
+
+class CapacitySchedule(BaseModel):
+    name: str = Field(..., description="Unique name within the stack")
+    cron: str = Field(..., description="Crontab expression for the window start, e.g. '30 7 * * mon-fri'")
+    duration_minutes: int = Field(..., ge=1, le=10080, description="Window length")
+    timezone: Optional[str] = Field(None, description="IANA time zone (default SCHEDULE_DEFAULT_TIMEZONE)")
+    min_instances: int = Field(..., ge=1, description="Minimum capacity during the window")
+
+
+class EvaluationCadenceRequest(BaseModel):
+    min_interval_sec: Optional[float] = Field(None, ge=1, le=86400, description="Shortest interval between evaluations")
+    max_interval_sec: Optional[float] = Field(None, ge=1, le=86400, description="Longest interval between evaluations")
+    interval_sec: Optional[float] = Field(None, ge=1, le=86400, description="Fixed interval (disables adaptation)")
+
+
+class SeasonalityConfig(BaseModel):
+    enabled: bool = False
+    lead_minutes: Optional[int] = Field(None, ge=0, le=1440, description="Pre-scale this long before the predicted peak")
+
+
+class CapacitySchedulesRequest(BaseModel):
+    schedules: List[CapacitySchedule] = Field(default_factory=list)
+    seasonality: Optional[SeasonalityConfig] = None
+
+
 @router.get("/stacks")
 def list_stacks():
     """
@@ -93,6 +187,143 @@ def get_metrics(stack_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/stack/{stack_id}/metrics/recent")
+def get_recent_metrics(stack_id: str,
+                       window_sec: Optional[float] = Query(None, gt=0),
+                       metrics: Optional[str] = None,
+                       include_points: bool = True):
+    """
+    Recent metric history of a stack from the in-process ring buffers
+    (from the metrics archive's raw tier on scheduler standby workers).
+    
+    Args:
+        stack_id: Stack identifier
+        window_sec: Only points from the last window_sec seconds (default: whole buffer)
+        metrics: Comma-separated metric names (default: all)
+        include_points: Include raw [timestamp, value] pairs
+    
+    Returns:
+        Per-metric window stats (mean, min, max, p50/p90/p95, ewma, rate_per_min)
+    """
+    names = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else None
+    if settings.SCHEDULER_LEADER_ELECTION and not scheduler_lease.is_leader:
+        if not settings.METRICS_ARCHIVE_ENABLED:
+            scheduler_lease.require_state()
+        snapshot, source = _archive_snapshot(stack_id, window_sec, names, include_points), "archive"
+    else:
+        snapshot, source = metrics_history.snapshot(stack_id, window_sec, names, include_points), "buffers"
+    return {
+        "success": True,
+        "stack_id": stack_id,
+        "window_sec": window_sec,
+        "collect_interval_sec": settings.METRICS_COLLECT_INTERVAL_SEC,
+        "source": source,
+        "metrics": snapshot,
+        "history": metrics_history.stats()
+    }
+
+
+def _archive_snapshot(stack_id: str,
+                      window_sec: Optional[float],
+                      metrics: Optional[List[str]],
+                      include_points: bool) -> Dict[str, Any]:
+    """
+    metrics_history.snapshot() computed from the archive's raw samples (the
+    leader's collector writes them); no window means the span the buffers hold
+    """
+    end = time.time()
+    start = end - (window_sec or metrics_history.capacity * settings.METRICS_COLLECT_INTERVAL_SEC)
+    result = {}
+    for metric in metrics or metrics_archive.metrics_for(stack_id):
+        points = metrics_archive.query(stack_id, metric, start, end, "raw")["points"]
+        ts = np.array([p[0] for p in points], dtype=float)
+        values = np.array([p[1] for p in points], dtype=float)
+        summary = metrics_history.summarize(ts, values)
+        if include_points:
+            summary["series"] = np.column_stack((ts, values)).tolist()
+        result[metric] = summary
+    return result
+
+
+@router.get("/stack/{stack_id}/history")
+def get_metrics_history(stack_id: str,
+                        metric: str = "avg_cpu_percent",
+                        start: Optional[float] = None,
+                        end: Optional[float] = None,
+                        resolution: Literal["auto", "raw", "1m", "1h"] = "auto"):
+    """
+    Long-term metric history from the on-disk archive (works after the stack is destroyed).
+    
+    Args:
+        stack_id: Stack identifier
+        metric: Metric name, e.g. avg_cpu_percent, max_memory_percent, instance_count
+        start: Unix seconds (default: end - 24h)
+        end: Unix seconds (default: now)
+        resolution: auto picks the finest tier covering the range
+    
+    Returns:
+        Points as [ts, avg, min, max, count]
+    """
+    end = time.time() if end is None else end
+    start = end - 86400 if start is None else start
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    
+    try:
+        result = metrics_archive.query(stack_id, metric, start, end, resolution)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {
+        "success": True,
+        "stack_id": stack_id,
+        "metric": metric,
+        "start": start,
+        "end": end,
+        "available_metrics": metrics_archive.metrics_for(stack_id),
+        **result
+    }
+
+
+@router.get("/advisor/status")
+def get_advisor_status(audit_limit: int = Query(50, ge=0, le=500)):
+    """
+    LLM advisor health: latency budget, circuit breaker state, outcome counters
+    and the audit log of LLM answers that arrived after the budget.
+    """
+    return {
+        "success": True,
+        "mode": settings.ADVISOR_MODE,
+        **llm_advisor.status(audit_limit)
+    }
+
+
+@router.get("/scheduler/status")
+def get_scheduler_status():
+    """
+    Background jobs: next run time, lag and duration of the last run, and the
+    scale operations currently queued or running. Only the scheduler leader
+    runs jobs; "leader" tells whether the answering worker holds the lease.
+    """
+    return {
+        "success": True,
+        **scheduler_status()
+    }
+
+
+@router.get("/metrics/cache")
+def get_metrics_cache_stats():
+    """
+    Shared cache statistics: metrics, range queries and LLM recommendations.
+    """
+    return {
+        "success": True,
+        "cache": metrics_cache.stats(),
+        "range_cache": range_cache.stats(),
+        "recommendation_cache": recommendation_cache.stats()
+    }
+
+
 @router.post("/stack/metrics/query")
 def query_metrics(req: MetricsQueryRequest):
     """
@@ -111,6 +342,242 @@ def query_metrics(req: MetricsQueryRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/stack/metrics/query_range")
+def query_metrics_range(req: MetricsRangeQueryRequest):
+    """
+    Execute a PromQL range query against stack's Mimir instance.
+    
+    The range is aligned to the step grid and limited to MIMIR_RANGE_MAX_POINTS
+    points per series. Matrix results are decoded into compact arrays, cached,
+    and streamed back one series at a time.
+    
+    Returns:
+        {"status", "cache", "start", "end", "step", "truncated", "series": [{"metric", "timestamps", "values"}]}
+    """
+    try:
+        start, end, step = normalize_range(req.start, req.end, req.step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        result, cache_status = query_custom_range(req.stack_id, req.promql_query, start, end, step)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    if result.get("status") != "success":
+        status_code = 400 if result.get("errorType") in ("bad_data", "execution") else 502
+        raise HTTPException(status_code=status_code, detail=result.get("error", "Range query failed"))
+    
+    meta = {
+        "stack_id": req.stack_id,
+        "query": req.promql_query,
+        "start": start,
+        "end": end,
+        "step": step,
+        "cache": cache_status
+    }
+    return StreamingResponse(stream_range_result(result, meta), media_type="application/json")
+
+
+@router.get("/stack/{stack_id}/policy")
+def get_scaling_policy(stack_id: str):
+    """
+    Get the effective scaling policy of a stack.
+    
+    Stacks without a stored policy use the default one (CPU / memory target tracking).
+    """
+    try:
+        metadata = get_stack_info(stack_id)["metadata"]
+        return {
+            "success": True,
+            "stack_id": stack_id,
+            "is_default": not metadata.get("scaling_policy"),
+            "policy": policy_from_metadata(metadata)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/stack/{stack_id}/policy")
+def put_scaling_policy(stack_id: str, req: ScalingPolicyRequest):
+    """
+    Store a declarative scaling policy in the stack's metadata.
+    
+    Args:
+        stack_id: Stack identifier
+        req: Bounds, combine mode and target-tracking / step rules
+    
+    Returns:
+        The normalized policy
+    """
+    try:
+        policy = normalize_policy(req.model_dump(exclude_none=True))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def store(metadata):
+        metadata["scaling_policy"] = policy
+    
+    try:
+        update_stack_metadata(stack_id, store)
+        return {"success": True, "stack_id": stack_id, "policy": policy}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/stack/{stack_id}/policy")
+def delete_scaling_policy(stack_id: str):
+    """
+    Remove a stack's policy so the default one applies again.
+    """
+    try:
+        update_stack_metadata(stack_id, lambda metadata: metadata.pop("scaling_policy", None))
+        return {"success": True, "stack_id": stack_id, "policy": default_policy()}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stack/{stack_id}/schedules")
+def get_capacity_schedules(stack_id: str):
+    """
+    Capacity schedules, seasonality settings and the minimum capacity in force now.
+    """
+    try:
+        metadata = get_stack_info(stack_id)["metadata"]
+        schedules = normalize_schedules(metadata.get("scaling_schedules") or [])
+        now = time.time()
+        for schedule in schedules:
+            next_fire = cron_trigger(schedule).get_next_fire_time(None, datetime.fromtimestamp(now, timezone.utc))
+            schedule["next_start"] = next_fire.isoformat() if next_fire else None
+        return {
+            "success": True,
+            "stack_id": stack_id,
+            "schedules": schedules,
+            "seasonality": normalize_seasonality(metadata.get("seasonality")),
+            "seasonal_floor": metadata.get("seasonal_floor"),
+            "capacity_floor": capacity_floor(metadata, now)
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/stack/{stack_id}/schedules")
+def put_capacity_schedules(stack_id: str, req: CapacitySchedulesRequest):
+    """
+    Replace the stack's capacity schedules (and seasonality settings) and
+    re-register the scheduler's cron jobs.
+    """
+    try:
+        schedules = normalize_schedules([item.model_dump(exclude_none=True) for item in req.schedules])
+        seasonality = normalize_seasonality(req.seasonality.model_dump(exclude_none=True) if req.seasonality else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def store(metadata):
+        metadata["scaling_schedules"] = schedules
+        metadata["seasonality"] = seasonality
+        if not seasonality["enabled"]:
+            metadata.pop("seasonal_floor", None)
+    
+    try:
+        update_stack_metadata(stack_id, store)
+        sync_schedule_jobs()
+        return {"success": True, "stack_id": stack_id, "schedules": schedules, "seasonality": seasonality}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stack/{stack_id}/cadence")
+def get_evaluation_cadence(stack_id: str):
+    """
+    Auto-scaling evaluation cadence of a stack: stored override, effective
+    bounds and the next evaluation planned by the scheduler.
+    """
+    try:
+        metadata = get_stack_info(stack_id)["metadata"]
+        override = metadata.get("evaluation_cadence")
+        plan = cadence_planner.plan(stack_id)
+        if plan:
+            plan["due_in_sec"] = round(plan["next_due"] - time.time(), 1)
+        return {
+            "success": True,
+            "stack_id": stack_id,
+            "adaptive": settings.AUTO_SCALING_ADAPTIVE_CADENCE,
+            "override": override,
+            "cadence": normalize_cadence(override),
+            "plan": plan
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.put("/stack/{stack_id}/cadence")
+def put_evaluation_cadence(stack_id: str, req: EvaluationCadenceRequest):
+    """
+    Store a per-stack cadence override; omitted fields keep following the
+    global AUTO_SCALING_MIN / MAX_INTERVAL_SEC settings.
+    """
+    override = req.model_dump(exclude_none=True)
+    try:
+        cadence = normalize_cadence(override)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def store(metadata):
+        metadata["evaluation_cadence"] = override
+    
+    try:
+        update_stack_metadata(stack_id, store)
+        return {"success": True, "stack_id": stack_id, "override": override, "cadence": cadence}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.delete("/stack/{stack_id}/cadence")
+def delete_evaluation_cadence(stack_id: str):
+    """
+    Remove a stack's cadence override so the global settings apply again.
+    """
+    try:
+        update_stack_metadata(stack_id, lambda metadata: metadata.pop("evaluation_cadence", None))
+        return {"success": True, "stack_id": stack_id, "cadence": normalize_cadence(None)}
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/stack/{stack_id}/decisions")
+def get_suppressed_decisions(stack_id: str, limit: int = Query(50, ge=1, le=500)):
+    """
+    Recent auto-scaling decisions suppressed by confidence, stabilization or cooldown
+    (as last saved by the leader when served by a scheduler standby).
+    """
+    if settings.SCHEDULER_LEADER_ELECTION and not scheduler_lease.is_leader:
+        suppressed = scaling_guard.saved_suppressed(stack_id, limit)
+    else:
+        suppressed = scaling_guard.suppressed(stack_id, limit)
+    return {
+        "success": True,
+        "stack_id": stack_id,
+        "suppressed": suppressed
+    }
+
+
 @router.post("/stack/scale")
 def scale(req: ScaleRequest):
     """
@@ -134,7 +601,8 @@ def scale(req: ScaleRequest):
         result = scale_stack(
             stack_id=req.stack_id,
             target_count=req.target_count,
-            reason=req.reason or "Manual scaling via API"
+            reason=req.reason or "Manual scaling via API",
+            force=req.force
         )
         
         if not result.get("success"):
@@ -150,8 +618,18 @@ def scale(req: ScaleRequest):
                 }
             )
         
+        # Samples in the stabilization window refer to the old count
+        scaling_guard.record_scaled(req.stack_id)
         return result
     
+    except ScalingInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ScalingCooldownError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -201,8 +679,9 @@ def auto_scale(stack_id: str, confidence_threshold: Optional[float] = None):
     
     This combines:
     1. Get AI recommendation
-    2. If confidence > threshold AND action != no_change: execute scaling
-    3. Return recommendation and scaling result (if executed)
+    2. If confidence > threshold AND action != no_change AND the stack's
+       stabilization window / cooldown allow it: execute scaling
+    3. Return recommendation, guard decision and scaling result (if executed)
     
     Args:
         stack_id: Stack identifier
@@ -211,6 +690,7 @@ def auto_scale(stack_id: str, confidence_threshold: Optional[float] = None):
     Returns:
         Recommendation and scaling result if executed
     """
+    scheduler_lease.require_state()
     if confidence_threshold is None:
         confidence_threshold = settings.AUTO_SCALING_CONFIDENCE_THRESHOLD
     
@@ -227,28 +707,34 @@ def auto_scale(stack_id: str, confidence_threshold: Optional[float] = None):
             }
         
         recommendation = result["recommendation"]
-        action = recommendation["action"]
-        confidence = recommendation["confidence"]
-        target_count = recommendation["target_count"]
         
-        # Check if we should execute
-        should_execute = (
-            action != "no_change" and
-            confidence >= confidence_threshold
+        # Confidence, stabilization window and cooldown
+        decision = scaling_guard.review(
+            stack_id,
+            result["current_count"],
+            recommendation,
+            result["policy"],
+            result["last_scaled_ts"],
+            min_confidence=confidence_threshold
         )
+        # Standby workers answer /decisions from the saved log
+        scaling_guard.save()
         
-        if should_execute:
+        if decision["execute"]:
             # Execute scaling
             scale_result = scale_stack(
                 stack_id=stack_id,
-                target_count=target_count,
+                target_count=decision["target_count"],
                 reason=f"AI Auto-scale: {recommendation['reason']}"
             )
+            if scale_result.get("success"):
+                scaling_guard.record_scaled(stack_id)
             
             return {
                 "success": True,
                 "executed": True,
                 "recommendation": recommendation,
+                "decision": decision,
                 "scaling_result": scale_result,
                 **result
             }
@@ -256,11 +742,20 @@ def auto_scale(stack_id: str, confidence_threshold: Optional[float] = None):
             return {
                 "success": True,
                 "executed": False,
-                "reason": f"Confidence {confidence:.2f} below threshold {confidence_threshold:.2f}" if confidence < confidence_threshold else "No scaling needed",
+                "reason": decision["reason"],
                 "recommendation": recommendation,
+                "decision": decision,
                 **result
             }
     
+    except ScalingInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ScalingCooldownError as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -63,6 +63,7 @@ def connect_terminal(req: TerminalConnectRequest):
             raise HTTPException(status_code=404, detail="Stack not found")
         
         name_prefix = stack_info["metadata"]["context"]["name_prefix"]
+        key_type = stack_info["metadata"]["context"].get("key_type")
         region = stack_info["region"]
         
         # Get instance public IP
@@ -96,7 +97,8 @@ def connect_terminal(req: TerminalConnectRequest):
             session_id=session_id,
             hostname=public_ip,
             username=req.username,
-            private_key_path=keypair_info["pem_path"]
+            private_key_path=keypair_info["pem_path"],
+            key_type=key_type
         )
         
         if not result.get("success"):
@@ -1,4 +1,5 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from uuid import uuid4
@@ -10,7 +11,14 @@ from backend.api.sdwan import router as sdwan_router
 from backend.api.scaling import router as scaling_router
 from backend.api.ec2 import router as ec2_router
 from backend.api.terminal import router as terminal_router
+from backend.api.ingest import router as ingest_router
 from backend.services.scheduler import start_scheduler, stop_scheduler
+from backend.services.leader_election import NotLeaderError
+from backend.services.keypair_manager import shutdown_keygen_pool
+from backend.services.keypair_reservoir import keypair_reservoir
+from backend.services.metrics_service import close_sessions
+from backend.services.metrics_archive import metrics_archive
+from backend.core import telemetry
 
 app = FastAPI(
     title="Hybrid Cloud Infrastructure API",
@@ -24,23 +32,50 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(telemetry.http_metrics_middleware)
+
+
+@app.exception_handler(NotLeaderError)
+async def not_leader_handler(request, exc: NotLeaderError):
+    """Standby worker: ask the client to retry on a new connection (may reach the leader)"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": {"error": "not_leader", "message": str(exc), "leader": exc.holder}},
+        headers={"Retry-After": "1", "Connection": "close"}
+    )
+
+
 app.include_router(elb_router)
 app.include_router(sdwan_router)
 app.include_router(scaling_router)
 app.include_router(ec2_router)
 app.include_router(terminal_router)
+app.include_router(ingest_router)
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize scheduler on application startup"""
+    """Initialize scheduler and keypair reservoir on application startup"""
     start_scheduler()
+    keypair_reservoir.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Gracefully shutdown scheduler on application shutdown"""
     stop_scheduler()
+    keypair_reservoir.stop()
+    shutdown_keygen_pool()
+    close_sessions()
+    metrics_archive.close()
+    telemetry.mark_process_dead()
+
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Prometheus exposition of control plane telemetry"""
+    return Response(content=telemetry.render_metrics(), media_type=telemetry.CONTENT_TYPE)
+
 ROOT = Path(__file__).parent.resolve()
 TEMPLATES_DIR = ROOT / "templates"
 SCRIPTS_DIR = ROOT / "scripts"
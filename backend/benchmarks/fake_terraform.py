@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Fake Terraform binary cho benchmark offline
+
+Trỏ TF_BIN vào file này để chạy control plane mà không cần Terraform / AWS thật.
+Hỗ trợ: init, apply, output -json, destroy, version.
+
+Đọc main.tf (render từ main.tf.j2) trong thư mục hiện tại để lấy region,
+instance_count, ami, instance_type và ghi terraform.tfstate giả lập.
+
+Biến môi trường:
+  FAKE_TF_INIT_SEC                 Thời gian init (mặc định 0.2)
+  FAKE_TF_APPLY_SEC                Thời gian apply cơ bản (mặc định 1.0)
+  FAKE_TF_APPLY_PER_INSTANCE_SEC   Thêm cho mỗi instance tạo/xóa (mặc định 0.05)
+  FAKE_TF_OUTPUT_SEC               Thời gian output (mặc định 0.05)
+  FAKE_TF_DESTROY_SEC              Thời gian destroy (mặc định 0.5)
+  FAKE_TF_JITTER                   Dao động ngẫu nhiên, tỉ lệ (mặc định 0.1)
+  FAKE_TF_FAIL                     Danh sách subcommand trả về lỗi, vd "apply,destroy"
+  FAKE_TF_USE_AWS                  "1" = tạo/xóa instances thật trên AWS_ENDPOINT_URL (moto)
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+from pathlib import Path
+
+STATE_FILE = "terraform.tfstate"
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _sleep(base_sec: float):
+    jitter = _env_float("FAKE_TF_JITTER", 0.1)
+    if base_sec > 0:
+        time.sleep(max(0.0, base_sec * random.uniform(1 - jitter, 1 + jitter)))
+
+
+def _parse_main_tf(cwd: Path) -> dict:
+    text = (cwd / "main.tf").read_text(encoding="utf-8")
+
+    def find(pattern: str, default=None):
+        match = re.search(pattern, text, re.S)
+        return match.group(1) if match else default
+
+    return {
+        "region": find(r'provider "aws"\s*\{\s*region\s*=\s*"([^"]+)"', "ap-southeast-2"),
+        "instance_count": int(find(r'resource "aws_instance" "bpp_instance"\s*\{\s*count\s*=\s*(\d+)', "0")),
+        "ami": find(r'resource "aws_instance".*?ami\s*=\s*"([^"]+)"', "ami-12c6146b"),
+        "instance_type": find(r'resource "aws_instance".*?instance_type\s*=\s*"([^"]+)"', "t3.micro"),
+        "name_prefix": find(r'aws_vpc" "bpp_vpc".*?Name = "([^"]+)-vpc"', "fake"),
+    }
+
+
+def _load_state(cwd: Path) -> dict:
+    path = cwd / STATE_FILE
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return {"version": 4, "terraform_version": "0.0.0-fake", "serial": 0, "outputs": {}, "resources": []}
+
+
+def _save_state(cwd: Path, state: dict):
+    state["serial"] = state.get("serial", 0) + 1
+    tmp = cwd / f"{STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state, indent=2), encoding="utf-8")
+    tmp.replace(cwd / STATE_FILE)
+
+
+def _fake_instance(name_prefix: str, index: int) -> dict:
+    digest = hashlib.sha1(f"{name_prefix}-{index}-{time.time_ns()}".encode()).hexdigest()
+    ip = f"203.0.{int(digest[:2], 16)}.{int(digest[2:4], 16) or 1}"
+    return {
+        "id": f"i-{digest[:17]}",
+        "public_ip": ip,
+        "public_dns": f"ec2-{ip.replace('.', '-')}.compute.amazonaws.com",
+    }
+
+
+def _ec2_client(region: str):
+    import boto3
+    return boto3.client("ec2", region_name=region, endpoint_url=os.getenv("AWS_ENDPOINT_URL"))
+
+
+def _reconcile_instances(config: dict, current: list) -> list:
+    """
+    Grow / shrink the instance list to instance_count (LIFO like Terraform's count)
+    """
+    target = config["instance_count"]
+    instances = list(current)
+    use_aws = os.getenv("FAKE_TF_USE_AWS") == "1"
+
+    if len(instances) > target:
+        removed = instances[target:]
+        instances = instances[:target]
+        if use_aws and removed:
+            _ec2_client(config["region"]).terminate_instances(InstanceIds=[i["id"] for i in removed])
+
+    missing = target - len(instances)
+    if missing > 0:
+        if use_aws:
+            response = _ec2_client(config["region"]).run_instances(
+                ImageId=config["ami"],
+                InstanceType=config["instance_type"],
+                MinCount=missing,
+                MaxCount=missing,
+            )
+            for instance in response["Instances"]:
+                ip = instance.get("PublicIpAddress") or instance.get("PrivateIpAddress", "")
+                instances.append({
+                    "id": instance["InstanceId"],
+                    "public_ip": ip,
+                    "public_dns": instance.get("PublicDnsName") or instance.get("PrivateDnsName", ""),
+                })
+        else:
+            for i in range(len(instances), target):
+                instances.append(_fake_instance(config["name_prefix"], i + 1))
+
+    return instances
+
+
+def _outputs(config: dict, instances: list) -> dict:
+    def output(value, type_):
+        return {"sensitive": False, "type": type_, "value": value}
+
+    return {
+        "instance_ids": output([i["id"] for i in instances], ["tuple", ["string"] * len(instances)]),
+        "instance_public_ip": output([i["public_ip"] for i in instances], ["tuple", ["string"] * len(instances)]),
+        "instance_dns": output([i["public_dns"] for i in instances], ["tuple", ["string"] * len(instances)]),
+        "nlb_dns_name": output(f"{config['name_prefix']}-nlb-fake.elb.{config['region']}.amazonaws.com", "string"),
+    }
+
+
+def cmd_apply(cwd: Path) -> int:
+    config = _parse_main_tf(cwd)
+    state = _load_state(cwd)
+    current = state.get("resources", [{}])[0].get("instances", []) if state.get("resources") else []
+    current = [i["attributes"] for i in current]
+
+    changed = abs(config["instance_count"] - len(current))
+    _sleep(_env_float("FAKE_TF_APPLY_SEC", 1.0) + changed * _env_float("FAKE_TF_APPLY_PER_INSTANCE_SEC", 0.05))
+
+    instances = _reconcile_instances(config, current)
+    state["resources"] = [{
+        "mode": "managed",
+        "type": "aws_instance",
+        "name": "bpp_instance",
+        "instances": [{"index_key": i, "attributes": attrs} for i, attrs in enumerate(instances)],
+    }]
+    state["outputs"] = _outputs(config, instances)
+    _save_state(cwd, state)
+
+    print(f"Apply complete! Resources: {changed} changed.")
+    return 0
+
+
+def cmd_output(cwd: Path) -> int:
+    _sleep(_env_float("FAKE_TF_OUTPUT_SEC", 0.05))
+    print(json.dumps(_load_state(cwd).get("outputs", {})))
+    return 0
+
+
+def cmd_destroy(cwd: Path) -> int:
+    state = _load_state(cwd)
+    resources = state.get("resources") or [{}]
+    instances = [i["attributes"] for i in resources[0].get("instances", [])]
+
+    _sleep(_env_float("FAKE_TF_DESTROY_SEC", 0.5))
+    if instances and os.getenv("FAKE_TF_USE_AWS") == "1":
+        config = _parse_main_tf(cwd)
+        _ec2_client(config["region"]).terminate_instances(InstanceIds=[i["id"] for i in instances])
+
+    state["resources"] = []
+    state["outputs"] = {}
+    _save_state(cwd, state)
+    print(f"Destroy complete! Resources: {len(instances)} destroyed.")
+    return 0
+
+
+def main(argv: list) -> int:
+    if not argv:
+        print("Usage: fake_terraform.py <init|apply|output|destroy|version> [args]", file=sys.stderr)
+        return 1
+
+    subcommand = argv[0]
+    failing = {s.strip() for s in os.getenv("FAKE_TF_FAIL", "").split(",") if s.strip()}
+    if subcommand in failing:
+        print(f"Error: simulated failure of terraform {subcommand}", file=sys.stderr)
+        return 1
+
+    cwd = Path.cwd()
+    if subcommand == "init":
+        _sleep(_env_float("FAKE_TF_INIT_SEC", 0.2))
+        print("Terraform has been successfully initialized!")
+        return 0
+    if subcommand == "apply":
+        return cmd_apply(cwd)
+    if subcommand == "output":
+        return cmd_output(cwd)
+    if subcommand == "destroy":
+        return cmd_destroy(cwd)
+    if subcommand == "version":
+        print("Terraform v0.0.0-fake")
+        return 0
+
+    print(f"fake terraform: '{subcommand}' ignored")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
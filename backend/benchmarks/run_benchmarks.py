@@ -0,0 +1,304 @@
+"""
+Benchmark control plane offline: fake Terraform + moto-backed AWS
+
+Chạy các kịch bản deploy / scale / list / instance-action với N stacks x M
+instances mà không cần AWS hay Terraform thật:
+- TF_BIN trỏ vào benchmarks/fake_terraform.py (thời gian apply giả lập)
+- keypair_manager / ec2_service gọi vào moto server chạy local (AWS_ENDPOINT_URL)
+
+Usage:
+    pip install -r backend/requirements.txt -r backend/benchmarks/requirements.txt
+    python -m backend.benchmarks.run_benchmarks --stacks 5 --instances 10
+    python -m backend.benchmarks.run_benchmarks --stacks 20 --instances 5 \\
+        --output bench.json --baseline previous.json --max-regression 0.25
+
+Exit code 1 nếu có kịch bản bị regression so với baseline (p99 hoặc throughput).
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional
+
+FAKE_TERRAFORM = Path(__file__).resolve().with_name("fake_terraform.py")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Percentile with linear interpolation (q in [0, 100])
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples: List[Dict[str, Any]], wall_sec: float) -> Dict[str, Any]:
+    latencies = [s["latency"] for s in samples]
+    errors = [s for s in samples if not s["ok"]]
+    return {
+        "count": len(samples),
+        "errors": len(errors),
+        "p50_sec": round(percentile(latencies, 50), 4),
+        "p90_sec": round(percentile(latencies, 90), 4),
+        "p99_sec": round(percentile(latencies, 99), 4),
+        "mean_sec": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        "max_sec": round(max(latencies), 4) if latencies else 0.0,
+        "wall_sec": round(wall_sec, 4),
+        "throughput_ops_per_sec": round(len(samples) / wall_sec, 3) if wall_sec > 0 else 0.0,
+        "sample_errors": [e["error"] for e in errors[:3]],
+    }
+
+
+def run_scenario(tasks: List[Callable[[], Any]], concurrency: int) -> Dict[str, Any]:
+    """
+    Run tasks on a thread pool; each task returns truthy on success.
+    """
+    def timed(task):
+        start = time.perf_counter()
+        try:
+            ok = bool(task())
+            error = None if ok else "operation reported failure"
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {e}"
+        return {"latency": time.perf_counter() - start, "ok": ok, "error": error}
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        samples = list(executor.map(timed, tasks))
+    return summarize(samples, time.perf_counter() - start)
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def prepare_environment(args, work_root: Path, endpoint_url: str):
+    """
+    Point backend settings at the fake Terraform and moto.
+    Must run before any backend module is imported (settings are read at import).
+    """
+    FAKE_TERRAFORM.chmod(0o755)
+    os.environ.update({
+        "TF_BIN": str(FAKE_TERRAFORM),
+        "TF_WORK_ROOT": str(work_root / "work"),
+        "KEYPAIR_POOL_DIR": str(work_root / "keypool"),
+        "KEYPAIR_POOL_SIZE": str(args.keypair_pool),
+        "KEYPAIR_POOL_SECRET_FILE": str(work_root / "keypool.key"),
+        "DEFAULT_KEY_TYPE": args.key_type,
+        "AWS_ENDPOINT_URL": endpoint_url,
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": args.region,
+        "SCALE_UP_MAX_INSTANCES": str(max(args.instances + args.scale_step, 20)),
+        "AUTO_SCALING_ENABLED": "false",
+        "FAKE_TF_USE_AWS": "1",
+        "FAKE_TF_APPLY_SEC": str(args.apply_sec),
+        "FAKE_TF_INIT_SEC": str(args.init_sec),
+    })
+
+
+def run_benchmarks(args) -> Dict[str, Any]:
+    # Imported here: settings must see the environment prepared above
+    from ..services.terraform import deploy_aws_from_template, destroy_stack
+    from ..services.scaling_service import list_active_stacks, scale_stack
+    from ..services.ec2_service import get_instance_details, batch_instance_action
+    from ..services.keypair_manager import shutdown_keygen_pool
+    from ..services.keypair_reservoir import keypair_reservoir
+    from ..services.aws_client import get_aws_api_metrics
+
+    run_id = time.strftime("%H%M%S")
+    stack_ids: List[str] = []
+    results: Dict[str, Any] = {}
+
+    if args.keypair_pool:
+        keypair_reservoir.refill()
+
+    def deploy_task(i: int):
+        def task():
+            res = deploy_aws_from_template({
+                "region": args.region,
+                "az": f"{args.region}a",
+                "vpc_cidr": "10.25.0.0/16",
+                "subnet_cidr": "10.25.1.0/24",
+                "name_prefix": f"bench{run_id}-{i}",
+                "instance_count": args.instances,
+                "ami": "ami-12c6146b",
+                "instance_type": "t3.micro",
+                "auto_install_monitoring": False,
+            })
+            if res.get("phase") == "APPLIED":
+                stack_ids.append(res["stack_id"])
+                return True
+            raise RuntimeError(res.get("error") or res.get("phase"))
+        return task
+
+    scenarios = args.scenarios
+    print(f"Deploying {args.stacks} stack(s) x {args.instances} instance(s)...", file=sys.stderr)
+    results["deploy"] = run_scenario([deploy_task(i) for i in range(args.stacks)], args.concurrency)
+
+    try:
+        if "list" in scenarios:
+            results["list_stacks"] = run_scenario(
+                [lambda: list_active_stacks() is not None] * args.repeat, args.concurrency
+            )
+            results["list_instances"] = run_scenario(
+                [lambda s=s: len(get_instance_details(s)) == args.instances
+                 for s in stack_ids for _ in range(args.repeat)],
+                args.concurrency
+            )
+
+        if "scale" in scenarios:
+            target = args.instances + args.scale_step
+            results["scale_up"] = run_scenario(
+                [lambda s=s: scale_stack(s, target, reason="benchmark", force=True)["success"] for s in stack_ids],
+                args.concurrency
+            )
+            results["scale_down"] = run_scenario(
+                [lambda s=s: scale_stack(s, args.instances, reason="benchmark", force=True)["success"] for s in stack_ids],
+                args.concurrency
+            )
+
+        if "actions" in scenarios:
+            for action in ("stop", "start", "reboot"):
+                results[f"instance_{action}"] = run_scenario(
+                    [lambda s=s, a=action: batch_instance_action(s, a)["success"] for s in stack_ids],
+                    args.concurrency
+                )
+    finally:
+        results["destroy"] = run_scenario(
+            [lambda s=s: destroy_stack(s)["success"] for s in stack_ids], args.concurrency
+        )
+        shutdown_keygen_pool()
+
+    return {
+        "config": {
+            "stacks": args.stacks,
+            "instances": args.instances,
+            "concurrency": args.concurrency,
+            "key_type": args.key_type,
+            "keypair_pool": args.keypair_pool,
+            "apply_sec": args.apply_sec,
+            "scenarios": sorted(scenarios),
+        },
+        "scenarios": results,
+        "aws_api": get_aws_api_metrics(),
+    }
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """
+    Returns:
+        Human-readable regression messages (empty if none)
+    """
+    regressions = []
+    for name, current in report["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous or not current["count"]:
+            continue
+        if previous["p99_sec"] and current["p99_sec"] > previous["p99_sec"] * (1 + max_regression):
+            regressions.append(f"{name}: p99 {previous['p99_sec']}s -> {current['p99_sec']}s")
+        if previous["throughput_ops_per_sec"] and \
+                current["throughput_ops_per_sec"] < previous["throughput_ops_per_sec"] * (1 - max_regression):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_ops_per_sec']} -> {current['throughput_ops_per_sec']} ops/s"
+            )
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'scenario':<18}{'count':>7}{'errors':>8}{'p50(s)':>10}{'p99(s)':>10}{'max(s)':>10}{'ops/s':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in report["scenarios"].items():
+        print(f"{name:<18}{r['count']:>7}{r['errors']:>8}{r['p50_sec']:>10.3f}"
+              f"{r['p99_sec']:>10.3f}{r['max_sec']:>10.3f}{r['throughput_ops_per_sec']:>10.2f}")
+        for error in r["sample_errors"]:
+            print(f"    ! {error}")
+
+    regions = report["aws_api"]["regions"]
+    for region, totals in regions.items():
+        print(f"AWS {region}: {totals['calls']} calls, {totals['errors']} errors, {totals['throttles']} throttles")
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline control plane benchmarks (fake Terraform + moto)")
+    parser.add_argument("--stacks", type=int, default=3, help="Number of stacks (N)")
+    parser.add_argument("--instances", type=int, default=5, help="Instances per stack (M)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent operations per scenario")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions for list scenarios")
+    parser.add_argument("--scale-step", type=int, default=2, help="Instances added in the scale scenario")
+    parser.add_argument("--scenarios", default="list,scale,actions",
+                        help="Comma-separated: list,scale,actions (deploy and destroy always run)")
+    parser.add_argument("--key-type", choices=["rsa", "ed25519"], default="rsa")
+    parser.add_argument("--keypair-pool", type=int, default=0, help="Pre-fill a keypair reservoir of this size")
+    parser.add_argument("--region", default="ap-southeast-2")
+    parser.add_argument("--apply-sec", type=float, default=0.5, help="Simulated terraform apply duration")
+    parser.add_argument("--init-sec", type=float, default=0.1, help="Simulated terraform init duration")
+    parser.add_argument("--moto-url", default=None, help="Use an already running moto server")
+    parser.add_argument("--output", default=None, help="Write JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous JSON report")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed relative p99/throughput regression vs baseline")
+    args = parser.parse_args(argv)
+    args.scenarios = {s.strip() for s in args.scenarios.split(",") if s.strip()}
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    server = None
+    endpoint_url = args.moto_url
+    if not endpoint_url:
+        from moto.server import ThreadedMotoServer
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        port = _free_port()
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+        server.start()
+        endpoint_url = f"http://127.0.0.1:{port}"
+
+    try:
+        with tempfile.TemporaryDirectory(prefix="hybrid-bench-") as tmp:
+            prepare_environment(args, Path(tmp), endpoint_url)
+            report = run_benchmarks(args)
+    finally:
+        if server:
+            server.stop()
+
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        for key in ("stacks", "instances", "concurrency", "apply_sec"):
+            if baseline.get("config", {}).get(key) != report["config"][key]:
+                print(f"\nWarning: baseline {key}={baseline.get('config', {}).get(key)} "
+                      f"differs from this run ({report['config'][key]})")
+        regressions = compare_with_baseline(report, baseline, args.max_regression)
+        if regressions:
+            print("\nPerformance regressions detected:")
+            for message in regressions:
+                print(f"  - {message}")
+            return 1
+        print("\nNo regressions against baseline")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
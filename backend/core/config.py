@@ -25,15 +25,162 @@ class Settings:
     AWS_ACCESS_KEY_ID: str | None = os.getenv("AWS_ACCESS_KEY_ID")
     AWS_SECRET_ACCESS_KEY: str | None = os.getenv("AWS_SECRET_ACCESS_KEY")
 
+    # Endpoint thay thế (moto / LocalStack) cho benchmark & test offline
+    AWS_ENDPOINT_URL: str | None = os.getenv("AWS_ENDPOINT_URL") or None
+
+    # Client-side throttling cho AWS API (token bucket thích ứng theo region)
+    AWS_API_RATE_PER_SEC: float = float(os.getenv("AWS_API_RATE_PER_SEC", "10"))
+    AWS_API_BURST: float = float(os.getenv("AWS_API_BURST", "20"))
+    AWS_API_MIN_RATE_PER_SEC: float = float(os.getenv("AWS_API_MIN_RATE_PER_SEC", "0.5"))
+    AWS_API_MAX_RETRIES: int = int(os.getenv("AWS_API_MAX_RETRIES", "4"))
+
     # ==== AI ADVISOR ====
     GEMINI_API_KEY: str | None = os.getenv("GEMINI_API_KEY")
 
+    # ==== METRICS (MIMIR) ====
+    MIMIR_QUERY_TIMEOUT_SEC: float = float(os.getenv("MIMIR_QUERY_TIMEOUT_SEC", "10"))
+    MIMIR_CONNECT_TIMEOUT_SEC: float = float(os.getenv("MIMIR_CONNECT_TIMEOUT_SEC", "3"))
+    MIMIR_QUERY_WORKERS: int = int(os.getenv("MIMIR_QUERY_WORKERS", "16"))
+    MIMIR_POOL_MAXSIZE: int = int(os.getenv("MIMIR_POOL_MAXSIZE", "10"))
+    # Giới hạn range query: số điểm tối đa mỗi series, step tối thiểu, số series tối đa
+    MIMIR_RANGE_MAX_POINTS: int = int(os.getenv("MIMIR_RANGE_MAX_POINTS", "11000"))
+    MIMIR_RANGE_MIN_STEP_SEC: float = float(os.getenv("MIMIR_RANGE_MIN_STEP_SEC", "5"))
+    MIMIR_RANGE_MAX_SERIES: int = int(os.getenv("MIMIR_RANGE_MAX_SERIES", "500"))
+    MIMIR_RANGE_TIMEOUT_SEC: float = float(os.getenv("MIMIR_RANGE_TIMEOUT_SEC", "30"))
+    # Label gắn stack_id cho series node_exporter (rỗng = không lọc theo stack).
+    # Mỗi stack có Mimir riêng sau NLB nên mặc định không lọc; chỉ đặt khi
+    # Prometheus của stack gắn label này (external_labels / relabel_configs)
+    METRICS_STACK_LABEL: str = os.getenv("METRICS_STACK_LABEL", "")
+    METRICS_CACHE_TTL_SEC: float = float(os.getenv("METRICS_CACHE_TTL_SEC", "15"))
+    METRICS_CACHE_STALE_SEC: float = float(os.getenv("METRICS_CACHE_STALE_SEC", "60"))
+    METRICS_CACHE_MAX_ENTRIES: int = int(os.getenv("METRICS_CACHE_MAX_ENTRIES", "4096"))
+    # Range query đã kết thúc trong quá khứ không đổi nên được cache lâu hơn
+    METRICS_RANGE_CACHE_TTL_SEC: float = float(os.getenv("METRICS_RANGE_CACHE_TTL_SEC", "300"))
+    METRICS_RANGE_CACHE_MAX_ENTRIES: int = int(os.getenv("METRICS_RANGE_CACHE_MAX_ENTRIES", "64"))
+    # Collector nạp lịch sử metrics (ring buffer) cho mọi stack, kể cả khi tắt auto-scaling
+    METRICS_COLLECT_ENABLED: bool = os.getenv("METRICS_COLLECT_ENABLED", "true").lower() == "true"
+    METRICS_COLLECT_INTERVAL_SEC: int = int(os.getenv("METRICS_COLLECT_INTERVAL_SEC", "15"))
+    # Số thread lấy metrics song song cho các stack trong mỗi lượt collector
+    METRICS_COLLECT_WORKERS: int = int(os.getenv("METRICS_COLLECT_WORKERS", "8"))
+    METRICS_HISTORY_CAPACITY: int = int(os.getenv("METRICS_HISTORY_CAPACITY", "720"))
+    METRICS_EWMA_ALPHA: float = float(os.getenv("METRICS_EWMA_ALPHA", "0.3"))
+    # Nhận metrics push từ stack (Prometheus remote_write); cần REMOTE_WRITE_TOKEN,
+    # không có token thì mọi lần push bị từ chối
+    REMOTE_WRITE_ENABLED: bool = os.getenv("REMOTE_WRITE_ENABLED", "false").lower() == "true"
+    REMOTE_WRITE_TOKEN: str = os.getenv("REMOTE_WRITE_TOKEN", "")
+    REMOTE_WRITE_FRESH_SEC: float = float(os.getenv("REMOTE_WRITE_FRESH_SEC", "60"))
+    REMOTE_WRITE_WINDOW_SEC: float = float(os.getenv("REMOTE_WRITE_WINDOW_SEC", "300"))
+    REMOTE_WRITE_BUFFER_POINTS: int = int(os.getenv("REMOTE_WRITE_BUFFER_POINTS", "64"))
+    REMOTE_WRITE_SERIES_TTL_SEC: float = float(os.getenv("REMOTE_WRITE_SERIES_TTL_SEC", "600"))
+    REMOTE_WRITE_MAX_BODY_BYTES: int = int(os.getenv("REMOTE_WRITE_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+    # Lưu trữ metrics lâu dài (SQLite, raw -> 1m -> 1h)
+    METRICS_ARCHIVE_ENABLED: bool = os.getenv("METRICS_ARCHIVE_ENABLED", "true").lower() == "true"
+    METRICS_ARCHIVE_PATH: Path = Path(os.getenv("METRICS_ARCHIVE_PATH", ".infra/metrics/archive.db")).resolve()
+    METRICS_ARCHIVE_RAW_RETENTION_HOURS: float = float(os.getenv("METRICS_ARCHIVE_RAW_RETENTION_HOURS", "48"))
+    METRICS_ARCHIVE_1M_RETENTION_DAYS: float = float(os.getenv("METRICS_ARCHIVE_1M_RETENTION_DAYS", "30"))
+    METRICS_ARCHIVE_1H_RETENTION_DAYS: float = float(os.getenv("METRICS_ARCHIVE_1H_RETENTION_DAYS", "730"))
+
     # ==== SCALING CONFIGURATION ====
     AUTO_SCALING_ENABLED: bool = os.getenv("AUTO_SCALING_ENABLED", "false").lower() == "true"
     AUTO_SCALING_INTERVAL_MINUTES: int = int(os.getenv("AUTO_SCALING_INTERVAL_MINUTES", "5"))
     AUTO_SCALING_CONFIDENCE_THRESHOLD: float = float(os.getenv("AUTO_SCALING_CONFIDENCE_THRESHOLD", "0.7"))
+    # Số luồng lấy metrics / đánh giá stack và số terraform apply chạy song song
+    AUTO_SCALING_EVAL_WORKERS: int = int(os.getenv("AUTO_SCALING_EVAL_WORKERS", "8"))
+    AUTO_SCALING_APPLY_WORKERS: int = int(os.getenv("AUTO_SCALING_APPLY_WORKERS", "4"))
+    # Nhịp đánh giá riêng từng stack: ngắn lại khi gần ngưỡng / tải biến động nhanh,
+    # dài ra khi ổn định hoặc đang ở mức tối thiểu (AUTO_SCALING_INTERVAL_MINUTES là mức gốc)
+    AUTO_SCALING_ADAPTIVE_CADENCE: bool = os.getenv("AUTO_SCALING_ADAPTIVE_CADENCE", "true").lower() == "true"
+    AUTO_SCALING_TICK_SEC: int = int(os.getenv("AUTO_SCALING_TICK_SEC", "15"))
+    AUTO_SCALING_MIN_INTERVAL_SEC: float = float(os.getenv("AUTO_SCALING_MIN_INTERVAL_SEC", "30"))
+    AUTO_SCALING_MAX_INTERVAL_SEC: float = float(os.getenv("AUTO_SCALING_MAX_INTERVAL_SEC", "900"))
+    # Ngân sách chung: số lần đánh giá stack tối đa mỗi phút
+    AUTO_SCALING_MAX_EVALS_PER_MINUTE: int = int(os.getenv("AUTO_SCALING_MAX_EVALS_PER_MINUTE", "120"))
+    # "Gần ngưỡng": trong khoảng tỉ lệ này dưới ngưỡng scale up
+    CADENCE_NEAR_THRESHOLD: float = float(os.getenv("CADENCE_NEAR_THRESHOLD", "0.1"))
+    # "Biến động nhanh": điểm % mỗi phút, đo trên CADENCE_RATE_WINDOW_SEC gần nhất
+    CADENCE_FAST_CHANGE_PER_MIN: float = float(os.getenv("CADENCE_FAST_CHANGE_PER_MIN", "5"))
+    CADENCE_RATE_WINDOW_SEC: float = float(os.getenv("CADENCE_RATE_WINDOW_SEC", "300"))
+    # Hệ số giãn nhịp sau mỗi lần đánh giá ổn định
+    CADENCE_BACKOFF: float = float(os.getenv("CADENCE_BACKOFF", "1.5"))
+    # Nhiều uvicorn worker: bầu leader qua flock trên lease file, chỉ leader chạy job nền
+    SCHEDULER_LEADER_ELECTION: bool = os.getenv("SCHEDULER_LEADER_ELECTION", "true").lower() == "true"
+    SCHEDULER_LEASE_FILE: Path = Path(os.getenv("SCHEDULER_LEASE_FILE", str(TF_WORK_ROOT / ".scheduler.lease"))).resolve()
+    SCHEDULER_LEADER_POLL_SEC: float = float(os.getenv("SCHEDULER_LEADER_POLL_SEC", "5"))
     SCALE_UP_MAX_INSTANCES: int = int(os.getenv("SCALE_UP_MAX_INSTANCES", "20"))
     SCALE_DOWN_MIN_INSTANCES: int = int(os.getenv("SCALE_DOWN_MIN_INSTANCES", "1"))
+    # Cooldown sau lần scale gần nhất, riêng cho scale up / scale down
+    SCALE_UP_COOLDOWN_SEC: float = float(os.getenv("SCALE_UP_COOLDOWN_SEC", "300"))
+    SCALE_DOWN_COOLDOWN_SEC: float = float(os.getenv("SCALE_DOWN_COOLDOWN_SEC", "900"))
+    # Số lần đánh giá liên tiếp phải cùng hướng trước khi scale (stabilization window)
+    SCALE_UP_STABILIZATION_SAMPLES: int = int(os.getenv("SCALE_UP_STABILIZATION_SAMPLES", "1"))
+    SCALE_DOWN_STABILIZATION_SAMPLES: int = int(os.getenv("SCALE_DOWN_STABILIZATION_SAMPLES", "3"))
+    # Hysteresis: bỏ qua khi utilisation lệch khỏi mục tiêu không quá tỉ lệ này
+    SCALING_TOLERANCE: float = float(os.getenv("SCALING_TOLERANCE", "0.1"))
+    # Số quyết định bị chặn giữ lại để xem qua API
+    SCALING_DECISION_LOG_SIZE: int = int(os.getenv("SCALING_DECISION_LOG_SIZE", "100"))
+    # File leader ghi log quyết định bị chặn để mọi worker trả lời /decisions
+    SCALING_DECISION_LOG_FILE: Path = Path(os.getenv("SCALING_DECISION_LOG_FILE", str(TF_WORK_ROOT / ".scaling_decisions.json"))).resolve()
+
+    # ==== SCHEDULED / SEASONAL PRE-SCALING ====
+    # Lịch capacity tối thiểu (cron) và pre-scaling theo mùa vụ của từng stack
+    SCHEDULED_SCALING_ENABLED: bool = os.getenv("SCHEDULED_SCALING_ENABLED", "true").lower() == "true"
+    SCHEDULE_DEFAULT_TIMEZONE: str = os.getenv("SCHEDULE_DEFAULT_TIMEZONE", "UTC")
+    # Chu kỳ job pre-scaling và thời gian scale trước đỉnh dự đoán
+    SEASONALITY_INTERVAL_MINUTES: int = int(os.getenv("SEASONALITY_INTERVAL_MINUTES", "15"))
+    SEASONALITY_LEAD_MINUTES: int = int(os.getenv("SEASONALITY_LEAD_MINUTES", "15"))
+    # Lịch sử dùng để học profile (tối thiểu SEASONALITY_MIN_DAYS), học lại mỗi N giờ
+    SEASONALITY_LOOKBACK_DAYS: int = int(os.getenv("SEASONALITY_LOOKBACK_DAYS", "14"))
+    SEASONALITY_MIN_DAYS: int = int(os.getenv("SEASONALITY_MIN_DAYS", "2"))
+    SEASONALITY_RELEARN_HOURS: float = float(os.getenv("SEASONALITY_RELEARN_HOURS", "6"))
+    SEASONALITY_PERCENTILE: float = float(os.getenv("SEASONALITY_PERCENTILE", "90"))
+
+    # ==== ADVISOR ====
+    # "predictive": dự báo cục bộ (mặc định) | "policy": chính sách khai báo của từng stack
+    # | "llm": hỏi Gemini cho mọi quyết định
+    ADVISOR_MODE: str = os.getenv("ADVISOR_MODE", "predictive").lower()
+    # Dùng Gemini để giải thích quyết định predictive (không ảnh hưởng quyết định)
+    ADVISOR_LLM_EXPLAIN: bool = os.getenv("ADVISOR_LLM_EXPLAIN", "false").lower() == "true"
+    # Cache khuyến nghị LLM theo bucket CPU / Memory
+    ADVISOR_CACHE_TTL_SEC: float = float(os.getenv("ADVISOR_CACHE_TTL_SEC", "600"))
+    ADVISOR_CACHE_MAX_ENTRIES: int = int(os.getenv("ADVISOR_CACHE_MAX_ENTRIES", "1024"))
+    ADVISOR_CACHE_BUCKET_PERCENT: float = float(os.getenv("ADVISOR_CACHE_BUCKET_PERCENT", "5"))
+    # Gom nhiều stack vào một lần gọi Gemini (chia chunk theo giới hạn prompt)
+    ADVISOR_BATCH_MAX_STACKS: int = int(os.getenv("ADVISOR_BATCH_MAX_STACKS", "25"))
+    ADVISOR_BATCH_MAX_PROMPT_CHARS: int = int(os.getenv("ADVISOR_BATCH_MAX_PROMPT_CHARS", "12000"))
+    ADVISOR_BATCH_CONCURRENCY: int = int(os.getenv("ADVISOR_BATCH_CONCURRENCY", "2"))
+    # Ngân sách độ trễ cho LLM + circuit breaker
+    ADVISOR_LLM_BUDGET_SEC: float = float(os.getenv("ADVISOR_LLM_BUDGET_SEC", "3"))
+    ADVISOR_LLM_WORKERS: int = int(os.getenv("ADVISOR_LLM_WORKERS", "4"))
+    ADVISOR_CB_FAILURE_THRESHOLD: int = int(os.getenv("ADVISOR_CB_FAILURE_THRESHOLD", "3"))
+    ADVISOR_CB_RESET_SEC: float = float(os.getenv("ADVISOR_CB_RESET_SEC", "60"))
+    ADVISOR_AUDIT_SIZE: int = int(os.getenv("ADVISOR_AUDIT_SIZE", "200"))
+    PREDICTIVE_LOOKBACK_SEC: float = float(os.getenv("PREDICTIVE_LOOKBACK_SEC", "1800"))
+    PREDICTIVE_HORIZON_SEC: int = int(os.getenv("PREDICTIVE_HORIZON_SEC", str(AUTO_SCALING_INTERVAL_MINUTES * 60)))
+    PREDICTIVE_MIN_POINTS: int = int(os.getenv("PREDICTIVE_MIN_POINTS", "8"))
+    # Utilisation mục tiêu cho capacity calculator (predictive, fallback, prompt)
+    PREDICTIVE_TARGET_CPU_PERCENT: float = float(os.getenv("PREDICTIVE_TARGET_CPU_PERCENT", "60"))
+    PREDICTIVE_TARGET_MEMORY_PERCENT: float = float(os.getenv("PREDICTIVE_TARGET_MEMORY_PERCENT", "70"))
+    # Headroom thêm vào số instance tính được (0.1 = +10%)
+    CAPACITY_SAFETY_MARGIN: float = float(os.getenv("CAPACITY_SAFETY_MARGIN", "0.1"))
+    PREDICTIVE_ALPHA: float = float(os.getenv("PREDICTIVE_ALPHA", "0.5"))
+    PREDICTIVE_BETA: float = float(os.getenv("PREDICTIVE_BETA", "0.3"))
+
+    # ==== KEYPAIR PROVISIONING ====
+    DEFAULT_KEY_TYPE: str = os.getenv("DEFAULT_KEY_TYPE", "rsa")  # rsa | ed25519
+    KEYPAIR_GEN_WORKERS: int = int(os.getenv("KEYPAIR_GEN_WORKERS", str(min(4, os.cpu_count() or 1))))
+    KEYPAIR_AWS_CONCURRENCY: int = int(os.getenv("KEYPAIR_AWS_CONCURRENCY", "8"))
+
+    # Kho keypairs sinh sẵn (0 = tắt)
+    KEYPAIR_POOL_SIZE: int = int(os.getenv("KEYPAIR_POOL_SIZE", "10"))
+    KEYPAIR_POOL_DIR: Path = Path(os.getenv("KEYPAIR_POOL_DIR", ".infra/keypool")).resolve()
+    KEYPAIR_POOL_SECRET: str | None = os.getenv("KEYPAIR_POOL_SECRET")
+    # Hoặc file chứa key (tự sinh nếu chưa có), phải nằm ngoài KEYPAIR_POOL_DIR;
+    # không đặt cả hai thì kho bị tắt
+    KEYPAIR_POOL_SECRET_FILE: Path | None = (
+        Path(os.environ["KEYPAIR_POOL_SECRET_FILE"]).resolve() if os.getenv("KEYPAIR_POOL_SECRET_FILE") else None
+    )
+    KEYPAIR_POOL_REFILL_INTERVAL_SEC: float = float(os.getenv("KEYPAIR_POOL_REFILL_INTERVAL_SEC", "30"))
+    KEYPAIR_POOL_IDLE_SEC: float = float(os.getenv("KEYPAIR_POOL_IDLE_SEC", "10"))
 
 settings = Settings()
 settings.TF_WORK_ROOT.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,221 @@
+"""
+Telemetry - Prometheus metrics cho chính control plane
+
+- HTTP routes, terraform.run theo subcommand, AWS calls, Mimir queries,
+  Gemini calls, SSH sessions đang mở, các lần chạy job của scheduler,
+  quyết định scaling (thực thi / bị chặn bởi cooldown, stabilization),
+  worker đang giữ scheduler lease
+- Hỗ trợ nhiều worker: đặt PROMETHEUS_MULTIPROC_DIR (thư mục rỗng, ghi được)
+  trước khi khởi động, /metrics sẽ gộp số liệu của mọi worker
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, Tuple
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    REGISTRY,
+    CONTENT_TYPE_LATEST,
+    generate_latest,
+    multiprocess,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+_FAST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_SLOW_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 900.0)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=_FAST_BUCKETS
+)
+HTTP_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests being served", multiprocess_mode="livesum"
+)
+
+TERRAFORM_RUNS = Counter(
+    "terraform_runs_total", "terraform subprocess invocations", ["subcommand", "outcome"]
+)
+TERRAFORM_DURATION = Histogram(
+    "terraform_run_duration_seconds", "terraform subprocess wall time", ["subcommand"], buckets=_SLOW_BUCKETS
+)
+
+AWS_CALLS = Counter(
+    "aws_api_calls_total", "AWS API call attempts", ["region", "operation", "outcome"]
+)
+AWS_LATENCY = Histogram(
+    "aws_api_call_duration_seconds", "AWS API call latency", ["operation"], buckets=_FAST_BUCKETS
+)
+
+MIMIR_QUERIES = Counter(
+    "mimir_queries_total", "PromQL queries sent to Mimir", ["outcome"]
+)
+MIMIR_LATENCY = Histogram(
+    "mimir_query_duration_seconds", "PromQL query latency", buckets=_FAST_BUCKETS
+)
+MIMIR_CACHE = Counter(
+    "mimir_cache_lookups_total", "Metrics cache lookups", ["status"]
+)
+
+GEMINI_CALLS = Counter(
+    "gemini_calls_total", "Gemini API calls", ["outcome"]
+)
+GEMINI_LATENCY = Histogram(
+    "gemini_call_duration_seconds", "Gemini API latency", buckets=_SLOW_BUCKETS[:7]
+)
+
+SSH_SESSIONS = Gauge(
+    "ssh_sessions_active", "Open terminal SSH sessions", multiprocess_mode="livesum"
+)
+
+SCHEDULER_RUNS = Counter(
+    "scheduler_job_runs_total", "Scheduler job runs", ["job", "outcome"]
+)
+SCHEDULER_DURATION = Histogram(
+    "scheduler_job_duration_seconds", "Scheduler job run time", ["job"], buckets=_SLOW_BUCKETS
+)
+SCHEDULER_LAG = Histogram(
+    "scheduler_job_lag_seconds", "Delay between scheduled and actual job start", ["job"], buckets=_FAST_BUCKETS
+)
+
+SCALING_DECISIONS = Counter(
+    "scaling_decisions_total", "Auto-scaling decisions by outcome", ["action", "outcome"]
+)
+AUTOSCALE_SKIPS = Counter(
+    "autoscale_stack_skips_total", "Stacks skipped by an auto-scaling run", ["reason"]
+)
+SCALE_OPERATIONS_IN_FLIGHT = Gauge(
+    "scale_operations_in_flight", "Scale operations dispatched by the scheduler and not finished",
+    multiprocess_mode="livesum"
+)
+SCHEDULER_LEADER = Gauge(
+    "scheduler_leader", "1 in the worker holding the scheduler lease (sum should be 1)",
+    multiprocess_mode="livesum"
+)
+
+
+def observe_http(method: str, route: str, status: int, duration: float):
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_LATENCY.labels(method, route).observe(duration)
+
+
+def observe_terraform(subcommand: str, outcome: str, duration: float):
+    TERRAFORM_RUNS.labels(subcommand, outcome).inc()
+    TERRAFORM_DURATION.labels(subcommand).observe(duration)
+
+
+def observe_aws_call(region: str, operation: str, outcome: str, duration: float):
+    AWS_CALLS.labels(region, operation, outcome).inc()
+    AWS_LATENCY.labels(operation).observe(duration)
+
+
+def observe_mimir_query(outcome: str, duration: float):
+    MIMIR_QUERIES.labels(outcome).inc()
+    MIMIR_LATENCY.observe(duration)
+
+
+def observe_gemini_call(outcome: str, duration: float):
+    GEMINI_CALLS.labels(outcome).inc()
+    GEMINI_LATENCY.observe(duration)
+
+
+def observe_scaling_decision(action: str, outcome: str):
+    SCALING_DECISIONS.labels(action, outcome).inc()
+
+
+async def http_metrics_middleware(request, call_next):
+    """
+    Record count / latency per route template (not raw path, to bound cardinality)
+    """
+    start = time.perf_counter()
+    HTTP_IN_PROGRESS.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_PROGRESS.dec()
+        route = request.scope.get("route")
+        observe_http(
+            request.method,
+            getattr(route, "path", "unmatched"),
+            status,
+            time.perf_counter() - start
+        )
+
+
+# job id -> (scheduled time, actual start)
+_job_starts: Dict[str, Tuple[float, float]] = {}
+_job_starts_lock = threading.Lock()
+# job id -> last completed run (this process), for the scheduler status API
+_last_runs: Dict[str, Dict[str, Any]] = {}
+
+
+def scheduler_listener(event):
+    """
+    APScheduler listener: lag on submit, duration / outcome on completion
+    """
+    from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_MISSED
+
+    job_id = event.job_id
+    if event.code == EVENT_JOB_SUBMITTED:
+        now = time.time()
+        scheduled = event.scheduled_run_times[0].timestamp() if event.scheduled_run_times else now
+        SCHEDULER_LAG.labels(job_id).observe(max(0.0, now - scheduled))
+        with _job_starts_lock:
+            _job_starts[job_id] = (scheduled, time.perf_counter())
+        return
+
+    if event.code == EVENT_JOB_MISSED:
+        SCHEDULER_RUNS.labels(job_id, "missed").inc()
+        return
+
+    with _job_starts_lock:
+        started = _job_starts.pop(job_id, None)
+    outcome = "success" if event.code == EVENT_JOB_EXECUTED else "error"
+    SCHEDULER_RUNS.labels(job_id, outcome).inc()
+    if started:
+        duration = time.perf_counter() - started[1]
+        SCHEDULER_DURATION.labels(job_id).observe(duration)
+        with _job_starts_lock:
+            _last_runs[job_id] = {
+                "scheduled_at": started[0],
+                "lag_sec": round(max(0.0, time.time() - duration - started[0]), 3),
+                "duration_sec": round(duration, 3),
+                "outcome": outcome
+            }
+
+
+def last_job_runs() -> Dict[str, Dict[str, Any]]:
+    with _job_starts_lock:
+        return {job_id: dict(run) for job_id, run in _last_runs.items()}
+
+
+def _multiprocess_enabled() -> bool:
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR") or os.environ.get("prometheus_multiproc_dir"))
+
+
+def render_metrics() -> bytes:
+    """
+    Prometheus text exposition (aggregated across workers in multiprocess mode)
+    """
+    if _multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def mark_process_dead():
+    """
+    Drop this worker's live gauges from the multiprocess directory (on shutdown)
+    """
+    if _multiprocess_enabled():
+        multiprocess.mark_process_dead(os.getpid())
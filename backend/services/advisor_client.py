@@ -0,0 +1,193 @@
+"""
+Advisor Client - Gọi LLM với ngân sách độ trễ, fallback tức thì và circuit breaker
+
+- Mỗi lời gọi Gemini chạy trên thread pool riêng; quá ADVISOR_LLM_BUDGET_SEC
+  thì trả ngay khuyến nghị rule-based, câu trả lời LLM đến muộn chỉ được
+  ghi audit (và đưa vào cache cho lần sau)
+- Circuit breaker: sau ADVISOR_CB_FAILURE_THRESHOLD lỗi / quá hạn liên tiếp
+  thì bỏ qua LLM, sau ADVISOR_CB_RESET_SEC cho một lời gọi thăm dò
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Any, Callable, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half_open probe after reset_sec"""
+
+    def __init__(self, failure_threshold: int, reset_sec: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_sec = reset_sec
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go to the LLM now (reserves the probe slot when half-open)
+        """
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_sec:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                logger.info("Advisor circuit closed (LLM recovered)")
+            self.state = "closed"
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.times_opened += 1
+                    logger.warning(f"Advisor circuit opened after {self.failures} failure(s)")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = max(0.0, self.reset_sec - (time.monotonic() - self.opened_at)) if self.state == "open" else 0.0
+            return {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "times_opened": self.times_opened,
+                "retry_in_sec": round(retry_in, 1)
+            }
+
+
+class BudgetedAdvisor:
+    """Runs LLM calls under a latency budget with a rule-based hedge"""
+
+    def __init__(self, budget_sec: float, workers: int, breaker: CircuitBreaker, audit_size: int = 200):
+        self.budget_sec = budget_sec
+        self.breaker = breaker
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="llm-advisor")
+        self._audit = deque(maxlen=audit_size)
+        self._audit_lock = threading.Lock()
+        self.counters = {"llm": 0, "budget_exceeded": 0, "failed": 0, "circuit_open": 0, "late_answers": 0}
+
+    def call(self,
+             llm_fn: Callable[[], Any],
+             fallback_fn: Callable[[], Any],
+             is_success: Callable[[Any], bool],
+             label: str,
+             on_late_result: Optional[Callable[[Any], None]] = None,
+             summarize: Optional[Callable[[Any], Any]] = None) -> Dict[str, Any]:
+        """
+        Run `llm_fn` within the latency budget.
+
+        Args:
+            llm_fn: The LLM call
+            fallback_fn: Rule-based answer used when the LLM is skipped, late or fails
+            is_success: Whether an LLM result is a usable answer
+            label: Audit label, e.g. the stack id or chunk description
+            on_late_result: Called with a usable answer that arrived after the budget
+            summarize: Reduce results to what the audit log keeps
+
+        Returns:
+            {"result": answer, "path": "llm" | "budget_exceeded" | "failed" | "circuit_open"}
+        """
+        summarize = summarize or (lambda value: value)
+
+        if not self.breaker.allow():
+            self.counters["circuit_open"] += 1
+            return {"result": fallback_fn(), "path": "circuit_open"}
+
+        started = time.monotonic()
+        future = self._executor.submit(llm_fn)
+        try:
+            result = future.result(timeout=self.budget_sec)
+        except FutureTimeout:
+            self.breaker.record_failure()
+            self.counters["budget_exceeded"] += 1
+            fallback = fallback_fn()
+            future.add_done_callback(
+                lambda f: self._on_late(f, label, started, summarize(fallback), is_success, on_late_result, summarize)
+            )
+            return {"result": fallback, "path": "budget_exceeded"}
+        except Exception as e:
+            logger.warning(f"Advisor LLM call failed for {label}: {e}")
+            self.breaker.record_failure()
+            self.counters["failed"] += 1
+            return {"result": fallback_fn(), "path": "failed"}
+
+        if is_success(result):
+            self.breaker.record_success()
+            self.counters["llm"] += 1
+            return {"result": result, "path": "llm"}
+
+        self.breaker.record_failure()
+        self.counters["failed"] += 1
+        return {"result": fallback_fn(), "path": "failed"}
+
+    def _on_late(self, future, label, started, fallback_summary, is_success, on_late_result, summarize):
+        latency = time.monotonic() - started
+        try:
+            result = future.result()
+            usable = is_success(result)
+        except Exception as e:
+            result, usable = {"error": str(e)}, False
+
+        entry = {
+            "label": label,
+            "at": time.time(),
+            "latency_sec": round(latency, 3),
+            "budget_sec": self.budget_sec,
+            "usable": usable,
+            "applied": fallback_summary,
+            "llm": summarize(result) if usable else result
+        }
+        with self._audit_lock:
+            self._audit.append(entry)
+            self.counters["late_answers"] += 1
+        logger.info(f"Late LLM answer for {label} after {latency:.1f}s (usable={usable}); rule-based answer was applied")
+
+        if usable and on_late_result:
+            try:
+                on_late_result(result)
+            except Exception as e:
+                logger.warning(f"Storing late LLM answer for {label} failed: {e}")
+
+    def status(self, audit_limit: int = 50) -> Dict[str, Any]:
+        with self._audit_lock:
+            audit = list(self._audit)[-audit_limit:]
+        return {
+            "budget_sec": self.budget_sec,
+            "circuit": self.breaker.snapshot(),
+            "counters": dict(self.counters),
+            "late_answers": audit
+        }
+
+
+# Global budgeted LLM client
+llm_advisor = BudgetedAdvisor(
+    budget_sec=settings.ADVISOR_LLM_BUDGET_SEC,
+    workers=settings.ADVISOR_LLM_WORKERS,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.ADVISOR_CB_FAILURE_THRESHOLD,
+        reset_sec=settings.ADVISOR_CB_RESET_SEC
+    ),
+    audit_size=settings.ADVISOR_AUDIT_SIZE
+)
@@ -1,79 +1,353 @@
 import os
 import re
 import json
+import time
 import requests
-from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional
 from .scaling_service import get_stack_info
 from .metrics_service import get_stack_metrics
+from .predictive_scaler import forecast_stacks, recommend_from_forecast
+from .capacity import capacity_target
+from .recommendation_cache import recommendation_cache, recommendation_key
+from .advisor_client import llm_advisor
+from .scaling_policy import policy_from_metadata, evaluate_policies, clamp_to_policy
+from .scaling_guard import last_scaled_timestamp
+from .scaling_schedule import capacity_floor, apply_floor
+from .scaling_cadence import cadence_from_metadata
 from ..core.config import settings
+from ..core import telemetry
 
 
-def analyze_and_recommend(stack_id: str) -> Dict[str, Any]:
+def _error_result(stack_id: str, error: Exception) -> Dict[str, Any]:
+    return {
+        "stack_id": stack_id,
+        "error": str(error),
+        "recommendation": {
+            "action": "no_change",
+            "target_count": 1,
+            "reason": f"Error analyzing stack: {str(error)}",
+            "confidence": 0.0
+        }
+    }
+
+
+def _stack_state(stack_id: str) -> Dict[str, Any]:
+    """
+    Current instance count and metrics of a stack.
+    
+    Returns:
+        {"stack_id", "current_count", "metrics", "instances", "policy",
+        "capacity_floor", "last_scaled_ts", "cadence"}, or a complete
+        no_change result with "error" when metrics are unavailable
+    """
+    # Get current stack information
+    stack_info = get_stack_info(stack_id)
+    current_count = stack_info["current_instance_count"]
+    
+    # Get current metrics
+    metrics_data = get_stack_metrics(stack_id)
+    
+    if "error" in metrics_data:
+        # If we can't get metrics, return no_change
+        return {
+            "stack_id": stack_id,
+            "current_count": current_count,
+            "metrics": {},
+            "recommendation": {
+                "action": "no_change",
+                "target_count": current_count,
+                "reason": f"Unable to fetch metrics: {metrics_data.get('error')}",
+                "confidence": 0.0
+            },
+            "error": metrics_data.get("error")
+        }
+    
+    floor = capacity_floor(stack_info["metadata"])
+    return {
+        "stack_id": stack_id,
+        "current_count": current_count,
+        "metrics": metrics_data.get("metrics", {}),
+        "instances": metrics_data.get("instances", []),
+        # Scheduled / seasonal minimum capacity raises the policy's lower bound
+        "policy": apply_floor(policy_from_metadata(stack_info["metadata"]), floor["min_instances"]),
+        "capacity_floor": floor,
+        "last_scaled_ts": last_scaled_timestamp(stack_info["metadata"]),
+        "cadence": cadence_from_metadata(stack_info["metadata"])
+    }
+
+
+def _local_recommendation(state: Dict[str, Any], forecasts: Optional[Dict[str, Optional[Dict[str, Any]]]]) -> Dict[str, Any]:
+    recommendation = predictive_recommendation(
+        state["stack_id"], state["current_count"], state["metrics"], forecasts, policy=state["policy"]
+    )
+    if settings.ADVISOR_LLM_EXPLAIN:
+        recommendation["explanation"] = explain_recommendation(
+            state["stack_id"], state["current_count"], state["metrics"], recommendation
+        )
+    return recommendation
+
+
+def analyze_and_recommend(stack_id: str, forecasts: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> Dict[str, Any]:
     """
-    Analyze stack metrics using AI and provide scaling recommendation.
+    Analyze stack metrics and provide scaling recommendation.
+    
+    ADVISOR_MODE="predictive" decides locally from a CPU / memory forecast
+    (rule-based fallback while history is too short); Gemini is only asked
+    to explain the decision when ADVISOR_LLM_EXPLAIN is on.
+    ADVISOR_MODE="policy" evaluates the stack's declarative scaling policy.
+    ADVISOR_MODE="llm" asks Gemini for the decision itself.
+    Whatever the mode, the target stays within the stack policy's min/max.
     
     Args:
         stack_id: Stack identifier
+        forecasts: Precomputed forecast_stacks() result
     
     Returns:
-        Dict with stack info, metrics, and AI recommendation
+        Dict with stack info, metrics, and recommendation
     """
     try:
-        # Get current stack information
-        stack_info = get_stack_info(stack_id)
-        current_count = stack_info["current_instance_count"]
+        state = _stack_state(stack_id)
+        if "error" in state:
+            return state
         
-        # Get current metrics
-        metrics_data = get_stack_metrics(stack_id)
+        if settings.ADVISOR_MODE == "predictive":
+            recommendation = _local_recommendation(state, forecasts)
+        elif settings.ADVISOR_MODE == "policy":
+            recommendation = evaluate_policies([state])[stack_id]
+        else:
+            # Call Gemini AI for recommendation
+            recommendation = call_gemini_for_recommendation(
+                stack_id=stack_id,
+                current_count=state["current_count"],
+                metrics=state["metrics"],
+                instances=state["instances"]
+            )
         
-        if "error" in metrics_data:
-            # If we can't get metrics, return no_change
-            return {
+        recommendation = clamp_to_policy(recommendation, state["current_count"], state["policy"])
+        return {**state, "recommendation": recommendation}
+    
+    except Exception as e:
+        return _error_result(stack_id, e)
+
+
+def analyze_and_recommend_many(stack_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    analyze_and_recommend for a whole fleet at once.
+    
+    Predictive mode forecasts every stack in one vectorized pass, policy
+    mode evaluates every stack's policy in one vectorized pass; LLM mode
+    sends one batched Gemini prompt per chunk of stacks instead of one
+    request per stack.
+    
+    Returns:
+        {stack_id: same shape as analyze_and_recommend()}
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    states: List[Dict[str, Any]] = []
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.AUTO_SCALING_EVAL_WORKERS, len(stack_ids)))) as executor:
+        futures = {stack_id: executor.submit(_stack_state, stack_id) for stack_id in stack_ids}
+    for stack_id, future in futures.items():
+        try:
+            state = future.result()
+        except Exception as e:
+            results[stack_id] = _error_result(stack_id, e)
+            continue
+        if "error" in state:
+            results[stack_id] = state
+        else:
+            states.append(state)
+    
+    if not states:
+        return results
+    
+    if settings.ADVISOR_MODE == "predictive":
+        forecasts = forecast_stacks([state["stack_id"] for state in states])
+        recommendations = {}
+        for state in states:
+            try:
+                recommendations[state["stack_id"]] = _local_recommendation(state, forecasts)
+            except Exception as e:
+                results[state["stack_id"]] = _error_result(state["stack_id"], e)
+    elif settings.ADVISOR_MODE == "policy":
+        recommendations = evaluate_policies(states)
+    else:
+        recommendations = call_gemini_batch(states)
+    
+    for state in states:
+        if state["stack_id"] in recommendations:
+            recommendation = clamp_to_policy(recommendations[state["stack_id"]], state["current_count"], state["policy"])
+            results[state["stack_id"]] = {**state, "recommendation": recommendation}
+    
+    return results
+
+
+def predictive_recommendation(
+    stack_id: str,
+    current_count: int,
+    metrics: Dict[str, float],
+    forecasts: Optional[Dict[str, Optional[Dict[str, Any]]]] = None,
+    policy: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Local forecast-based recommendation; while history is too short the
+    stack's scaling policy decides (rule-based when it has none).
+    """
+    if forecasts is None:
+        forecasts = forecast_stacks([stack_id])
+    forecast = forecasts.get(stack_id)
+    
+    if forecast is None:
+        if policy is not None:
+            return evaluate_policies([{
                 "stack_id": stack_id,
                 "current_count": current_count,
-                "metrics": {},
-                "recommendation": {
-                    "action": "no_change",
-                    "target_count": current_count,
-                    "reason": f"Unable to fetch metrics: {metrics_data.get('error')}",
-                    "confidence": 0.0
-                },
-                "error": metrics_data.get("error")
-            }
-        
-        metrics = metrics_data.get("metrics", {})
-        
-        # Call Gemini AI for recommendation
-        recommendation = call_gemini_for_recommendation(
-            stack_id=stack_id,
-            current_count=current_count,
-            metrics=metrics
+                "metrics": metrics,
+                "policy": policy
+            }])[stack_id]
+        recommendation = fallback_recommendation(
+            current_count,
+            metrics.get("avg_cpu_percent", 0.0),
+            metrics.get("avg_memory_percent", 0.0)
         )
-        
-        return {
-            "stack_id": stack_id,
-            "current_count": current_count,
-            "metrics": metrics,
-            "recommendation": recommendation
-        }
+        recommendation["source"] = "rules"
+        return recommendation
     
-    except Exception as e:
-        return {
-            "stack_id": stack_id,
-            "error": str(e),
-            "recommendation": {
-                "action": "no_change",
-                "target_count": 1,
-                "reason": f"Error analyzing stack: {str(e)}",
-                "confidence": 0.0
-            }
+    return recommend_from_forecast(current_count, forecast)
+
+
+def _post_gemini(prompt: str, max_output_tokens: int = 256, timeout: float = 30) -> Optional[str]:
+    """
+    Send one prompt to Gemini and return the first candidate's text (None if empty).
+    
+    Raises:
+        requests.exceptions.RequestException: HTTP / network errors
+    """
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={settings.GEMINI_API_KEY}"
+    
+    payload = {
+        "contents": [{
+            "parts": [{"text": prompt}]
+        }],
+        "generationConfig": {
+            "temperature": 0.2,
+            "maxOutputTokens": max_output_tokens,
+            "topP": 0.8,
+            "topK": 10
         }
+    }
+    
+    start = time.perf_counter()
+    try:
+        response = requests.post(url, json=payload, timeout=timeout)
+        response.raise_for_status()
+    except requests.exceptions.RequestException:
+        telemetry.observe_gemini_call("error", time.perf_counter() - start)
+        raise
+    telemetry.observe_gemini_call("success", time.perf_counter() - start)
+    
+    result = response.json()
+    if "candidates" not in result or not result["candidates"]:
+        return None
+    return result["candidates"][0]["content"]["parts"][0]["text"]
+
+
+def explain_recommendation(
+    stack_id: str,
+    current_count: int,
+    metrics: Dict[str, float],
+    recommendation: Dict[str, Any]
+) -> Optional[str]:
+    """
+    Ask Gemini for a short human-readable explanation of a decision that was
+    already made locally. Never changes the decision; None if unavailable.
+    """
+    if not settings.GEMINI_API_KEY:
+        return None
+    
+    prompt = f"""Explain in 2-3 sentences, for an operator, why this scaling decision was made. Do not suggest a different decision.
+
+Stack: {stack_id}
+Current instances: {current_count}
+Current metrics: {json.dumps(metrics)}
+Decision: {recommendation['action']} to {recommendation['target_count']} instance(s)
+Basis: {recommendation['reason']}"""
+    
+    outcome = llm_advisor.call(
+        lambda: _post_gemini(prompt, max_output_tokens=160, timeout=10),
+        fallback_fn=lambda: None,
+        is_success=bool,
+        label=f"explain:{stack_id}"
+    )
+    return outcome["result"].strip() if outcome["result"] else None
 
 
 def call_gemini_for_recommendation(
     stack_id: str,
     current_count: int,
-    metrics: Dict[str, float]
+    metrics: Dict[str, float],
+    instances: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Gemini recommendation memoized by quantized metric state.
+    
+    Answers are reused while (stack, current_count, CPU / memory buckets,
+    policy version) is unchanged; reused answers carry "cached": True.
+    Only valid LLM answers are cached, never errors or fallbacks.
+    
+    The call runs under ADVISOR_LLM_BUDGET_SEC: a slow, failing or
+    circuit-broken LLM yields the rule-based answer immediately
+    ("advisor_path" tells which); a late LLM answer is audited and cached.
+    
+    Returns:
+        Dict with action, target_count, reason, confidence, cached, advisor_path
+    """
+    key = recommendation_key(stack_id, current_count, metrics)
+    cached = recommendation_cache.get(key)
+    if cached is not None:
+        cached["cached"] = True
+        return cached
+    
+    if not settings.GEMINI_API_KEY:
+        return {**_ask_gemini_for_recommendation(stack_id, current_count, metrics, instances), "cached": False}
+    
+    outcome = llm_advisor.call(
+        lambda: _ask_gemini_for_recommendation(stack_id, current_count, metrics, instances),
+        fallback_fn=lambda: _rules_recommendation(current_count, metrics),
+        is_success=_is_llm_answer,
+        label=stack_id,
+        on_late_result=lambda rec: recommendation_cache.put(key, rec)
+    )
+    recommendation = dict(outcome["result"])
+    if outcome["path"] == "llm":
+        recommendation_cache.put(key, recommendation)
+    recommendation["cached"] = False
+    recommendation["advisor_path"] = outcome["path"]
+    return recommendation
+
+
+def _is_llm_answer(recommendation: Dict[str, Any]) -> bool:
+    return recommendation.get("source") == "llm"
+
+
+def _rules_recommendation(current_count: int, metrics: Dict[str, float], note: Optional[str] = None) -> Dict[str, Any]:
+    recommendation = fallback_recommendation(
+        current_count,
+        metrics.get("avg_cpu_percent", 0.0),
+        metrics.get("avg_memory_percent", 0.0)
+    )
+    recommendation["source"] = "rules"
+    if note:
+        recommendation["reason"] += f" ({note})"
+    return recommendation
+
+
+def _ask_gemini_for_recommendation(
+    stack_id: str,
+    current_count: int,
+    metrics: Dict[str, float],
+    instances: Optional[List[Dict[str, Any]]] = None
 ) -> Dict[str, Any]:
     """
     Call Gemini API to analyze metrics and recommend scaling action.
@@ -82,6 +356,7 @@ def call_gemini_for_recommendation(
         stack_id: Stack identifier
         current_count: Current number of instances
         metrics: Dict with avg_cpu_percent, avg_memory_percent, etc.
+        instances: Per-instance breakdown from get_stack_metrics (hottest first)
     
     Returns:
         Dict with action, target_count, reason, confidence
@@ -99,6 +374,7 @@ def call_gemini_for_recommendation(
     # Build prompt for Gemini
     cpu = metrics.get("avg_cpu_percent", 0.0)
     memory = metrics.get("avg_memory_percent", 0.0)
+    capacity = capacity_target(current_count, cpu, memory)
     
     prompt = f"""You are an infrastructure scaling advisor. Analyze the following metrics and recommend a scaling action.
 
@@ -111,10 +387,17 @@ Current infrastructure state:
 Metrics (5-minute average):
 - Average CPU usage: {cpu:.2f}%
 - Average Memory usage: {memory:.2f}%
+- Max / p90 CPU across instances: {metrics.get("max_cpu_percent", cpu):.2f}% / {metrics.get("p90_cpu_percent", cpu):.2f}%
+- Max / p90 Memory across instances: {metrics.get("max_memory_percent", memory):.2f}% / {metrics.get("p90_memory_percent", memory):.2f}%
+- CPU imbalance (max vs mean): {metrics.get("cpu_imbalance", 0.0):.2f}
+{format_instance_breakdown(instances)}
+Capacity estimate (load spread evenly, {settings.CAPACITY_SAFETY_MARGIN:.0%} safety margin):
+- {capacity["need_cpu"]} instance(s) keep CPU at {settings.PREDICTIVE_TARGET_CPU_PERCENT:.0f}%, {capacity["need_memory"]} keep Memory at {settings.PREDICTIVE_TARGET_MEMORY_PERCENT:.0f}%
+- Suggested target_count: {capacity["target_count"]}
 
 Scaling rules:
-1. If CPU > 70% OR Memory > 80%, recommend SCALE_UP by adding 1-2 instances
-2. If CPU < 30% AND Memory < 50% AND current_count > min_instances, recommend SCALE_DOWN by removing 1 instance
+1. If CPU > 70% OR Memory > 80%, recommend SCALE_UP straight to the capacity estimate (at least +1), in one step
+2. If CPU < 30% AND Memory < 50% AND current_count > min_instances, recommend SCALE_DOWN to the capacity estimate
 3. Otherwise, recommend NO_CHANGE
 
 Important constraints:
@@ -131,32 +414,13 @@ Provide your recommendation in JSON format only (no markdown, no explanation tex
 }}"""
     
     # Call Gemini API
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={api_key}"
-    
-    payload = {
-        "contents": [{
-            "parts": [{"text": prompt}]
-        }],
-        "generationConfig": {
-            "temperature": 0.2,
-            "maxOutputTokens": 256,
-            "topP": 0.8,
-            "topK": 10
-        }
-    }
-    
     try:
-        response = requests.post(url, json=payload, timeout=30)
-        response.raise_for_status()
-        
-        result = response.json()
+        text = _post_gemini(prompt)
         
         # Extract text from Gemini response
-        if "candidates" not in result or not result["candidates"]:
+        if text is None:
             return fallback_recommendation(current_count, cpu, memory)
         
-        text = result["candidates"][0]["content"]["parts"][0]["text"]
-        
         # Parse JSON from response (handle markdown code blocks)
         json_match = re.search(r'\{[\s\S]*\}', text)
         if json_match:
@@ -164,6 +428,7 @@ Provide your recommendation in JSON format only (no markdown, no explanation tex
             
             # Validate and sanitize recommendation
             recommendation = validate_recommendation(recommendation, current_count)
+            recommendation["source"] = "llm"
             return recommendation
         else:
             return fallback_recommendation(current_count, cpu, memory)
@@ -191,6 +456,217 @@ Provide your recommendation in JSON format only (no markdown, no explanation tex
         }
 
 
+def format_instance_breakdown(instances: Optional[List[Dict[str, Any]]], limit: int = 10) -> str:
+    """
+    Render the hottest instances as prompt lines (empty string if none)
+    """
+    if not instances:
+        return ""
+    
+    lines = ["Per-instance usage (hottest first):"]
+    for item in instances[:limit]:
+        cpu = item.get("cpu_percent")
+        memory = item.get("memory_percent")
+        cpu_text = "n/a" if cpu is None else f"{cpu:.1f}%"
+        memory_text = "n/a" if memory is None else f"{memory:.1f}%"
+        state = "" if item.get("up") is not False else " (DOWN)"
+        lines.append(f"- {item.get('instance')}: CPU {cpu_text}, Memory {memory_text}{state}")
+    if len(instances) > limit:
+        lines.append(f"- ... {len(instances) - limit} more instance(s)")
+    lines.append("Note: a few hot instances with a low average suggests imbalance rather than a need for more capacity.")
+    return "\n".join(lines) + "\n"
+
+
+def _batch_stack_block(state: Dict[str, Any]) -> str:
+    """
+    Compact per-stack section of the batched prompt
+    """
+    metrics = state["metrics"]
+    cpu = metrics.get("avg_cpu_percent", 0.0)
+    memory = metrics.get("avg_memory_percent", 0.0)
+    hot = ", ".join(
+        f"{item.get('instance')} {item.get('cpu_percent') or 0:.0f}%"
+        for item in (state.get("instances") or [])[:3]
+    )
+    return (
+        f"- stack_id={state['stack_id']} current_count={state['current_count']} "
+        f"cpu_avg={cpu:.1f}% cpu_max={metrics.get('max_cpu_percent', cpu):.1f}% "
+        f"mem_avg={memory:.1f}% mem_max={metrics.get('max_memory_percent', memory):.1f}% "
+        f"capacity_needed={capacity_target(state['current_count'], cpu, memory)['target_count']}"
+        + (f" hottest=[{hot}]" if hot else "")
+    )
+
+
+def chunk_batch(states: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Split stacks into chunks bounded by ADVISOR_BATCH_MAX_STACKS and ADVISOR_BATCH_MAX_PROMPT_CHARS
+    """
+    chunks: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    size = 0
+    for state in states:
+        block = len(_batch_stack_block(state)) + 1
+        if current and (len(current) >= settings.ADVISOR_BATCH_MAX_STACKS
+                        or size + block > settings.ADVISOR_BATCH_MAX_PROMPT_CHARS):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(state)
+        size += block
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def build_batch_prompt(states: List[Dict[str, Any]]) -> str:
+    stacks = "\n".join(_batch_stack_block(state) for state in states)
+    return f"""You are an infrastructure scaling advisor. Recommend a scaling action for EVERY stack below.
+
+Limits for every stack: min instances {settings.SCALE_DOWN_MIN_INSTANCES}, max instances {settings.SCALE_UP_MAX_INSTANCES}.
+
+Stacks (5-minute averages; capacity_needed keeps CPU at {settings.PREDICTIVE_TARGET_CPU_PERCENT:.0f}% and Memory at {settings.PREDICTIVE_TARGET_MEMORY_PERCENT:.0f}% with a {settings.CAPACITY_SAFETY_MARGIN:.0%} margin):
+{stacks}
+
+Scaling rules:
+1. If CPU > 70% OR Memory > 80%, recommend SCALE_UP straight to capacity_needed (at least +1), in one step
+2. If CPU < 30% AND Memory < 50% AND current_count > min_instances, recommend SCALE_DOWN to capacity_needed
+3. Otherwise, recommend NO_CHANGE
+A few hot instances with a low average suggests imbalance rather than a need for more capacity.
+Be conservative. Confidence should be high (>0.7) for actual scaling, lower (<0.6) for no_change.
+
+Answer with a JSON array only (no markdown, no explanation text), one object per stack:
+[
+  {{"stack_id": "<id>", "action": "scale_up" | "scale_down" | "no_change", "target_count": <integer>, "reason": "<brief explanation>", "confidence": <float between 0.0 and 1.0>}}
+]"""
+
+
+def _parse_batch_response(text: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Extract {stack_id: raw entry} from the model's JSON array (empty if unparseable)
+    """
+    if not text:
+        return {}
+    match = re.search(r'\[[\s\S]*\]', text)
+    if not match:
+        return {}
+    try:
+        entries = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(entries, list):
+        return {}
+    return {
+        str(entry["stack_id"]): entry
+        for entry in entries
+        if isinstance(entry, dict) and "stack_id" in entry
+    }
+
+
+def _ask_gemini_batch(chunk: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    One Gemini call for a chunk; every stack gets a validated or fallback answer
+    """
+    error = None
+    try:
+        # ~80 output tokens per stack entry
+        text = _post_gemini(build_batch_prompt(chunk), max_output_tokens=96 + 80 * len(chunk))
+        entries = _parse_batch_response(text)
+    except requests.exceptions.RequestException as e:
+        entries, error = {}, e
+    
+    recommendations = {}
+    for state in chunk:
+        stack_id = state["stack_id"]
+        entry = entries.get(stack_id)
+        if entry is not None and entry.get("action") in ("scale_up", "scale_down", "no_change"):
+            recommendation = validate_recommendation(entry, state["current_count"])
+            recommendation["source"] = "llm"
+        else:
+            note = f"Gemini API error: {error}" if error is not None else None
+            recommendation = _rules_recommendation(state["current_count"], state["metrics"], note)
+        recommendations[stack_id] = recommendation
+    return recommendations
+
+
+def _cache_llm_answers(chunk: List[Dict[str, Any]], answers: Dict[str, Dict[str, Any]]):
+    for state in chunk:
+        recommendation = answers.get(state["stack_id"])
+        if recommendation and _is_llm_answer(recommendation):
+            recommendation_cache.put(
+                recommendation_key(state["stack_id"], state["current_count"], state["metrics"]),
+                recommendation
+            )
+
+
+def _ask_chunk_within_budget(chunk: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    outcome = llm_advisor.call(
+        lambda: _ask_gemini_batch(chunk),
+        fallback_fn=lambda: {
+            state["stack_id"]: _rules_recommendation(state["current_count"], state["metrics"])
+            for state in chunk
+        },
+        is_success=lambda answers: any(_is_llm_answer(rec) for rec in answers.values()),
+        label=f"batch[{chunk[0]['stack_id']}..+{len(chunk) - 1}]",
+        on_late_result=lambda answers: _cache_llm_answers(chunk, answers),
+        summarize=lambda answers: {sid: {"action": r["action"], "target_count": r["target_count"]} for sid, r in answers.items()}
+    )
+    if outcome["path"] == "llm":
+        _cache_llm_answers(chunk, outcome["result"])
+    return {
+        stack_id: {**recommendation, "advisor_path": outcome["path"]}
+        for stack_id, recommendation in outcome["result"].items()
+    }
+
+
+def call_gemini_batch(states: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fleet-wide Gemini recommendations: one request per chunk of stacks.
+    
+    Cached answers are reused first; only the remaining stacks are sent.
+    Entries missing from or invalid in the model's answer fall back to the
+    rule-based recommendation.
+    
+    Args:
+        states: [{"stack_id", "current_count", "metrics", "instances"}]
+    
+    Returns:
+        {stack_id: recommendation with "cached"}
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for state in states:
+        cached = recommendation_cache.get(recommendation_key(state["stack_id"], state["current_count"], state["metrics"]))
+        if cached is not None:
+            cached["cached"] = True
+            results[state["stack_id"]] = cached
+        else:
+            pending.append(state)
+    
+    if not pending:
+        return results
+    
+    if not settings.GEMINI_API_KEY:
+        for state in pending:
+            results[state["stack_id"]] = {
+                "action": "no_change",
+                "target_count": state["current_count"],
+                "reason": "Gemini API key not configured",
+                "confidence": 0.0,
+                "cached": False
+            }
+        return results
+    
+    chunks = chunk_batch(pending)
+    # Each chunk is bounded by the advisor latency budget
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.ADVISOR_BATCH_CONCURRENCY, len(chunks)))) as executor:
+        answers = list(executor.map(_ask_chunk_within_budget, chunks))
+    
+    for answer in answers:
+        for stack_id, recommendation in answer.items():
+            recommendation["cached"] = False
+            results[stack_id] = recommendation
+    return results
+
+
 def validate_recommendation(rec: Dict[str, Any], current_count: int) -> Dict[str, Any]:
     """
     Validate and sanitize AI recommendation.
@@ -233,29 +709,48 @@ def validate_recommendation(rec: Dict[str, Any], current_count: int) -> Dict[str
     }
 
 
+# Trigger thresholds of the rule-based fallback (also the simulator's defaults)
+FALLBACK_THRESHOLDS = {
+    "scale_up_cpu": 70.0,
+    "scale_up_memory": 80.0,
+    "scale_down_cpu": 30.0,
+    "scale_down_memory": 50.0,
+}
+
+
 def fallback_recommendation(current_count: int, cpu: float, memory: float) -> Dict[str, Any]:
     """
     Fallback rule-based recommendation when AI is unavailable.
     
-    Simple heuristic:
-    - CPU > 70% or Memory > 80%: scale up
-    - CPU < 30% and Memory < 50% and count > 1: scale down
+    Simple heuristic, sized by the capacity calculator (one step to the target):
+    - CPU > 70% or Memory > 80%: scale up to the needed capacity (at least +1)
+    - CPU < 30% and Memory < 50%: scale down to the needed capacity
     - Otherwise: no change
     """
-    if cpu > 70.0 or memory > 80.0:
-        target = min(current_count + 1, settings.SCALE_UP_MAX_INSTANCES)
+    capacity = capacity_target(current_count, cpu, memory)
+    needed = capacity["target_count"]
+    
+    if cpu > FALLBACK_THRESHOLDS["scale_up_cpu"] or memory > FALLBACK_THRESHOLDS["scale_up_memory"]:
+        if current_count >= settings.SCALE_UP_MAX_INSTANCES:
+            return {
+                "action": "no_change",
+                "target_count": current_count,
+                "reason": f"High resource usage (CPU: {cpu:.1f}%, Mem: {memory:.1f}%) but already at max instances - using fallback rules",
+                "confidence": 0.6
+            }
+        target = min(max(current_count + 1, needed), settings.SCALE_UP_MAX_INSTANCES)
         return {
             "action": "scale_up",
             "target_count": target,
-            "reason": f"High resource usage (CPU: {cpu:.1f}%, Mem: {memory:.1f}%) - using fallback rules",
+            "reason": f"High resource usage (CPU: {cpu:.1f}%, Mem: {memory:.1f}%) - {target} instance(s) needed by {capacity['limiting']} - using fallback rules",
             "confidence": 0.8
         }
-    elif cpu < 30.0 and memory < 50.0 and current_count > settings.SCALE_DOWN_MIN_INSTANCES:
-        target = max(current_count - 1, settings.SCALE_DOWN_MIN_INSTANCES)
+    elif (cpu < FALLBACK_THRESHOLDS["scale_down_cpu"] and memory < FALLBACK_THRESHOLDS["scale_down_memory"]
+          and needed < current_count):
         return {
             "action": "scale_down",
-            "target_count": target,
-            "reason": f"Low resource usage (CPU: {cpu:.1f}%, Mem: {memory:.1f}%) - using fallback rules",
+            "target_count": needed,
+            "reason": f"Low resource usage (CPU: {cpu:.1f}%, Mem: {memory:.1f}%) - {needed} instance(s) suffice - using fallback rules",
             "confidence": 0.7
         }
     else:
@@ -265,5 +760,3 @@ def fallback_recommendation(current_count: int, cpu: float, memory: float) -> Di
             "reason": f"Resource usage within normal range (CPU: {cpu:.1f}%, Mem: {memory:.1f}%) - using fallback rules",
             "confidence": 0.6
         }
-
-
@@ -0,0 +1,294 @@
+"""
+AWS Client - boto3 clients dùng chung, có đo đạc và throttling phía client
+
+Mọi lời gọi AWS của ec2_service / keypair_manager đi qua aws_call():
+- Đếm số lời gọi, lỗi, throttle theo (region, operation)
+- Histogram độ trễ
+- Token bucket thích ứng theo region (AIMD): giảm tốc ngay khi AWS
+  trả về RequestLimitExceeded, tăng dần lại khi các lời gọi thành công
+"""
+
+import time
+import random
+import threading
+from typing import Dict, Any, Optional, Tuple
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from ..core.config import settings
+from ..core import telemetry
+
+
+THROTTLE_ERROR_CODES = {
+    "RequestLimitExceeded",
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "SlowDown",
+}
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket whose refill rate adapts to throttling (AIMD).
+
+    - Throttled call: rate is multiplied by `decrease_factor`
+    - Successful call: rate grows by `increase_step` tokens/sec
+    The rate always stays within [min_rate, max_rate].
+    """
+
+    def __init__(self,
+                 rate: float,
+                 burst: float,
+                 min_rate: float = 0.5,
+                 max_rate: Optional[float] = None,
+                 decrease_factor: float = 0.5,
+                 increase_step: float = 0.1):
+        self.max_rate = max_rate or rate
+        self.min_rate = min(min_rate, self.max_rate)
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.tokens = self.burst
+        self.throttle_events = 0
+        self.total_wait_sec = 0.0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """
+        Block until one token is available
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return
+                wait = (1.0 - self.tokens) / self.rate
+                self.total_wait_sec += wait
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            self.tokens = 0.0
+            self.throttle_events += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "rate_per_sec": round(self.rate, 3),
+                "max_rate_per_sec": self.max_rate,
+                "burst": self.burst,
+                "throttle_events": self.throttle_events,
+                "total_wait_sec": round(self.total_wait_sec, 3)
+            }
+
+
+class AwsCallStats:
+    """Thread-safe counters and latency histograms per (region, operation)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+    def record(self, region: str, operation: str, latency: float, outcome: str):
+        """
+        Args:
+            outcome: "success" | "throttled" | "error"
+        """
+        with self._lock:
+            entry = self._stats.get((region, operation))
+            if entry is None:
+                entry = {
+                    "calls": 0,
+                    "errors": 0,
+                    "throttles": 0,
+                    "latency_sum_sec": 0.0,
+                    "latency_max_sec": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS)
+                }
+                self._stats[(region, operation)] = entry
+
+            entry["calls"] += 1
+            if outcome == "throttled":
+                entry["throttles"] += 1
+            elif outcome == "error":
+                entry["errors"] += 1
+            entry["latency_sum_sec"] += latency
+            entry["latency_max_sec"] = max(entry["latency_max_sec"], latency)
+            for i, upper in enumerate(LATENCY_BUCKETS):
+                if latency <= upper:
+                    entry["buckets"][i] += 1
+                    break
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            {
+                "operations": [{region, operation, calls, errors, throttles, avg/max latency, histogram}],
+                "regions": {region: {calls, errors, throttles}}
+            }
+        """
+        with self._lock:
+            operations = []
+            regions: Dict[str, Dict[str, int]] = {}
+            for (region, operation), entry in sorted(self._stats.items()):
+                histogram = {}
+                cumulative = 0
+                for upper, count in zip(LATENCY_BUCKETS, entry["buckets"]):
+                    cumulative += count
+                    histogram["+Inf" if upper == float("inf") else str(upper)] = cumulative
+
+                operations.append({
+                    "region": region,
+                    "operation": operation,
+                    "calls": entry["calls"],
+                    "errors": entry["errors"],
+                    "throttles": entry["throttles"],
+                    "avg_latency_sec": round(entry["latency_sum_sec"] / entry["calls"], 4),
+                    "max_latency_sec": round(entry["latency_max_sec"], 4),
+                    "latency_histogram": histogram
+                })
+
+                region_totals = regions.setdefault(region, {"calls": 0, "errors": 0, "throttles": 0})
+                region_totals["calls"] += entry["calls"]
+                region_totals["errors"] += entry["errors"]
+                region_totals["throttles"] += entry["throttles"]
+
+            return {"operations": operations, "regions": regions}
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+aws_call_stats = AwsCallStats()
+
+_clients: Dict[Tuple[str, str], Any] = {}
+_buckets: Dict[str, AdaptiveTokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def get_client(service: str, region: str):
+    """
+    Get a cached boto3 client (clients are thread-safe, creating them is not).
+
+    botocore's own retries are disabled so every attempt - including
+    throttled ones - is visible to aws_call().
+    """
+    key = (service, region)
+    client = _clients.get(key)
+    if client is None:
+        with _registry_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = boto3.session.Session().client(
+                    service,
+                    region_name=region,
+                    endpoint_url=settings.AWS_ENDPOINT_URL,
+                    config=Config(retries={"total_max_attempts": 1, "mode": "standard"})
+                )
+                _clients[key] = client
+    return client
+
+
+def get_region_bucket(region: str) -> AdaptiveTokenBucket:
+    bucket = _buckets.get(region)
+    if bucket is None:
+        with _registry_lock:
+            bucket = _buckets.get(region)
+            if bucket is None:
+                bucket = AdaptiveTokenBucket(
+                    rate=settings.AWS_API_RATE_PER_SEC,
+                    burst=settings.AWS_API_BURST,
+                    min_rate=settings.AWS_API_MIN_RATE_PER_SEC
+                )
+                _buckets[region] = bucket
+    return bucket
+
+
+def is_throttle_error(error: Exception) -> bool:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code") in THROTTLE_ERROR_CODES
+    return False
+
+
+def aws_call(region: str, operation: str, service: str = "ec2", **kwargs) -> Dict[str, Any]:
+    """
+    Call a boto3 operation with rate limiting, instrumentation and
+    throttle retries (exponential backoff with jitter).
+
+    Args:
+        region: AWS region
+        operation: boto3 method name, e.g. "describe_instances"
+        service: boto3 service name (default "ec2")
+        **kwargs: Operation parameters
+
+    Returns:
+        Raw boto3 response
+
+    Raises:
+        botocore ClientError / other exceptions from the final attempt
+    """
+    client = get_client(service, region)
+    method = getattr(client, operation)
+    bucket = get_region_bucket(region)
+    max_retries = settings.AWS_API_MAX_RETRIES
+
+    attempt = 0
+    while True:
+        bucket.acquire()
+        start = time.perf_counter()
+        try:
+            response = method(**kwargs)
+        except Exception as e:
+            latency = time.perf_counter() - start
+            if is_throttle_error(e):
+                aws_call_stats.record(region, operation, latency, "throttled")
+                telemetry.observe_aws_call(region, operation, "throttled", latency)
+                bucket.on_throttle()
+                if attempt < max_retries:
+                    attempt += 1
+                    time.sleep(random.uniform(0, min(20.0, 0.2 * (2 ** attempt))))
+                    continue
+            else:
+                aws_call_stats.record(region, operation, latency, "error")
+                telemetry.observe_aws_call(region, operation, "error", latency)
+            raise
+
+        latency = time.perf_counter() - start
+        aws_call_stats.record(region, operation, latency, "success")
+        telemetry.observe_aws_call(region, operation, "success", latency)
+        bucket.on_success()
+        return response
+
+
+def get_aws_api_metrics() -> Dict[str, Any]:
+    """
+    Snapshot of AWS call counters, latency histograms and token bucket state
+    """
+    with _registry_lock:
+        buckets = {region: bucket.snapshot() for region, bucket in sorted(_buckets.items())}
+
+    return {
+        **aws_call_stats.snapshot(),
+        "rate_limiters": buckets
+    }
@@ -0,0 +1,72 @@
+"""
+Capacity - Tính số instance cần thiết trong một bước (jump-to-target)
+
+- Giả định tải chia đều: count x utilisation là hằng số, nên
+  cần = ceil(count x utilisation / target x (1 + CAPACITY_SAFETY_MARGIN))
+- Utilisation lệch khỏi target không quá SCALING_TOLERANCE thì giữ nguyên
+- Kết quả được giới hạn trong [min, max]; một spike 4 -> 12 instance
+  chỉ cần một lần terraform apply thay vì tám lần +1
+"""
+
+import numpy as np
+from typing import Dict, Any, Optional
+from ..core.config import settings
+
+
+def required_capacity(counts: np.ndarray,
+                      utilisation: np.ndarray,
+                      target: np.ndarray,
+                      margin: Optional[float] = None,
+                      tolerance: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Instances needed so each metric lands at its target (vectorized).
+
+    Args:
+        counts: Current instance counts
+        utilisation: Current (or forecast) utilisation, same unit as target
+        target: Target utilisation
+        margin: Extra headroom on the computed capacity (default CAPACITY_SAFETY_MARGIN)
+        tolerance: Relative band around the target that keeps the count (default SCALING_TOLERANCE)
+
+    Returns:
+        Float array of required counts (NaN where utilisation is NaN), unbounded
+    """
+    margin = settings.CAPACITY_SAFETY_MARGIN if margin is None else margin
+    tolerance = settings.SCALING_TOLERANCE if tolerance is None else tolerance
+    counts = np.maximum(np.asarray(counts, dtype=float), 1.0)
+    ratio = np.asarray(utilisation, dtype=float) / np.asarray(target, dtype=float)
+    # The small epsilon keeps exact multiples (e.g. 4 x 90 / 60 = 6) from rounding up
+    needed = np.ceil(counts * ratio * (1.0 + margin) - 1e-9)
+    return np.where(np.abs(ratio - 1.0) <= tolerance, counts, needed)
+
+
+def capacity_target(current_count: int,
+                    cpu: float,
+                    memory: float,
+                    min_instances: Optional[int] = None,
+                    max_instances: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Instance count that keeps CPU and memory at their utilisation targets.
+
+    Args:
+        current_count: Current number of instances
+        cpu: Average CPU % across instances
+        memory: Average memory % across instances
+        min_instances / max_instances: Bounds (default SCALE_DOWN_MIN / SCALE_UP_MAX)
+
+    Returns:
+        {"target_count", "need_cpu", "need_memory", "limiting": "cpu" | "memory"}
+    """
+    lower = settings.SCALE_DOWN_MIN_INSTANCES if min_instances is None else min_instances
+    upper = settings.SCALE_UP_MAX_INSTANCES if max_instances is None else max_instances
+    need_cpu, need_memory = required_capacity(
+        np.array([current_count, current_count]),
+        np.array([cpu, memory]),
+        np.array([settings.PREDICTIVE_TARGET_CPU_PERCENT, settings.PREDICTIVE_TARGET_MEMORY_PERCENT])
+    )
+    return {
+        "target_count": int(np.clip(max(need_cpu, need_memory), lower, upper)),
+        "need_cpu": int(need_cpu),
+        "need_memory": int(need_memory),
+        "limiting": "cpu" if need_cpu >= need_memory else "memory"
+    }
@@ -1,8 +1,9 @@
 import json
-import subprocess
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-from .scaling_service import get_stack_info
+from .scaling_service import get_stack_info, get_terraform_outputs
+from botocore.exceptions import ClientError
+from .aws_client import aws_call
 from ..core.config import settings
 
 
@@ -23,20 +24,19 @@ def get_instance_details(stack_id: str) -> List[Dict[str, Any]]:
     
     region = metadata.get("region", settings.DEFAULT_REGION)
     
-    # Get Terraform outputs
-    from .terraform import run, build_aws_env
-    aws_env = build_aws_env(region=region)
-    
-    try:
-        p = run([settings.TF_BIN, "output", "-json"], cwd=workdir, extra_env=aws_env)
-        outputs = json.loads(p.stdout) if p.returncode == 0 else {}
-    except Exception:
-        outputs = {}
+    # Get Terraform outputs (cached until tfstate changes)
+    outputs = get_terraform_outputs(stack_id, region)
     
     instance_ids = outputs.get("instance_ids", {}).get("value", [])
     instance_ips = outputs.get("instance_public_ip", {}).get("value", [])
     instance_dns = outputs.get("instance_dns", {}).get("value", [])
     
+    # One DescribeInstances call for the whole stack
+    try:
+        statuses = get_instance_statuses(instance_ids, region)
+    except Exception:
+        statuses = {}
+    
     instances = []
     for i, instance_id in enumerate(instance_ids):
         instance_data = {
@@ -47,18 +47,39 @@ def get_instance_details(stack_id: str) -> List[Dict[str, Any]]:
             "name": f"{metadata['context']['name_prefix']}-{i + 1}"
         }
         
-        # Get current status from AWS
-        try:
-            status = get_instance_status(instance_id, region)
-            instance_data["status"] = status
-        except Exception:
-            instance_data["status"] = "unknown"
+        instance_data["status"] = statuses.get(instance_id, "unknown")
         
         instances.append(instance_data)
     
     return instances
 
 
+def get_instance_statuses(instance_ids: List[str], region: str) -> Dict[str, str]:
+    """
+    Get the current status of several EC2 instances with one API call.
+    
+    Returns:
+        Dict instance_id -> state (running, stopped, ...)
+    """
+    if not instance_ids:
+        return {}
+    
+    statuses = {}
+    request_kwargs = {"InstanceIds": list(instance_ids)}
+    while True:
+        response = aws_call(region, "describe_instances", **request_kwargs)
+        for reservation in response.get("Reservations", []):
+            for instance in reservation.get("Instances", []):
+                statuses[instance["InstanceId"]] = instance.get("State", {}).get("Name", "unknown")
+        
+        next_token = response.get("NextToken")
+        if not next_token:
+            break
+        request_kwargs["NextToken"] = next_token
+    
+    return statuses
+
+
 def get_instance_status(instance_id: str, region: str) -> str:
     """
     Get the current status of an EC2 instance.
@@ -67,73 +88,63 @@ def get_instance_status(instance_id: str, region: str) -> str:
         Instance state (running, stopped, stopping, starting, etc.)
     """
     try:
-        cmd = [
-            "aws", "ec2", "describe-instances",
-            "--instance-ids", instance_id,
-            "--region", region,
-            "--query", "Reservations[0].Instances[0].State.Name",
-            "--output", "text"
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        
-        if result.returncode == 0:
-            return result.stdout.strip()
-        else:
-            return "error"
+        statuses = get_instance_statuses([instance_id], region)
+        return statuses.get(instance_id, "error")
+    except ClientError:
+        return "error"
     except Exception:
         return "unknown"
 
 
-def start_instance(instance_id: str, region: str) -> Dict[str, Any]:
+def _state_change_action(instance_id: str, region: str, action: str, operation: str, result_key: str) -> Dict[str, Any]:
     """
-    Start an EC2 instance.
-    
-    Returns:
-        Dict with success status and details
+    Run start/stop on one instance and report the state transition.
     """
+    verb = {"start": "starting", "stop": "stopping"}[action]
+    
     try:
-        cmd = [
-            "aws", "ec2", "start-instances",
-            "--instance-ids", instance_id,
-            "--region", region
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        response_data = aws_call(region, operation, InstanceIds=[instance_id])
+        changed_instances = response_data.get(result_key, [])
         
-        if result.returncode == 0:
-            response_data = json.loads(result.stdout)
-            starting_instances = response_data.get("StartingInstances", [])
-            
-            if starting_instances:
-                instance = starting_instances[0]
-                return {
-                    "success": True,
-                    "instance_id": instance_id,
-                    "action": "start",
-                    "current_state": instance.get("CurrentState", {}).get("Name", "unknown"),
-                    "previous_state": instance.get("PreviousState", {}).get("Name", "unknown"),
-                    "message": f"Instance {instance_id} start initiated"
-                }
+        if changed_instances:
+            instance = changed_instances[0]
+            return {
+                "success": True,
+                "instance_id": instance_id,
+                "action": action,
+                "current_state": instance.get("CurrentState", {}).get("Name", "unknown"),
+                "previous_state": instance.get("PreviousState", {}).get("Name", "unknown"),
+                "message": f"Instance {instance_id} {action} initiated"
+            }
         
         return {
             "success": False,
             "instance_id": instance_id,
-            "action": "start",
-            "error": result.stderr or "Unknown error",
-            "message": f"Failed to start instance {instance_id}"
+            "action": action,
+            "error": "Unknown error",
+            "message": f"Failed to {action} instance {instance_id}"
         }
         
     except Exception as e:
         return {
             "success": False,
             "instance_id": instance_id,
-            "action": "start",
+            "action": action,
             "error": str(e),
-            "message": f"Exception while starting instance {instance_id}"
+            "message": f"Exception while {verb} instance {instance_id}"
         }
 
 
+def start_instance(instance_id: str, region: str) -> Dict[str, Any]:
+    """
+    Start an EC2 instance.
+    
+    Returns:
+        Dict with success status and details
+    """
+    return _state_change_action(instance_id, region, "start", "start_instances", "StartingInstances")
+
+
 def stop_instance(instance_id: str, region: str) -> Dict[str, Any]:
     """
     Stop an EC2 instance.
@@ -141,46 +152,7 @@ def stop_instance(instance_id: str, region: str) -> Dict[str, Any]:
     Returns:
         Dict with success status and details
     """
-    try:
-        cmd = [
-            "aws", "ec2", "stop-instances",
-            "--instance-ids", instance_id,
-            "--region", region
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        
-        if result.returncode == 0:
-            response_data = json.loads(result.stdout)
-            stopping_instances = response_data.get("StoppingInstances", [])
-            
-            if stopping_instances:
-                instance = stopping_instances[0]
-                return {
-                    "success": True,
-                    "instance_id": instance_id,
-                    "action": "stop",
-                    "current_state": instance.get("CurrentState", {}).get("Name", "unknown"),
-                    "previous_state": instance.get("PreviousState", {}).get("Name", "unknown"),
-                    "message": f"Instance {instance_id} stop initiated"
-                }
-        
-        return {
-            "success": False,
-            "instance_id": instance_id,
-            "action": "stop",
-            "error": result.stderr or "Unknown error",
-            "message": f"Failed to stop instance {instance_id}"
-        }
-        
-    except Exception as e:
-        return {
-            "success": False,
-            "instance_id": instance_id,
-            "action": "stop",
-            "error": str(e),
-            "message": f"Exception while stopping instance {instance_id}"
-        }
+    return _state_change_action(instance_id, region, "stop", "stop_instances", "StoppingInstances")
 
 
 def reboot_instance(instance_id: str, region: str) -> Dict[str, Any]:
@@ -191,28 +163,12 @@ def reboot_instance(instance_id: str, region: str) -> Dict[str, Any]:
         Dict with success status and details
     """
     try:
-        cmd = [
-            "aws", "ec2", "reboot-instances",
-            "--instance-ids", instance_id,
-            "--region", region
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
-        
-        if result.returncode == 0:
-            return {
-                "success": True,
-                "instance_id": instance_id,
-                "action": "reboot",
-                "message": f"Instance {instance_id} reboot initiated"
-            }
-        
+        aws_call(region, "reboot_instances", InstanceIds=[instance_id])
         return {
-            "success": False,
+            "success": True,
             "instance_id": instance_id,
             "action": "reboot",
-            "error": result.stderr or "Unknown error",
-            "message": f"Failed to reboot instance {instance_id}"
+            "message": f"Instance {instance_id} reboot initiated"
         }
         
     except Exception as e:
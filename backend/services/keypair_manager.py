@@ -4,16 +4,63 @@ Keypair Manager - Quản lý SSH keypairs per-instance
 Mỗi EC2 instance sẽ có keypair riêng với tên: <name_prefix>-vm-<number>.pem
 """
 
-import boto3
 import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterable
 from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ed25519
 from cryptography.hazmat.backends import default_backend
+from botocore.exceptions import ClientError
+from .aws_client import aws_call
 from ..core.config import settings
 
 
+# Process pool dùng chung cho việc sinh RSA key (CPU-bound, không bị GIL chặn)
+_keygen_pool: Optional[ProcessPoolExecutor] = None
+_keygen_pool_lock = threading.Lock()
+
+
+def _get_keygen_pool() -> ProcessPoolExecutor:
+    """
+    Lazily create the shared key generation process pool.
+    
+    Uses the "spawn" start method so worker processes never inherit
+    scheduler / uvicorn threads from the parent.
+    """
+    global _keygen_pool
+    with _keygen_pool_lock:
+        if _keygen_pool is None:
+            _keygen_pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.KEYPAIR_GEN_WORKERS),
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _keygen_pool
+
+
+def _reset_keygen_pool():
+    """Drop a broken pool so the next call starts fresh workers"""
+    global _keygen_pool
+    with _keygen_pool_lock:
+        if _keygen_pool is not None:
+            _keygen_pool.shutdown(wait=False, cancel_futures=True)
+        _keygen_pool = None
+
+
+def shutdown_keygen_pool():
+    """
+    Shutdown the key generation process pool (on application shutdown).
+    """
+    global _keygen_pool
+    with _keygen_pool_lock:
+        if _keygen_pool is not None:
+            _keygen_pool.shutdown(wait=True, cancel_futures=True)
+            _keygen_pool = None
+
+
 def generate_rsa_keypair() -> tuple[str, str]:
     """
     Generate RSA 2048-bit keypair
@@ -44,11 +91,102 @@ def generate_rsa_keypair() -> tuple[str, str]:
     return private_pem, public_openssh
 
 
+def generate_ed25519_keypair() -> tuple[str, str]:
+    """
+    Generate Ed25519 keypair
+    
+    Ed25519 private keys can't be written in TraditionalOpenSSL format,
+    so the private key is saved in OpenSSH format (ssh / paramiko read it).
+    
+    Returns:
+        (private_key_openssh, public_key_openssh)
+    """
+    private_key = ed25519.Ed25519PrivateKey.generate()
+    
+    private_openssh = private_key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.OpenSSH,
+        encryption_algorithm=serialization.NoEncryption()
+    ).decode('utf-8')
+    
+    public_openssh = private_key.public_key().public_bytes(
+        encoding=serialization.Encoding.OpenSSH,
+        format=serialization.PublicFormat.OpenSSH
+    ).decode('utf-8')
+    
+    return private_openssh, public_openssh
+
+
+SUPPORTED_KEY_TYPES = ("rsa", "ed25519")
+
+
+def generate_keypair(key_type: str = "rsa") -> tuple[str, str]:
+    """
+    Generate keypair of the given type ("rsa" or "ed25519")
+    
+    Returns:
+        (private_key, public_key_openssh)
+    """
+    if key_type == "rsa":
+        return generate_rsa_keypair()
+    if key_type == "ed25519":
+        return generate_ed25519_keypair()
+    raise ValueError(f"Unsupported key_type: {key_type}. Must be one of: {', '.join(SUPPORTED_KEY_TYPES)}")
+
+
+def _key_name(name_prefix: str, instance_index: int) -> str:
+    return f"{name_prefix}-vm-{instance_index}"
+
+
+def _private_key_dir(stack_id: str) -> Path:
+    """
+    Ensure <workdir>/private-key exists with 700 permissions
+    """
+    private_key_dir = settings.TF_WORK_ROOT / stack_id / "private-key"
+    private_key_dir.mkdir(parents=True, exist_ok=True)
+    private_key_dir.chmod(0o700)
+    return private_key_dir
+
+
+def _write_private_key(pem_path: Path, private_pem: str):
+    pem_path.write_text(private_pem, encoding='utf-8')
+    pem_path.chmod(0o600)
+
+
+def _import_public_key(
+    region: str,
+    key_name: str,
+    public_openssh: str
+) -> Dict[str, Any]:
+    """
+    Replace (describe -> delete -> import) the AWS key pair with a new public key.
+    
+    Returns:
+        Raw import_key_pair response
+    """
+    # Check if key already exists and delete it
+    try:
+        existing_keys = aws_call(region, "describe_key_pairs", KeyNames=[key_name])
+        if existing_keys['KeyPairs']:
+            aws_call(region, "delete_key_pair", KeyName=key_name)
+    except ClientError:
+        pass  # Key doesn't exist, that's fine
+    
+    # Create new key pair
+    return aws_call(
+        region,
+        "import_key_pair",
+        KeyName=key_name,
+        PublicKeyMaterial=public_openssh.encode('utf-8')
+    )
+
+
 def create_keypair_for_instance(
     stack_id: str,
     instance_index: int,
     name_prefix: str,
-    region: str
+    region: str,
+    key_type: str = "rsa"
 ) -> Dict[str, Any]:
     """
     Tạo keypair riêng cho 1 instance
@@ -58,6 +196,7 @@ def create_keypair_for_instance(
         instance_index: 1, 2, 3, ...
         name_prefix: "my-app"
         region: "ap-southeast-2"
+        key_type: "rsa" | "ed25519"
     
     Returns:
         {
@@ -67,47 +206,30 @@ def create_keypair_for_instance(
             "pem_path": "/path/to/my-app-vm-1.pem"
         }
     """
-    key_name = f"{name_prefix}-vm-{instance_index}"
-    workdir = settings.TF_WORK_ROOT / stack_id
-    private_key_dir = workdir / "private-key"
-    private_key_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Set directory permissions to 700
-    private_key_dir.chmod(0o700)
-    
-    pem_path = private_key_dir / f"{key_name}.pem"
+    key_name = _key_name(name_prefix, instance_index)
+    pem_path = _private_key_dir(stack_id) / f"{key_name}.pem"
     
     try:
-        # Generate keypair
-        private_pem, public_openssh = generate_rsa_keypair()
+        # Take a pre-generated RSA keypair if available, otherwise generate now
+        keypair = None
+        if key_type == "rsa":
+            from .keypair_reservoir import keypair_reservoir
+            keypair = keypair_reservoir.take()
+        private_pem, public_openssh = keypair or generate_keypair(key_type)
         
         # Save private key to file
-        pem_path.write_text(private_pem, encoding='utf-8')
-        pem_path.chmod(0o600)
+        _write_private_key(pem_path, private_pem)
         
         # Import public key to AWS
-        ec2 = boto3.client('ec2', region_name=region)
-        
-        # Check if key already exists and delete it
-        try:
-            existing_keys = ec2.describe_key_pairs(KeyNames=[key_name])
-            if existing_keys['KeyPairs']:
-                ec2.delete_key_pair(KeyName=key_name)
-        except ec2.exceptions.ClientError:
-            pass  # Key doesn't exist, that's fine
-        
-        # Create new key pair
-        response = ec2.import_key_pair(
-            KeyName=key_name,
-            PublicKeyMaterial=public_openssh.encode('utf-8')
-        )
+        response = _import_public_key(region, key_name, public_openssh)
         
         return {
             "success": True,
             "key_name": key_name,
             "key_id": response.get('KeyId'),
             "pem_path": str(pem_path),
-            "fingerprint": response.get('KeyFingerprint')
+            "fingerprint": response.get('KeyFingerprint'),
+            "key_type": key_type
         }
     except Exception as e:
         return {
@@ -117,29 +239,183 @@ def create_keypair_for_instance(
         }
 
 
-def delete_keypair_for_instance(
+def _generate_keypairs(
+    indices: List[int],
+    key_type: str
+) -> tuple[Dict[int, tuple[str, str]], Dict[int, str]]:
+    """
+    Generate one keypair per index.
+    
+    RSA goes through the process pool (CPU-bound); Ed25519 is generated
+    inline since it is cheaper than the inter-process round-trip.
+    
+    Returns:
+        ({index: (private_key, public_key)}, {index: error})
+    """
+    generated: Dict[int, tuple[str, str]] = {}
+    errors: Dict[int, str] = {}
+    
+    if key_type == "rsa" and indices:
+        try:
+            pool = _get_keygen_pool()
+            futures = {pool.submit(generate_keypair, key_type): i for i in indices}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    generated[i] = future.result()
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        _reset_keygen_pool()
+                    errors[i] = str(e)
+            return generated, errors
+        except Exception:
+            # Pool could not be started at all - fall back to in-process generation
+            pass
+    
+    for i in indices:
+        if i in generated or i in errors:
+            continue
+        try:
+            generated[i] = generate_keypair(key_type)
+        except Exception as e:
+            errors[i] = str(e)
+    
+    return generated, errors
+
+
+def create_keypairs_for_instances(
     stack_id: str,
-    instance_index: int,
+    instance_indices: Iterable[int],
     name_prefix: str,
-    region: str
+    region: str,
+    key_type: str = "rsa"
 ) -> Dict[str, Any]:
     """
-    Xóa keypair của 1 instance (khi scale down)
+    Tạo keypairs cho nhiều instances song song (deploy / scale up)
+    
+    - RSA keys come from the pre-generated reservoir first; the rest are
+      generated in a process pool (KEYPAIR_GEN_WORKERS)
+    - Ed25519 keys are cheap to generate and are created inline
+    - AWS describe/delete/import calls run on a thread pool
+      (KEYPAIR_AWS_CONCURRENCY), rate limited per region by aws_call()
+    - If any key fails, every key created by this call is rolled back
+    
+    Returns:
+        {
+            "success": True/False,
+            "created": [<create_keypair_for_instance result>, ...],
+            "failed": [{"key_name", "instance_index", "error"}, ...],
+            "rolled_back": ["my-app-vm-3", ...],
+            "rollback_errors": [...]
+        }
     """
-    key_name = f"{name_prefix}-vm-{instance_index}"
-    workdir = settings.TF_WORK_ROOT / stack_id
-    pem_path = workdir / "private-key" / f"{key_name}.pem"
+    indices = sorted(set(instance_indices))
+    created: List[Dict[str, Any]] = []
+    failed: List[Dict[str, Any]] = []
+    
+    if not indices:
+        return {"success": True, "created": [], "failed": [], "rolled_back": [], "rollback_errors": []}
+    
+    if key_type not in SUPPORTED_KEY_TYPES:
+        failed = [
+            {"key_name": _key_name(name_prefix, i), "instance_index": i, "error": f"Unsupported key_type: {key_type}"}
+            for i in indices
+        ]
+        return {"success": False, "created": [], "failed": failed, "rolled_back": [], "rollback_errors": []}
+    
+    private_key_dir = _private_key_dir(stack_id)
+    
+    # 1) Take ready keys from the reservoir, generate the rest
+    reserved = []
+    if key_type == "rsa":
+        from .keypair_reservoir import keypair_reservoir
+        reserved = keypair_reservoir.take_many(len(indices))
+    generated: Dict[int, tuple[str, str]] = dict(zip(indices, reserved))
+    
+    fresh, generation_errors = _generate_keypairs(indices[len(reserved):], key_type)
+    generated.update(fresh)
+    for i, error in generation_errors.items():
+        failed.append({
+            "key_name": _key_name(name_prefix, i),
+            "instance_index": i,
+            "error": f"Key generation failed: {error}"
+        })
+    
+    # 2) Save private keys and import public keys concurrently
+    def provision(i: int) -> Dict[str, Any]:
+        key_name = _key_name(name_prefix, i)
+        pem_path = private_key_dir / f"{key_name}.pem"
+        private_pem, public_openssh = generated[i]
+        try:
+            _write_private_key(pem_path, private_pem)
+            response = _import_public_key(region, key_name, public_openssh)
+            return {
+                "success": True,
+                "key_name": key_name,
+                "instance_index": i,
+                "key_id": response.get('KeyId'),
+                "pem_path": str(pem_path),
+                "fingerprint": response.get('KeyFingerprint'),
+                "key_type": key_type
+            }
+        except Exception as e:
+            if pem_path.exists():
+                pem_path.unlink()
+            return {
+                "success": False,
+                "key_name": key_name,
+                "instance_index": i,
+                "error": str(e)
+            }
+    
+    if generated:
+        workers = max(1, min(settings.KEYPAIR_AWS_CONCURRENCY, len(generated)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for result in executor.map(provision, sorted(generated)):
+                if result["success"]:
+                    created.append(result)
+                else:
+                    failed.append({
+                        "key_name": result["key_name"],
+                        "instance_index": result["instance_index"],
+                        "error": result["error"]
+                    })
+    
+    if not failed:
+        return {"success": True, "created": created, "failed": [], "rolled_back": [], "rollback_errors": []}
+    
+    # 3) Roll back partially created keys
+    rollback = delete_keypairs_for_instances(
+        stack_id=stack_id,
+        instance_indices=[r["instance_index"] for r in created],
+        name_prefix=name_prefix,
+        region=region
+    )
+    
+    return {
+        "success": False,
+        "created": [],
+        "failed": sorted(failed, key=lambda f: f["instance_index"]),
+        "rolled_back": rollback["deleted"],
+        "rollback_errors": [f"{f['key_name']}: {f['error']}" for f in rollback["failed"]]
+    }
+
+
+def _delete_keypair(region: str, stack_id: str, key_name: str) -> Dict[str, Any]:
+    """
+    Delete one key pair from AWS and its local .pem file
+    """
+    pem_path = settings.TF_WORK_ROOT / stack_id / "private-key" / f"{key_name}.pem"
     
     deleted_file = False
     deleted_aws_key = False
     
     try:
         # Delete from AWS
-        ec2 = boto3.client('ec2', region_name=region)
         try:
-            ec2.delete_key_pair(KeyName=key_name)
+            aws_call(region, "delete_key_pair", KeyName=key_name)
             deleted_aws_key = True
-        except ec2.exceptions.ClientError as e:
+        except ClientError as e:
             if 'does not exist' not in str(e):
                 raise
         
@@ -163,6 +439,51 @@ def delete_keypair_for_instance(
         }
 
 
+def delete_keypair_for_instance(
+    stack_id: str,
+    instance_index: int,
+    name_prefix: str,
+    region: str
+) -> Dict[str, Any]:
+    """
+    Xóa keypair của 1 instance (khi scale down)
+    """
+    return _delete_keypair(region, stack_id, _key_name(name_prefix, instance_index))
+
+
+def delete_keypairs_for_instances(
+    stack_id: str,
+    instance_indices: Iterable[int],
+    name_prefix: str,
+    region: str
+) -> Dict[str, Any]:
+    """
+    Xóa keypairs của nhiều instances song song (scale down / rollback)
+    
+    Returns:
+        {"success": True/False, "deleted": [key_name, ...], "failed": [{"key_name", "error"}, ...]}
+    """
+    indices = sorted(set(instance_indices))
+    deleted: List[str] = []
+    failed: List[Dict[str, Any]] = []
+    
+    if not indices:
+        return {"success": True, "deleted": deleted, "failed": failed}
+    
+    def delete(i: int) -> Dict[str, Any]:
+        return _delete_keypair(region, stack_id, _key_name(name_prefix, i))
+    
+    workers = max(1, min(settings.KEYPAIR_AWS_CONCURRENCY, len(indices)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(delete, indices):
+            if result.get("success"):
+                deleted.append(result["key_name"])
+            else:
+                failed.append({"key_name": result.get("key_name"), "error": result.get("error")})
+    
+    return {"success": not failed, "deleted": deleted, "failed": failed}
+
+
 def list_instance_keypairs(stack_id: str, region: str) -> List[Dict]:
     """
     Lấy danh sách tất cả keypairs của stack
@@ -238,15 +559,13 @@ def cleanup_keypairs(stack_id: str, region: str) -> Dict[str, Any]:
     errors = []
     
     try:
-        ec2 = boto3.client('ec2', region_name=region)
-        
         if private_key_dir.exists():
             for pem_file in private_key_dir.glob("*.pem"):
                 key_name = pem_file.stem
                 
                 # Delete from AWS
                 try:
-                    ec2.delete_key_pair(KeyName=key_name)
+                    aws_call(region, "delete_key_pair", KeyName=key_name)
                 except Exception as e:
                     errors.append(f"AWS delete error for {key_name}: {str(e)}")
                 
@@ -0,0 +1,349 @@
+"""
+Keypair Reservoir - Kho keypairs sinh sẵn cho scale-up tức thì
+
+Giữ sẵn KEYPAIR_POOL_SIZE RSA keypairs đã sinh trong KEYPAIR_POOL_DIR
+(Ed25519 sinh gần như tức thì nên không cần kho):
+- Private key được mã hóa (Fernet) trước khi ghi xuống đĩa; key mã hóa lấy từ
+  KEYPAIR_POOL_SECRET hoặc KEYPAIR_POOL_SECRET_FILE (nằm ngoài KEYPAIR_POOL_DIR),
+  không cấu hình thì kho bị tắt
+- Public key (OpenSSH) sẵn sàng để import vào AWS
+- Thread nền nạp lại kho khi hệ thống rảnh (không có ai lấy key gần đây);
+  nhiều uvicorn worker dùng chung kho, flock trên KEYPAIR_POOL_DIR/.refill.lock
+  để chỉ một worker nạp tại một thời điểm
+- Khi khởi động, file *.tmp / *.claimed sót lại do crash được dọn
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+from cryptography.fernet import Fernet, InvalidToken
+from .keypair_manager import generate_rsa_keypair, _get_keygen_pool
+from ..core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every worker refills on its own
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class KeypairReservoir:
+    """Pre-generated keypairs stored encrypted at rest"""
+
+    def __init__(self,
+                 pool_dir: Path,
+                 target_size: int,
+                 refill_interval_sec: float = 30.0,
+                 idle_sec: float = 10.0,
+                 secret: Optional[str] = None,
+                 secret_file: Optional[Path] = None):
+        """
+        Args:
+            pool_dir: Directory holding the encrypted entries
+            target_size: Number of ready keypairs to keep (0 disables the reservoir)
+            refill_interval_sec: How often the refill thread re-checks the pool
+            idle_sec: Only refill when nothing was taken for this long
+            secret: Fernet key
+            secret_file: File holding the Fernet key (generated if missing), used
+                when no secret is given; must live outside pool_dir
+        """
+        self.pool_dir = pool_dir
+        self.target_size = target_size
+        self.secret = secret
+        self.secret_file = secret_file
+        self.refill_interval_sec = refill_interval_sec
+        self.idle_sec = idle_sec
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._fernet: Optional[Fernet] = None
+        self._last_take = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def _key_configured(self) -> bool:
+        if self.secret:
+            return True
+        if self.secret_file is None:
+            return False
+        # A key next to the ciphertext it protects adds nothing
+        return not self.secret_file.resolve().is_relative_to(self.pool_dir.resolve())
+
+    @property
+    def enabled(self) -> bool:
+        return self.target_size > 0 and self._key_configured()
+
+    def _ensure_dir(self):
+        self.pool_dir.mkdir(parents=True, exist_ok=True)
+        self.pool_dir.chmod(0o700)
+
+    def _read_secret_file(self) -> str:
+        """
+        Read the key file, generating it first if missing.
+
+        The key is written to a temp file and hard-linked into place, so a
+        concurrent reader never sees a partial file and two workers racing
+        to create it end up with the same key.
+        """
+        path = self.secret_file
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".keypool-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(Fernet.generate_key())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.link(tmp_name, path)
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp_name)
+        return path.read_text().strip()
+
+    def _get_fernet(self) -> Fernet:
+        """
+        Load the encryption key: the secret if set, otherwise the key file.
+
+        Raises:
+            ValueError: No usable key is configured
+        """
+        if self._fernet is None:
+            if not self._key_configured():
+                raise ValueError("Keypair reservoir needs KEYPAIR_POOL_SECRET or a KEYPAIR_POOL_SECRET_FILE outside KEYPAIR_POOL_DIR")
+            secret = self.secret or self._read_secret_file()
+            self._fernet = Fernet(secret.encode())
+        return self._fernet
+
+    def _entries(self) -> List[Path]:
+        if not self.pool_dir.exists():
+            return []
+        return sorted(self.pool_dir.glob("*.json"), key=lambda p: p.name)
+
+    def size(self) -> int:
+        return len(self._entries())
+
+    def put(self, private_pem: str, public_openssh: str):
+        """
+        Encrypt and store one keypair (written atomically via rename)
+        """
+        self._ensure_dir()
+        entry = {
+            "created_at": time.time(),
+            "public_key": public_openssh,
+            "private_key_encrypted": self._get_fernet().encrypt(private_pem.encode("utf-8")).decode("ascii")
+        }
+        # Prefix with timestamp so entries are consumed oldest first
+        name = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        tmp_path = self.pool_dir / f"{name}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        tmp_path.rename(self.pool_dir / f"{name}.json")
+
+    def take(self) -> Optional[Tuple[str, str]]:
+        """
+        Take one ready keypair out of the reservoir.
+
+        Returns:
+            (private_key_pem, public_key_openssh) or None if the reservoir is empty
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            self._last_take = time.monotonic()
+            for entry_path in self._entries():
+                # Claim by rename so concurrent workers never share a key
+                claimed = entry_path.with_suffix(".claimed")
+                try:
+                    entry_path.rename(claimed)
+                except FileNotFoundError:
+                    continue
+                try:
+                    entry = json.loads(claimed.read_text(encoding="utf-8"))
+                    private_pem = self._get_fernet().decrypt(
+                        entry["private_key_encrypted"].encode("ascii")
+                    ).decode("utf-8")
+                    keypair = (private_pem, entry["public_key"])
+                except (InvalidToken, KeyError, ValueError) as e:
+                    logger.warning(f"Discarding unreadable reservoir entry {entry_path.name}: {e}")
+                    keypair = None
+                finally:
+                    claimed.unlink(missing_ok=True)
+
+                if keypair:
+                    self.hits += 1
+                    self._wakeup.set()
+                    return keypair
+
+            self.misses += 1
+            self._wakeup.set()
+            return None
+
+    def take_many(self, count: int) -> List[Tuple[str, str]]:
+        """
+        Take up to `count` keypairs (fewer if the reservoir runs dry)
+        """
+        keypairs = []
+        for _ in range(count):
+            keypair = self.take()
+            if keypair is None:
+                break
+            keypairs.append(keypair)
+        return keypairs
+
+    def refill(self) -> int:
+        """
+        Top the reservoir up to target_size using the key generation pool.
+
+        Workers sharing the pool dir take turns through an flock; a worker
+        that finds another one refilling skips this round.
+
+        Returns:
+            Number of keypairs added
+        """
+        if fcntl is None:
+            return self._refill()
+        self._ensure_dir()
+        fd = os.open(self.pool_dir / ".refill.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return 0
+            return self._refill()
+        finally:
+            # Closing the descriptor releases the lock
+            os.close(fd)
+
+    def _refill(self) -> int:
+        missing = self.target_size - self.size()
+        if missing <= 0:
+            return 0
+
+        pool = _get_keygen_pool()
+        futures = [pool.submit(generate_rsa_keypair) for _ in range(missing)]
+
+        added = 0
+        for future in futures:
+            if self._stop.is_set():
+                future.cancel()
+                continue
+            try:
+                private_pem, public_openssh = future.result()
+                self.put(private_pem, public_openssh)
+                added += 1
+            except Exception as e:
+                logger.warning(f"Keypair reservoir refill failed: {e}")
+
+        return added
+
+    def sweep_stale(self) -> int:
+        """
+        Delete *.tmp / *.claimed files left behind by a crashed worker (older
+        than refill_interval_sec, so in-progress writes and claims are kept).
+
+        Returns:
+            Number of files deleted
+        """
+        if not self.pool_dir.exists():
+            return 0
+        cutoff = time.time() - self.refill_interval_sec
+        deleted = 0
+        for pattern in ("*.tmp", "*.claimed"):
+            for path in self.pool_dir.glob(pattern):
+                try:
+                    if path.stat().st_mtime < cutoff:
+                        path.unlink()
+                        deleted += 1
+                except FileNotFoundError:
+                    continue
+        return deleted
+
+    def _is_idle(self) -> bool:
+        return time.monotonic() - self._last_take >= self.idle_sec
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(timeout=self.refill_interval_sec)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+
+            # Don't compete with an ongoing deploy / scale-up for CPU
+            if not self._is_idle():
+                self._stop.wait(timeout=self.idle_sec)
+                self._wakeup.set()
+                continue
+
+            try:
+                added = self.refill()
+                if added:
+                    logger.info(f"Keypair reservoir refilled with {added} keypair(s)")
+            except Exception as e:
+                logger.error(f"Keypair reservoir refill error: {e}", exc_info=True)
+
+    def start(self):
+        """
+        Start the background refill thread (no-op when disabled)
+        """
+        if self.target_size > 0 and not self._key_configured():
+            logger.warning(
+                "Keypair reservoir disabled: set KEYPAIR_POOL_SECRET or a "
+                "KEYPAIR_POOL_SECRET_FILE outside KEYPAIR_POOL_DIR"
+            )
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+
+        try:
+            swept = self.sweep_stale()
+            if swept:
+                logger.info(f"Keypair reservoir removed {swept} stale file(s) from {self.pool_dir}")
+        except OSError as e:
+            logger.warning(f"Keypair reservoir sweep failed: {e}")
+
+        self._stop.clear()
+        self._wakeup.set()
+        self._thread = threading.Thread(target=self._run, name="keypair-reservoir", daemon=True)
+        self._thread.start()
+        logger.info(f"Keypair reservoir started (target size: {self.target_size})")
+
+    def stop(self):
+        """
+        Stop the background refill thread
+        """
+        if self._thread and self._thread.is_alive():
+            self._stop.set()
+            self._wakeup.set()
+            self._thread.join(timeout=30)
+        self._thread = None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "target_size": self.target_size,
+            "available": self.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refill_thread_running": bool(self._thread and self._thread.is_alive())
+        }
+
+
+# Global reservoir instance
+keypair_reservoir = KeypairReservoir(
+    pool_dir=settings.KEYPAIR_POOL_DIR,
+    target_size=settings.KEYPAIR_POOL_SIZE,
+    refill_interval_sec=settings.KEYPAIR_POOL_REFILL_INTERVAL_SEC,
+    idle_sec=settings.KEYPAIR_POOL_IDLE_SEC,
+    secret=settings.KEYPAIR_POOL_SECRET,
+    secret_file=settings.KEYPAIR_POOL_SECRET_FILE
+)
@@ -0,0 +1,187 @@
+"""
+Leader Election - Chỉ một worker chạy job nền khi uvicorn chạy nhiều worker
+
+- Leader giữ flock độc quyền trên lease file (SCHEDULER_LEASE_FILE, mặc định
+  TF_WORK_ROOT/.scheduler.lease) và ghi pid / host / thời điểm nhận lease vào đó
+- Kernel nhả lock ngay khi process leader chết, worker standby (thử lại mỗi
+  SCHEDULER_LEADER_POLL_SEC) lên thay mà không phải chờ lease hết hạn
+- Lease file bị xóa / thay thế thì leader tự xuống standby, tránh hai leader
+- flock chỉ tin cậy trên filesystem cục bộ: các worker phải chạy cùng một máy
+- State trong bộ nhớ (metrics history, remote_write buffer, stabilization
+  window, cadence) chỉ có ở leader: endpoint ghi vào state đó (remote_write,
+  /auto-scale) gọi require_state() và worker standby trả 503 "not_leader" (kèm
+  Connection: close để client như Prometheus thử lại trên kết nối mới); endpoint
+  chỉ đọc lấy dữ liệu từ Mimir / metrics archive / file do leader ghi
+"""
+
+import os
+import json
+import time
+import socket
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable
+from ..core.config import settings
+from ..core import telemetry
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process acts as leader
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+class NotLeaderError(Exception):
+    """Raised in standby workers by endpoints that need the leader's in-memory state"""
+
+    def __init__(self, holder: Optional[Dict[str, Any]]):
+        super().__init__("This worker is a scheduler standby; retry to reach the leader")
+        self.holder = holder
+
+
+class LeaderElection:
+    """flock-based leadership over a lease file, with a standby poll thread"""
+
+    def __init__(self, lease_path: Path, poll_sec: float = 5.0):
+        self.lease_path = lease_path
+        self.poll_sec = poll_sec
+        self._fd: Optional[int] = None
+        self._leader = False
+        self._elected_at: Optional[float] = None
+        self._on_elected: Optional[Callable[[], None]] = None
+        self._on_demoted: Optional[Callable[[], None]] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leader
+
+    def _try_acquire(self) -> bool:
+        self.lease_path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.lease_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        holder = {"pid": os.getpid(), "host": socket.gethostname(), "acquired_at": time.time()}
+        os.ftruncate(fd, 0)
+        os.pwrite(fd, json.dumps(holder).encode(), 0)
+        self._fd = fd
+        return True
+
+    def _still_held(self) -> bool:
+        """
+        True while the lease path is still the file this process has locked
+        """
+        try:
+            return os.stat(self.lease_path).st_ino == os.fstat(self._fd).st_ino
+        except OSError:
+            return False
+
+    def _set_leader(self, leader: bool):
+        self._leader = leader
+        self._elected_at = time.time() if leader else None
+        telemetry.SCHEDULER_LEADER.set(1 if leader else 0)
+        callback = self._on_elected if leader else self._on_demoted
+        if callback:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Leader {'election' if leader else 'demotion'} callback failed: {str(e)}", exc_info=True)
+
+    def _poll(self):
+        if self._fd is None:
+            if self._try_acquire():
+                logger.info(f"Process {os.getpid()} is now the scheduler leader ({self.lease_path})")
+                self._set_leader(True)
+        elif not self._still_held():
+            logger.warning(f"Scheduler lease file {self.lease_path} was replaced, stepping down")
+            self._set_leader(False)
+            self.release()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_sec):
+            try:
+                self._poll()
+            except Exception as e:
+                logger.error(f"Leader election poll failed: {str(e)}", exc_info=True)
+
+    def start(self, on_elected: Callable[[], None], on_demoted: Callable[[], None]):
+        """
+        Try to become leader now, then keep trying (or keep checking the
+        lease) in a background thread.
+
+        Args:
+            on_elected: Called when this process becomes leader
+            on_demoted: Called when this process loses the lease
+        """
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        if fcntl is None:
+            logger.warning("flock is not available on this platform, running as scheduler leader unconditionally")
+            self._set_leader(True)
+            return
+
+        self._poll()
+        if not self._leader:
+            holder = self.holder()
+            logger.info(f"Process {os.getpid()} is a scheduler standby (leader: {holder})")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="scheduler-leader", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop contending; the lease itself is kept until release()
+        """
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_sec + 1)
+            self._thread = None
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        if self._leader:
+            self._leader = False
+            self._elected_at = None
+            telemetry.SCHEDULER_LEADER.set(0)
+
+    def require_state(self):
+        """
+        Raises:
+            NotLeaderError: Leader election is on and this worker is a standby
+        """
+        if settings.SCHEDULER_LEADER_ELECTION and not self._leader:
+            raise NotLeaderError(self.holder())
+
+    def holder(self) -> Optional[Dict[str, Any]]:
+        """
+        Lease holder as written in the lease file (readable from any worker)
+        """
+        try:
+            return json.loads(self.lease_path.read_text() or "null")
+        except (OSError, ValueError):
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.SCHEDULER_LEADER_ELECTION,
+            "is_leader": self._leader,
+            "pid": os.getpid(),
+            "elected_at": self._elected_at,
+            "lease_file": str(self.lease_path),
+            "holder": self.holder()
+        }
+
+
+# Global lease used by start_scheduler / stop_scheduler
+scheduler_lease = LeaderElection(settings.SCHEDULER_LEASE_FILE, settings.SCHEDULER_LEADER_POLL_SEC)
@@ -0,0 +1,215 @@
+"""
+Metrics Archive - Lưu trữ lâu dài metrics của stack trên đĩa (SQLite)
+
+Mimir chạy trên chính các instance của stack và mất khi destroy, nên backend
+tự lưu metrics đã thu thập để phục vụ capacity planning:
+- raw: từng mẫu của collector (giữ METRICS_ARCHIVE_RAW_RETENTION_HOURS)
+- 1m / 1h: rollup count/sum/min/max/last, cập nhật ngay khi ghi (upsert)
+- Job dọn dẹp xóa dữ liệu quá hạn theo retention của từng tầng
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# name -> (bucket size in seconds, table)
+TIERS = {
+    "raw": (0, "samples_raw"),
+    "1m": (60, "samples_1m"),
+    "1h": (3600, "samples_1h"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples_raw (
+    stack_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (stack_id, metric, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples_1m (
+    stack_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (stack_id, metric, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS samples_1h (
+    stack_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    sum REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    last REAL NOT NULL,
+    PRIMARY KEY (stack_id, metric, ts)
+) WITHOUT ROWID;
+"""
+
+_ROLLUP_UPSERT = """
+INSERT INTO {table} (stack_id, metric, ts, count, sum, min, max, last)
+VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+ON CONFLICT (stack_id, metric, ts) DO UPDATE SET
+    count = count + 1,
+    sum = sum + excluded.sum,
+    min = MIN(min, excluded.min),
+    max = MAX(max, excluded.max),
+    last = excluded.last
+"""
+
+
+class MetricsArchive:
+    """SQLite-backed raw / 1m / 1h metric store"""
+
+    def __init__(self,
+                 db_path: Path,
+                 raw_retention_sec: float,
+                 minute_retention_sec: float,
+                 hour_retention_sec: float):
+        self.db_path = db_path
+        self.retention_sec = {
+            "raw": raw_retention_sec,
+            "1m": minute_retention_sec,
+            "1h": hour_retention_sec,
+        }
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def record(self, stack_id: str, metrics: Dict[str, Any], ts: Optional[float] = None):
+        """
+        Store one sample per numeric metric and update the 1m / 1h rollups
+        """
+        ts = int(time.time() if ts is None else ts)
+        rows = [
+            (metric, float(value)) for metric, value in metrics.items()
+            if not isinstance(value, bool) and isinstance(value, (int, float))
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO samples_raw (stack_id, metric, ts, value) VALUES (?, ?, ?, ?)",
+                    [(stack_id, metric, ts, value) for metric, value in rows]
+                )
+                for tier in ("1m", "1h"):
+                    size, table = TIERS[tier]
+                    bucket = ts - ts % size
+                    conn.executemany(
+                        _ROLLUP_UPSERT.format(table=table),
+                        [(stack_id, metric, bucket, value, value, value, value) for metric, value in rows]
+                    )
+
+    def prune(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        Delete rows past each tier's retention.
+
+        Returns:
+            {tier: deleted row count}
+        """
+        now = time.time() if now is None else now
+        deleted = {}
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                for tier, (_, table) in TIERS.items():
+                    cursor = conn.execute(f"DELETE FROM {table} WHERE ts < ?", (int(now - self.retention_sec[tier]),))
+                    deleted[tier] = cursor.rowcount
+        return deleted
+
+    def pick_resolution(self, start: float, end: float, now: Optional[float] = None) -> str:
+        """
+        Finest tier that still covers `start` and keeps the result under ~2000 points
+        """
+        now = time.time() if now is None else now
+        span = end - start
+        for tier, max_span in (("raw", 6 * 3600), ("1m", 7 * 86400)):
+            if span <= max_span and start >= now - self.retention_sec[tier]:
+                return tier
+        return "1h"
+
+    def query(self,
+              stack_id: str,
+              metric: str,
+              start: float,
+              end: float,
+              resolution: str = "auto") -> Dict[str, Any]:
+        """
+        Range query over one metric.
+
+        Args:
+            resolution: "auto" | "raw" | "1m" | "1h"
+
+        Returns:
+            {"resolution", "points": [[ts, avg, min, max, count], ...]}
+        """
+        if resolution == "auto":
+            resolution = self.pick_resolution(start, end)
+        if resolution not in TIERS:
+            raise ValueError(f"Unknown resolution: {resolution}")
+
+        _, table = TIERS[resolution]
+        with self._lock:
+            conn = self._connect()
+            if resolution == "raw":
+                rows = conn.execute(
+                    f"SELECT ts, value, value, value, 1 FROM {table} "
+                    "WHERE stack_id = ? AND metric = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                    (stack_id, metric, int(start), int(end))
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT ts, sum / count, min, max, count FROM {table} "
+                    "WHERE stack_id = ? AND metric = ? AND ts BETWEEN ? AND ? ORDER BY ts",
+                    (stack_id, metric, int(start), int(end))
+                ).fetchall()
+
+        return {
+            "resolution": resolution,
+            "points": [[ts, round(avg, 4), mn, mx, count] for ts, avg, mn, mx, count in rows]
+        }
+
+    def metrics_for(self, stack_id: str) -> List[str]:
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT DISTINCT metric FROM samples_1h WHERE stack_id = ? ORDER BY metric", (stack_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Global archive instance
+metrics_archive = MetricsArchive(
+    db_path=settings.METRICS_ARCHIVE_PATH,
+    raw_retention_sec=settings.METRICS_ARCHIVE_RAW_RETENTION_HOURS * 3600,
+    minute_retention_sec=settings.METRICS_ARCHIVE_1M_RETENTION_DAYS * 86400,
+    hour_retention_sec=settings.METRICS_ARCHIVE_1H_RETENTION_DAYS * 86400
+)
@@ -0,0 +1,159 @@
+"""
+Metrics Cache - Cache kết quả truy vấn Mimir dùng chung cho dashboard, API, AI advisor và scheduler
+
+- TTL cấu hình được (METRICS_CACHE_TTL_SEC)
+- Singleflight: nhiều request giống nhau cùng lúc chỉ gọi Mimir 1 lần
+- Stale-while-revalidate: hết TTL nhưng còn trong METRICS_CACHE_STALE_SEC thì
+  trả về giá trị cũ ngay và làm mới ở nền (khi Mimir chậm)
+"""
+
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Callable, Hashable, Optional, Tuple
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsCache:
+    """TTL cache with request coalescing and stale-while-revalidate"""
+
+    def __init__(self, ttl_sec: float, stale_sec: float, max_entries: int = 4096):
+        self.ttl_sec = ttl_sec
+        self.stale_sec = stale_sec
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="metrics-refresh")
+        self.stats_counters = {"hits": 0, "stale_hits": 0, "misses": 0, "coalesced": 0, "refreshes": 0}
+
+    def _store(self, key: Hashable, value: Any, now: float):
+        self._entries[key] = (value, now)
+        if len(self._entries) <= self.max_entries:
+            return
+
+        # Drop entries past the stale window first, then the oldest ones
+        horizon = now - self.ttl_sec - self.stale_sec
+        for k in [k for k, (_, fetched_at) in self._entries.items() if fetched_at < horizon]:
+            del self._entries[k]
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            for k, _ in sorted(self._entries.items(), key=lambda item: item[1][1])[:overflow]:
+                del self._entries[k]
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], future: Future,
+              cacheable: Optional[Callable[[Any], bool]]):
+        """
+        Run the loader as the single owner of `key` and publish the result
+        """
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if cacheable is None or cacheable(value):
+                self._store(key, value, time.monotonic())
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any], future: Future,
+                 cacheable: Optional[Callable[[Any], bool]]):
+        try:
+            self._load(key, loader, future, cacheable)
+        except Exception as e:
+            logger.warning(f"Background refresh failed for {key}: {e}")
+
+    def get_or_load(self,
+                    key: Hashable,
+                    loader: Callable[[], Any],
+                    ttl_sec: Optional[float] = None,
+                    cacheable: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, str]:
+        """
+        Get a cached value or load it.
+
+        Args:
+            key: Cache key, e.g. (stack_id, query, step)
+            loader: Function producing a fresh value
+            ttl_sec: Override the default TTL
+            cacheable: Predicate deciding whether a loaded value is stored
+                       (e.g. skip error responses)
+
+        Returns:
+            (value, status) where status is "hit" | "stale" | "coalesced" | "miss"
+        """
+        ttl = self.ttl_sec if ttl_sec is None else ttl_sec
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < ttl:
+                    self.stats_counters["hits"] += 1
+                    return value, "hit"
+                if age < ttl + self.stale_sec:
+                    self.stats_counters["stale_hits"] += 1
+                    if key not in self._inflight:
+                        future = Future()
+                        self._inflight[key] = future
+                        self.stats_counters["refreshes"] += 1
+                        self._refresh_executor.submit(self._refresh, key, loader, future, cacheable)
+                    return value, "stale"
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.stats_counters["misses"] += 1
+            else:
+                self.stats_counters["coalesced"] += 1
+
+        if owner:
+            return self._load(key, loader, future, cacheable), "miss"
+        return future.result(), "coalesced"
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """
+        Drop all entries, or only those whose key matches `predicate`
+        """
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+            else:
+                for k in [k for k in self._entries if predicate(k)]:
+                    del self._entries[k]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "ttl_sec": self.ttl_sec,
+                "stale_sec": self.stale_sec,
+                **self.stats_counters
+            }
+
+
+# Global cache instance shared by every metrics consumer
+metrics_cache = MetricsCache(
+    ttl_sec=settings.METRICS_CACHE_TTL_SEC,
+    stale_sec=settings.METRICS_CACHE_STALE_SEC,
+    max_entries=settings.METRICS_CACHE_MAX_ENTRIES
+)
+
+# Separate, smaller cache for decoded range queries (entries are much larger)
+range_cache = MetricsCache(
+    ttl_sec=settings.METRICS_CACHE_TTL_SEC,
+    stale_sec=0,
+    max_entries=settings.METRICS_RANGE_CACHE_MAX_ENTRIES
+)
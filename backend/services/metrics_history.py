@@ -0,0 +1,217 @@
+"""
+Metrics History - Lịch sử metrics gần đây trong bộ nhớ cho từng stack
+
+- Mỗi (stack_id, metric) là một ring buffer NumPy dung lượng cố định
+  (METRICS_HISTORY_CAPACITY điểm), bộ nhớ không tăng theo thời gian
+- Được nạp bởi job collector của scheduler theo chu kỳ cố định
+- Hàm cửa sổ vector hóa: rate, EWMA, percentile
+"""
+
+import time
+import threading
+import numpy as np
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from ..core.config import settings
+
+
+class RingBuffer:
+    """Fixed-capacity (timestamp, value) series backed by two float64 arrays"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._ts = np.full(self.capacity, np.nan)
+        self._values = np.full(self.capacity, np.nan)
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, ts: float, value: float):
+        self._ts[self._head] = ts
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def extend(self, ts: np.ndarray, values: np.ndarray):
+        """
+        Append many points at once (only the last `capacity` points are kept)
+        """
+        ts = np.asarray(ts, dtype=float)[-self.capacity:]
+        values = np.asarray(values, dtype=float)[-self.capacity:]
+        n = len(ts)
+        if n == 0:
+            return
+        idx = (self._head + np.arange(n)) % self.capacity
+        self._ts[idx] = ts
+        self._values[idx] = values
+        self._head = (self._head + n) % self.capacity
+        self._count = min(self._count + n, self.capacity)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (timestamps, values) in chronological order (copies)
+        """
+        if self._count < self.capacity:
+            return self._ts[:self._count].copy(), self._values[:self._count].copy()
+        order = np.roll(np.arange(self.capacity), -self._head)
+        return self._ts[order], self._values[order]
+
+    def window(self, window_sec: Optional[float] = None, now: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Points newer than now - window_sec (all points if window_sec is None)
+        """
+        ts, values = self.arrays()
+        if window_sec is None or len(ts) == 0:
+            return ts, values
+        cutoff = (time.time() if now is None else now) - window_sec
+        mask = ts >= cutoff
+        return ts[mask], values[mask]
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        if self._count == 0:
+            return None
+        i = (self._head - 1) % self.capacity
+        return float(self._ts[i]), float(self._values[i])
+
+
+def window_rate(ts: np.ndarray, values: np.ndarray) -> float:
+    """
+    Least-squares slope of the window, in units per second (0 if < 2 points)
+    """
+    if len(ts) < 2 or np.ptp(ts) == 0:
+        return 0.0
+    t = ts - ts.mean()
+    return float(np.dot(t, values - values.mean()) / np.dot(t, t))
+
+
+def window_ewma(values: np.ndarray, alpha: float) -> float:
+    """
+    Exponentially weighted mean of the window (most recent point weighs alpha)
+    """
+    if len(values) == 0:
+        return 0.0
+    weights = (1.0 - alpha) ** np.arange(len(values) - 1, -1, -1)
+    return float(np.dot(weights, values) / weights.sum())
+
+
+def window_percentiles(values: np.ndarray, qs: Iterable[float] = (50, 90, 95)) -> Dict[str, float]:
+    qs = list(qs)
+    if len(values) == 0:
+        return {f"p{int(q)}": 0.0 for q in qs}
+    return {f"p{int(q)}": float(p) for q, p in zip(qs, np.percentile(values, qs))}
+
+
+class MetricsHistory:
+    """Registry of ring buffers keyed by (stack_id, metric)"""
+
+    def __init__(self, capacity: int, ewma_alpha: float = 0.3):
+        self.capacity = capacity
+        self.ewma_alpha = ewma_alpha
+        self._series: Dict[Tuple[str, str], RingBuffer] = {}
+        self._lock = threading.Lock()
+
+    def _buffer(self, stack_id: str, metric: str, create: bool = False) -> Optional[RingBuffer]:
+        key = (stack_id, metric)
+        buffer = self._series.get(key)
+        if buffer is None and create:
+            buffer = RingBuffer(self.capacity)
+            self._series[key] = buffer
+        return buffer
+
+    def record(self, stack_id: str, metrics: Dict[str, Any], ts: Optional[float] = None):
+        """
+        Append one sample per numeric metric (non-numeric values are ignored)
+        """
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for metric, value in metrics.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                self._buffer(stack_id, metric, create=True).append(ts, float(value))
+
+    def window(self, stack_id: str, metric: str, window_sec: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            (timestamps, values) of one series, empty arrays if unknown
+        """
+        with self._lock:
+            buffer = self._buffer(stack_id, metric)
+            if buffer is None:
+                return np.array([]), np.array([])
+            return buffer.window(window_sec)
+
+    def metrics_for(self, stack_id: str) -> List[str]:
+        with self._lock:
+            return sorted(metric for sid, metric in self._series if sid == stack_id)
+
+    def summarize(self, ts: np.ndarray, values: np.ndarray) -> Dict[str, Any]:
+        """
+        Window statistics for one series
+        """
+        if len(values) == 0:
+            return {"points": 0}
+        return {
+            "points": int(len(values)),
+            "latest": float(values[-1]),
+            "latest_at": float(ts[-1]),
+            "mean": round(float(values.mean()), 4),
+            "min": float(values.min()),
+            "max": float(values.max()),
+            **{k: round(v, 4) for k, v in window_percentiles(values).items()},
+            "ewma": round(window_ewma(values, self.ewma_alpha), 4),
+            "rate_per_min": round(window_rate(ts, values) * 60.0, 4)
+        }
+
+    def snapshot(self,
+                 stack_id: str,
+                 window_sec: Optional[float] = None,
+                 metrics: Optional[List[str]] = None,
+                 include_points: bool = True) -> Dict[str, Any]:
+        """
+        Recent history of a stack.
+
+        Args:
+            stack_id: Stack identifier
+            window_sec: Only points newer than this (None = whole buffer)
+            metrics: Restrict to these metric names
+            include_points: Include raw [ts, value] pairs
+
+        Returns:
+            {metric: {points, latest, mean, min, max, p50, p90, p95, ewma, rate_per_min, [series]}}
+        """
+        result = {}
+        for metric in metrics or self.metrics_for(stack_id):
+            ts, values = self.window(stack_id, metric, window_sec)
+            summary = self.summarize(ts, values)
+            if include_points:
+                summary["series"] = np.column_stack((ts, values)).tolist()
+            result[metric] = summary
+        return result
+
+    def drop_stack(self, stack_id: str):
+        with self._lock:
+            for key in [k for k in self._series if k[0] == stack_id]:
+                del self._series[key]
+
+    def stacks(self) -> List[str]:
+        with self._lock:
+            return sorted({sid for sid, _ in self._series})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            series = len(self._series)
+        return {
+            "series": series,
+            "capacity_per_series": self.capacity,
+            # two float64 arrays per series
+            "memory_bytes": series * self.capacity * 16
+        }
+
+
+# Global history instance
+metrics_history = MetricsHistory(
+    capacity=settings.METRICS_HISTORY_CAPACITY,
+    ewma_alpha=settings.METRICS_EWMA_ALPHA
+)
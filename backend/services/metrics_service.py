@@ -1,17 +1,72 @@
+import json
+import math
+import time
+import threading
 import requests
-from typing import Dict, Any, Optional
+import urllib3
+import ijson
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 from .scaling_service import get_stack_info
+from .metrics_cache import metrics_cache, range_cache
+from .remote_write import remote_write_store
+from ..core.config import settings
+from ..core import telemetry
 
 
-def query_prometheus(mimir_url: str, promql_query: str, timeout: int = 10) -> Dict[str, Any]:
+# Keep-alive HTTP session per Mimir endpoint (connection pool reused across queries)
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# Shared worker pool for concurrent PromQL fan-out
+_query_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.MIMIR_QUERY_WORKERS),
+    thread_name_prefix="promql"
+)
+
+
+def _get_session(mimir_url: str) -> requests.Session:
+    """
+    Get (or create) the pooled session for a Mimir endpoint
+    """
+    session = _sessions.get(mimir_url)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(mimir_url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=max(1, settings.MIMIR_POOL_MAXSIZE),
+                    max_retries=0
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _sessions[mimir_url] = session
+    return session
+
+
+def close_sessions():
+    """
+    Close all pooled Mimir sessions (on application shutdown)
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+def query_prometheus(mimir_url: str, promql_query: str, timeout: Optional[float] = None) -> Dict[str, Any]:
     """
     Query Prometheus/Mimir API with PromQL.
     
     Args:
         mimir_url: Base URL of Mimir instance (e.g., http://nlb-dns/mimir)
         promql_query: PromQL query string
-        timeout: Request timeout in seconds
+        timeout: Read timeout in seconds (default MIMIR_QUERY_TIMEOUT_SEC)
     
     Returns:
         Dict with query results or error
@@ -23,17 +78,26 @@ def query_prometheus(mimir_url: str, promql_query: str, timeout: int = 10) -> Di
         "time": datetime.now().isoformat()
     }
     
+    start = time.perf_counter()
     try:
-        response = requests.get(url, params=params, timeout=timeout)
+        response = _get_session(mimir_url).get(
+            url,
+            params=params,
+            timeout=(settings.MIMIR_CONNECT_TIMEOUT_SEC, timeout or settings.MIMIR_QUERY_TIMEOUT_SEC)
+        )
         response.raise_for_status()
-        return response.json()
+        result = response.json()
+        telemetry.observe_mimir_query(result.get("status", "unknown"), time.perf_counter() - start)
+        return result
     except requests.exceptions.RequestException as e:
+        telemetry.observe_mimir_query("network_error", time.perf_counter() - start)
         return {
             "status": "error",
             "error": str(e),
             "errorType": "network_error"
         }
     except Exception as e:
+        telemetry.observe_mimir_query("unknown_error", time.perf_counter() - start)
         return {
             "status": "error",
             "error": str(e),
@@ -41,24 +105,219 @@ def query_prometheus(mimir_url: str, promql_query: str, timeout: int = 10) -> Di
         }
 
 
+def _is_success(result: Dict[str, Any]) -> bool:
+    return result.get("status") == "success"
+
+
+def query_prometheus_cached(
+    stack_id: str,
+    mimir_url: str,
+    promql_query: str,
+    step: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> tuple[Dict[str, Any], str]:
+    """
+    query_prometheus through the shared metrics cache.
+    
+    Cache key is (stack_id, query, step). Identical concurrent queries are
+    coalesced into one upstream call, and errors are never cached.
+    
+    Returns:
+        (query result, cache status: "hit" | "stale" | "coalesced" | "miss")
+    """
+    result, status = metrics_cache.get_or_load(
+        (stack_id, promql_query, step),
+        lambda: query_prometheus(mimir_url, promql_query, timeout),
+        cacheable=_is_success
+    )
+    telemetry.MIMIR_CACHE.labels(status).inc()
+    return result, status
+
+
+def query_prometheus_many(
+    mimir_url: str,
+    queries: Dict[str, str],
+    timeout: Optional[float] = None,
+    stack_id: Optional[str] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run several PromQL queries against one Mimir endpoint concurrently.
+    
+    Total latency is bounded by the slowest query instead of the sum.
+    
+    Args:
+        mimir_url: Base URL of Mimir instance
+        queries: {name: promql_query}
+        timeout: Read timeout per query
+        stack_id: If set, queries go through the metrics cache for this stack
+    
+    Returns:
+        {name: query_prometheus result}
+    """
+    if stack_id is None:
+        futures = {
+            name: _query_executor.submit(query_prometheus, mimir_url, query, timeout)
+            for name, query in queries.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+    
+    futures = {
+        name: _query_executor.submit(query_prometheus_cached, stack_id, mimir_url, query, None, timeout)
+        for name, query in queries.items()
+    }
+    return {name: future.result()[0] for name, future in futures.items()}
+
+
+def _stack_selector(stack_id: str) -> str:
+    """
+    PromQL label matcher scoping series to one stack (empty if disabled)
+    """
+    label = settings.METRICS_STACK_LABEL
+    return f'{label}="{stack_id}"' if label else ""
+
+
+def stack_metric_queries(stack_id: str) -> Dict[str, str]:
+    """
+    Instance-labelled PromQL queries for one stack.
+    
+    Each query returns one series per instance so hot instances stay visible.
+    """
+    sel = _stack_selector(stack_id)
+    idle_sel = ",".join(filter(None, ['mode="idle"', sel]))
+    up_sel = ",".join(filter(None, ['job="node"', sel]))
+    mem_sel = f"{{{sel}}}" if sel else ""
+    return {
+        "cpu": f'100 * (1 - avg by (instance) (rate(node_cpu_seconds_total{{{idle_sel}}}[5m])))',
+        "memory": (
+            f'100 * (1 - sum by (instance) (node_memory_MemAvailable_bytes{mem_sel})'
+            f' / sum by (instance) (node_memory_MemTotal_bytes{mem_sel}))'
+        ),
+        "up": f'up{{{up_sel}}}'
+    }
+
+
+def _vector_by_instance(result: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Instant vector result -> {instance: value} (unparseable samples skipped)
+    """
+    values = {}
+    if result.get("status") != "success":
+        return values
+    for series in result.get("data", {}).get("result", []):
+        instance = series.get("metric", {}).get("instance", "")
+        try:
+            values[instance] = float(series["value"][1])
+        except (IndexError, KeyError, ValueError, TypeError):
+            continue
+    return values
+
+
+def aggregate_instance_matrix(matrix: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Column-wise stats over an (instances x metrics) matrix, ignoring NaN.
+    
+    imbalance = (max - mean) / mean, i.e. how far the hottest instance is
+    above the stack average (0 = perfectly balanced).
+    
+    Returns:
+        {"mean", "max", "p90", "imbalance"}: arrays with one value per metric column
+    """
+    if matrix.size == 0 or np.all(np.isnan(matrix)):
+        zeros = np.zeros(matrix.shape[1] if matrix.ndim == 2 else 0)
+        return {"mean": zeros, "max": zeros, "p90": zeros, "imbalance": zeros}
+    
+    # Columns that are entirely NaN would warn; treat them as 0
+    filled = np.where(np.all(np.isnan(matrix), axis=0), 0.0, matrix)
+    mean = np.nanmean(filled, axis=0)
+    maximum = np.nanmax(filled, axis=0)
+    p90 = np.nanpercentile(filled, 90, axis=0)
+    imbalance = np.divide(maximum - mean, mean, out=np.zeros_like(mean), where=mean > 0)
+    return {"mean": mean, "max": maximum, "p90": p90, "imbalance": imbalance}
+
+
+def build_instance_breakdown(per_metric: Dict[str, Dict[str, float]], up: Dict[str, float]) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """
+    Align per-instance CPU / memory values into a matrix and aggregate it.
+    
+    Args:
+        per_metric: {"cpu": {instance: value}, "memory": {instance: value}}
+        up: {instance: 0/1} from the up metric
+    
+    Returns:
+        (instances list sorted hottest CPU first, stack-level stats dict)
+    """
+    columns = ["cpu", "memory"]
+    instances = sorted(set().union(*(per_metric[c].keys() for c in columns)))
+    matrix = np.array(
+        [[per_metric[c].get(instance, np.nan) for c in columns] for instance in instances],
+        dtype=float
+    ).reshape(len(instances), len(columns))
+    
+    stats = aggregate_instance_matrix(matrix)
+    summary = {}
+    for j, column in enumerate(columns):
+        summary[f"avg_{column}_percent"] = round(float(stats["mean"][j]), 2)
+        summary[f"max_{column}_percent"] = round(float(stats["max"][j]), 2)
+        summary[f"p90_{column}_percent"] = round(float(stats["p90"][j]), 2)
+        summary[f"{column}_imbalance"] = round(float(stats["imbalance"][j]), 3)
+    
+    breakdown = []
+    for i, instance in enumerate(instances):
+        breakdown.append({
+            "instance": instance,
+            "cpu_percent": None if np.isnan(matrix[i, 0]) else round(float(matrix[i, 0]), 2),
+            "memory_percent": None if np.isnan(matrix[i, 1]) else round(float(matrix[i, 1]), 2),
+            "up": up.get(instance, 0.0) >= 1.0 if up else None
+        })
+    breakdown.sort(key=lambda b: -1.0 if b["cpu_percent"] is None else b["cpu_percent"], reverse=True)
+    
+    return breakdown, summary
+
+
 def get_stack_metrics(stack_id: str) -> Dict[str, Any]:
     """
     Get key metrics for a specific stack.
     
-    Queries:
-    - Average CPU usage (%)
-    - Average Memory usage (%)
-    - Instance count
+    Queries (scoped to the stack, one series per instance):
+    - CPU usage (%)
+    - Memory usage (%)
+    - Instance up status
+    
+    Stack-level mean / max / p90 / imbalance are computed from the
+    per-instance matrix. Fresh samples pushed via remote_write are used
+    instead of querying Mimir. When CPU or memory has no series at all the
+    result carries "error" / "no_data" instead of a 0 % average.
     
     Args:
         stack_id: Stack identifier
     
     Returns:
-        Dict with metric values and query status
+        Dict with stack metric values, per-instance breakdown and query status
     """
     try:
         # Get stack info to find Mimir endpoint
         stack_info = get_stack_info(stack_id)
+        
+        pushed = None
+        if settings.REMOTE_WRITE_ENABLED and remote_write_store.is_fresh(stack_id):
+            pushed = remote_write_store.instance_values(stack_id)
+        # Pushes missing CPU or memory fall back to Mimir
+        if pushed and pushed["cpu"] and pushed["memory"]:
+            instances, summary = build_instance_breakdown(
+                {"cpu": pushed["cpu"], "memory": pushed["memory"]},
+                pushed["up"]
+            )
+            return {
+                "stack_id": stack_id,
+                "metrics": {
+                    **summary,
+                    "instance_count": int(sum(1 for value in pushed["up"].values() if value >= 1.0))
+                },
+                "instances": instances,
+                "source": "remote_write",
+                "query_time": datetime.now().isoformat()
+            }
+        
         nlb_dns = stack_info.get("nlb_dns")
         
         if not nlb_dns:
@@ -70,48 +329,34 @@ def get_stack_metrics(stack_id: str) -> Dict[str, Any]:
         
         mimir_url = f"http://{nlb_dns}/mimir"
         
-        # Query CPU usage
-        # Note: node_exporter needs to be running on instances with label stack_id
-        # For now, we'll query without stack_id filter and average all
-        cpu_query = 'avg(rate(node_cpu_seconds_total{mode!="idle"}[5m])) * 100'
-        cpu_result = query_prometheus(mimir_url, cpu_query)
-        
-        cpu_usage = 0.0
-        if cpu_result.get("status") == "success" and cpu_result.get("data", {}).get("result"):
-            try:
-                cpu_usage = float(cpu_result["data"]["result"][0]["value"][1])
-            except (IndexError, KeyError, ValueError):
-                cpu_usage = 0.0
+        results = query_prometheus_many(mimir_url, stack_metric_queries(stack_id), stack_id=stack_id)
         
-        # Query Memory usage
-        memory_query = '(1 - avg(node_memory_MemAvailable_bytes / node_memory_MemTotal_bytes)) * 100'
-        memory_result = query_prometheus(mimir_url, memory_query)
-        
-        memory_usage = 0.0
-        if memory_result.get("status") == "success" and memory_result.get("data", {}).get("result"):
-            try:
-                memory_usage = float(memory_result["data"]["result"][0]["value"][1])
-            except (IndexError, KeyError, ValueError):
-                memory_usage = 0.0
-        
-        # Query instance count (up metric)
-        instance_count_query = 'count(up{job="node"})'
-        instance_result = query_prometheus(mimir_url, instance_count_query)
+        up = _vector_by_instance(results["up"])
+        per_metric = {"cpu": _vector_by_instance(results["cpu"]), "memory": _vector_by_instance(results["memory"])}
+        missing = [name for name, values in per_metric.items() if not values]
+        if missing:
+            # An empty vector is "unknown", not 0 % - reporting 0 would scale the stack to its minimum
+            return {
+                "error": f"No data for {', '.join(missing)} (query status: "
+                         f"{', '.join(results[name].get('status', 'unknown') for name in missing)})",
+                "no_data": True,
+                "stack_id": stack_id,
+                "metrics": {}
+            }
+        instances, summary = build_instance_breakdown(per_metric, up)
         
         instance_count = stack_info.get("current_instance_count", 0)
-        if instance_result.get("status") == "success" and instance_result.get("data", {}).get("result"):
-            try:
-                instance_count = int(float(instance_result["data"]["result"][0]["value"][1]))
-            except (IndexError, KeyError, ValueError):
-                pass
+        if up:
+            instance_count = int(sum(1 for value in up.values() if value >= 1.0))
         
         return {
             "stack_id": stack_id,
             "metrics": {
-                "avg_cpu_percent": round(cpu_usage, 2),
-                "avg_memory_percent": round(memory_usage, 2),
+                **summary,
                 "instance_count": instance_count
             },
+            "instances": instances,
+            "source": "mimir",
             "mimir_url": mimir_url,
             "query_time": datetime.now().isoformat()
         }
@@ -161,3 +406,178 @@ def query_custom_metric(stack_id: str, promql_query: str) -> Dict[str, Any]:
         }
 
 
+def normalize_range(start: float, end: float, step: float) -> Tuple[float, float, float]:
+    """
+    Validate a range query and align it to the step grid.
+    
+    Aligning start/end to multiples of step makes repeated dashboard
+    queries hit the same cache entry.
+    
+    Raises:
+        ValueError: Invalid range or too many points per series
+    """
+    if step < settings.MIMIR_RANGE_MIN_STEP_SEC:
+        raise ValueError(f"step must be >= {settings.MIMIR_RANGE_MIN_STEP_SEC}s")
+    if end <= start:
+        raise ValueError("end must be after start")
+    
+    start = math.floor(start / step) * step
+    end = math.ceil(end / step) * step
+    points = int((end - start) / step) + 1
+    if points > settings.MIMIR_RANGE_MAX_POINTS:
+        min_step = math.ceil((end - start) / (settings.MIMIR_RANGE_MAX_POINTS - 1))
+        raise ValueError(
+            f"Range too large: {points} points per series exceeds {settings.MIMIR_RANGE_MAX_POINTS} "
+            f"(use step >= {min_step}s)"
+        )
+    return start, end, step
+
+
+def query_prometheus_range(
+    mimir_url: str,
+    promql_query: str,
+    start: float,
+    end: float,
+    step: float,
+    timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Range query decoded incrementally into compact NumPy arrays.
+    
+    The response body is parsed series by series with ijson instead of
+    response.json(), so memory is bounded by the compact result plus one
+    series, not by the JSON text. At most MIMIR_RANGE_MAX_SERIES series are kept.
+    
+    Returns:
+        {"status": "success", "series": [(labels, timestamps ndarray, values ndarray)], "truncated": bool}
+        or {"status": "error", "error": ..., "errorType": ...}
+    """
+    url = f"{mimir_url}/prometheus/api/v1/query_range"
+    params = {"query": promql_query, "start": start, "end": end, "step": step}
+    
+    started = time.perf_counter()
+    try:
+        with _get_session(mimir_url).get(
+            url,
+            params=params,
+            timeout=(settings.MIMIR_CONNECT_TIMEOUT_SEC, timeout or settings.MIMIR_RANGE_TIMEOUT_SEC),
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                # Error bodies are small; Prometheus reports status/errorType/error
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                telemetry.observe_mimir_query("error", time.perf_counter() - started)
+                return {
+                    "status": "error",
+                    "error": body.get("error") or f"HTTP {response.status_code}",
+                    "errorType": body.get("errorType", "http_error")
+                }
+            
+            response.raw.decode_content = True
+            series = []
+            truncated = False
+            for item in ijson.items(response.raw, "data.result.item", use_float=True):
+                if len(series) >= settings.MIMIR_RANGE_MAX_SERIES:
+                    truncated = True
+                    break
+                values = item.get("values") or []
+                ts = np.fromiter((float(v[0]) for v in values), dtype=float, count=len(values))
+                vals = np.fromiter((float(v[1]) for v in values), dtype=float, count=len(values))
+                series.append((item.get("metric", {}), ts, vals))
+        
+        telemetry.observe_mimir_query("success", time.perf_counter() - started)
+        return {"status": "success", "series": series, "truncated": truncated}
+    except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+        # ijson reads response.raw, so errors mid-body arrive unwrapped from urllib3
+        telemetry.observe_mimir_query("network_error", time.perf_counter() - started)
+        return {"status": "error", "error": str(e), "errorType": "network_error"}
+    except (ijson.JSONError, ValueError, TypeError, IndexError) as e:
+        telemetry.observe_mimir_query("decode_error", time.perf_counter() - started)
+        return {"status": "error", "error": f"Invalid range query response: {e}", "errorType": "bad_data"}
+
+
+def query_custom_range(
+    stack_id: str,
+    promql_query: str,
+    start: float,
+    end: float,
+    step: float
+) -> Tuple[Dict[str, Any], str]:
+    """
+    Range query against a stack's Mimir through the range cache.
+    
+    Ranges that ended more than one step ago cannot change any more and are
+    cached for METRICS_RANGE_CACHE_TTL_SEC; ranges touching "now" use the
+    normal short TTL.
+    
+    Returns:
+        (query_prometheus_range result, cache status)
+    """
+    stack_info = get_stack_info(stack_id)
+    nlb_dns = stack_info.get("nlb_dns")
+    if not nlb_dns:
+        return {"status": "error", "error": "NLB DNS not found for stack", "errorType": "not_found"}, "miss"
+    
+    mimir_url = f"http://{nlb_dns}/mimir"
+    ttl = settings.METRICS_RANGE_CACHE_TTL_SEC if end < time.time() - step else None
+    result, status = range_cache.get_or_load(
+        (stack_id, promql_query, start, end, step),
+        lambda: query_prometheus_range(mimir_url, promql_query, start, end, step),
+        ttl_sec=ttl,
+        cacheable=_is_success
+    )
+    telemetry.MIMIR_CACHE.labels(status).inc()
+    return result, status
+
+
+def query_custom_range_many(
+    stack_id: str,
+    queries: Dict[str, str],
+    start: float,
+    end: float,
+    step: float
+) -> Dict[str, Tuple[Dict[str, Any], str]]:
+    """
+    query_custom_range for several queries of one stack, run in parallel on
+    the shared query pool.
+    
+    Args:
+        queries: {name: PromQL query}
+    
+    Returns:
+        {name: (query_prometheus_range result, cache status)}
+    """
+    futures = {
+        name: _query_executor.submit(query_custom_range, stack_id, query, start, end, step)
+        for name, query in queries.items()
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _json_values(values: np.ndarray) -> str:
+    """
+    JSON array of floats with NaN / Inf as null (valid JSON)
+    """
+    if np.isfinite(values).all():
+        return json.dumps(values.tolist())
+    return json.dumps([v if math.isfinite(v) else None for v in values.tolist()])
+
+
+def stream_range_result(result: Dict[str, Any], meta: Dict[str, Any]) -> Iterator[bytes]:
+    """
+    Encode a compact range result as JSON, one series per chunk.
+    
+    Output: {...meta, "truncated": bool, "series": [{"metric", "timestamps", "values"}, ...]}
+    """
+    head = json.dumps({**meta, "status": "success", "truncated": result.get("truncated", False)})
+    yield (head[:-1] + ', "series": [').encode("utf-8")
+    for i, (labels, ts, values) in enumerate(result["series"]):
+        chunk = (
+            f'{"," if i else ""}{{"metric": {json.dumps(labels)}, '
+            f'"timestamps": {json.dumps(ts.tolist())}, "values": {_json_values(values)}}}'
+        )
+        yield chunk.encode("utf-8")
+    yield b"]}"
@@ -0,0 +1,215 @@
+"""
+Predictive Scaler - Dự báo tải cục bộ, không gọi LLM trên đường quyết định
+
+- Lấy lịch sử CPU / Memory gần đây (ring buffer của collector, thiếu thì
+  dùng Mimir range query)
+- Đưa mọi stack về cùng một lưới thời gian, fit Holt (level + trend)
+  vector hóa bằng NumPy cho tất cả stack cùng lúc
+- Tính số instance cần để giữ utilisation dưới mục tiêu trong chu kỳ tới
+"""
+
+import time
+import math
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+from .metrics_history import metrics_history
+from .capacity import required_capacity
+from .metrics_service import query_custom_range_many, stack_metric_queries
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Series names written by the collector (see scheduler.collect_metrics_all_stacks)
+CPU_SERIES = "avg_cpu_percent"
+MEMORY_SERIES = "avg_memory_percent"
+
+
+def _history_step() -> float:
+    return float(max(settings.METRICS_COLLECT_INTERVAL_SEC, settings.MIMIR_RANGE_MIN_STEP_SEC))
+
+
+def _range_history(stack_id: str, start: float, end: float, step: float) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Stack-level CPU / memory history from Mimir range queries
+    """
+    queries = stack_metric_queries(stack_id)
+    results = query_custom_range_many(
+        stack_id, {name: f"avg({queries[name]})" for name in ("cpu", "memory")}, start, end, step
+    )
+    series = {}
+    for name, (result, _) in results.items():
+        if result.get("status") != "success" or not result["series"]:
+            return None
+        _, ts, values = result["series"][0]
+        series[name] = (ts, values)
+
+    ts = series["cpu"][0]
+    memory = np.interp(ts, *series["memory"]) if len(series["memory"][0]) else np.zeros_like(ts)
+    return ts, series["cpu"][1], memory
+
+
+def load_history(stack_id: str, lookback_sec: float) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Recent (timestamps, cpu %, memory %) for a stack.
+
+    The local ring buffers are used when they hold enough points; otherwise
+    the history is fetched from the stack's Mimir.
+    """
+    cpu_ts, cpu = metrics_history.window(stack_id, CPU_SERIES, lookback_sec)
+    if len(cpu) >= settings.PREDICTIVE_MIN_POINTS:
+        mem_ts, memory = metrics_history.window(stack_id, MEMORY_SERIES, lookback_sec)
+        memory = np.interp(cpu_ts, mem_ts, memory) if len(memory) else np.zeros_like(cpu)
+        return cpu_ts, cpu, memory
+
+    end = time.time()
+    step = _history_step()
+    try:
+        return _range_history(
+            stack_id,
+            math.floor((end - lookback_sec) / step) * step,
+            math.ceil(end / step) * step,
+            step
+        )
+    except Exception as e:
+        logger.debug(f"Stack {stack_id}: range history unavailable - {e}")
+        return None
+
+
+def holt_forecast(matrix: np.ndarray, alpha: float, beta: float, horizon_steps: float) -> Dict[str, np.ndarray]:
+    """
+    Holt's linear exponential smoothing over every row at once.
+
+    Args:
+        matrix: (stacks x time) values on a common grid
+        alpha: Level smoothing factor
+        beta: Trend smoothing factor
+        horizon_steps: Forecast horizon in grid steps
+
+    Returns:
+        {"level", "trend" (per step), "forecast", "rmse" (one-step-ahead)}: one value per row
+    """
+    level = matrix[:, 0].copy()
+    trend = np.zeros(matrix.shape[0])
+    sq_error = np.zeros(matrix.shape[0])
+
+    for t in range(1, matrix.shape[1]):
+        x = matrix[:, t]
+        predicted = level + trend
+        sq_error += (x - predicted) ** 2
+        previous_level = level
+        level = alpha * x + (1.0 - alpha) * predicted
+        trend = beta * (level - previous_level) + (1.0 - beta) * trend
+
+    steps = max(1, matrix.shape[1] - 1)
+    return {
+        "level": level,
+        "trend": trend,
+        "forecast": np.clip(level + horizon_steps * trend, 0.0, 100.0),
+        "rmse": np.sqrt(sq_error / steps)
+    }
+
+
+def forecast_stacks(stack_ids: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Forecast CPU / memory for many stacks in one vectorized pass.
+
+    Histories are loaded on AUTO_SCALING_EVAL_WORKERS threads, so stacks that
+    need Mimir range queries (short ring buffers after a restart / failover)
+    are fetched concurrently instead of one after another.
+
+    Returns:
+        {stack_id: forecast dict, or None when the history is too short}
+    """
+    lookback = settings.PREDICTIVE_LOOKBACK_SEC
+    step = _history_step()
+    horizon_steps = settings.PREDICTIVE_HORIZON_SEC / step
+
+    histories = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.AUTO_SCALING_EVAL_WORKERS, len(stack_ids)))) as executor:
+        futures = {stack_id: executor.submit(load_history, stack_id, lookback) for stack_id in stack_ids}
+    for stack_id, future in futures.items():
+        history = future.result()
+        if history is not None and len(history[0]) >= settings.PREDICTIVE_MIN_POINTS:
+            histories[stack_id] = history
+
+    results: Dict[str, Optional[Dict[str, Any]]] = {stack_id: None for stack_id in stack_ids}
+    if not histories:
+        return results
+
+    # Common grid; np.interp holds the edge values for stacks with shorter history
+    end = max(ts[-1] for ts, _, _ in histories.values())
+    grid = end - lookback + step * np.arange(int(lookback // step) + 1)
+    ids = list(histories)
+    cpu = np.vstack([np.interp(grid, ts, values) for ts, values, _ in histories.values()])
+    memory = np.vstack([np.interp(grid, ts, values) for ts, _, values in histories.values()])
+
+    alpha, beta = settings.PREDICTIVE_ALPHA, settings.PREDICTIVE_BETA
+    cpu_fit = holt_forecast(cpu, alpha, beta, horizon_steps)
+    memory_fit = holt_forecast(memory, alpha, beta, horizon_steps)
+
+    for i, stack_id in enumerate(ids):
+        results[stack_id] = {
+            "points": int(len(histories[stack_id][0])),
+            "horizon_sec": settings.PREDICTIVE_HORIZON_SEC,
+            "cpu_now": round(float(cpu_fit["level"][i]), 2),
+            "cpu_forecast": round(float(cpu_fit["forecast"][i]), 2),
+            "cpu_trend_per_min": round(float(cpu_fit["trend"][i]) * 60.0 / step, 3),
+            "cpu_rmse": round(float(cpu_fit["rmse"][i]), 3),
+            "memory_now": round(float(memory_fit["level"][i]), 2),
+            "memory_forecast": round(float(memory_fit["forecast"][i]), 2),
+            "memory_trend_per_min": round(float(memory_fit["trend"][i]) * 60.0 / step, 3),
+            "memory_rmse": round(float(memory_fit["rmse"][i]), 3)
+        }
+    return results
+
+
+def required_instances(counts: np.ndarray, cpu_forecast: np.ndarray, memory_forecast: np.ndarray) -> np.ndarray:
+    """
+    Instances needed so the forecast load stays under the utilisation targets
+    (see capacity.required_capacity), in one step.
+    """
+    need_cpu = required_capacity(counts, cpu_forecast, settings.PREDICTIVE_TARGET_CPU_PERCENT)
+    need_memory = required_capacity(counts, memory_forecast, settings.PREDICTIVE_TARGET_MEMORY_PERCENT)
+    required = np.maximum(need_cpu, need_memory).astype(int)
+    return np.clip(required, settings.SCALE_DOWN_MIN_INSTANCES, settings.SCALE_UP_MAX_INSTANCES)
+
+
+def recommend_from_forecast(current_count: int, forecast: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Turn a stack forecast into a recommendation (same shape as the AI advisor's)
+    """
+    target = int(required_instances(
+        np.array([current_count]),
+        np.array([forecast["cpu_forecast"]]),
+        np.array([forecast["memory_forecast"]])
+    )[0])
+
+    if target > current_count:
+        action = "scale_up"
+    elif target < current_count:
+        action = "scale_down"
+    else:
+        action = "no_change"
+
+    # Noisier history -> less confidence in the forecast
+    noise = max(forecast["cpu_rmse"], forecast["memory_rmse"])
+    confidence = round(max(0.3, min(0.95, 0.95 - noise / 50.0)), 2)
+    if action == "no_change":
+        confidence = min(confidence, 0.6)
+
+    reason = (
+        f"Forecast in {forecast['horizon_sec'] // 60} min: CPU {forecast['cpu_forecast']:.1f}% "
+        f"(trend {forecast['cpu_trend_per_min']:+.2f}%/min), Memory {forecast['memory_forecast']:.1f}% "
+        f"-> {target} instance(s) keep CPU <= {settings.PREDICTIVE_TARGET_CPU_PERCENT:.0f}% "
+        f"and Memory <= {settings.PREDICTIVE_TARGET_MEMORY_PERCENT:.0f}%"
+    )
+    return {
+        "action": action,
+        "target_count": target,
+        "reason": reason,
+        "confidence": confidence,
+        "source": "predictive",
+        "forecast": forecast
+    }
@@ -0,0 +1,105 @@
+"""
+Recommendation Cache - Ghi nhớ khuyến nghị của LLM theo trạng thái metrics đã lượng tử hóa
+
+Khi CPU / Memory gần như không đổi, hỏi lại Gemini sẽ cho cùng kết quả:
+- Key = (stack, current_count, bucket CPU / Memory, policy version)
+- TTL (ADVISOR_CACHE_TTL_SEC) + LRU (ADVISOR_CACHE_MAX_ENTRIES)
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Hashable, Optional, Tuple
+from ..core.config import settings
+
+# Bump when the prompt or its rules change so old answers are not reused
+PROMPT_VERSION = "3"
+
+
+def policy_version() -> str:
+    """
+    Short hash of everything besides metrics that shapes an LLM recommendation
+    """
+    policy = {
+        "prompt": PROMPT_VERSION,
+        "min": settings.SCALE_DOWN_MIN_INSTANCES,
+        "max": settings.SCALE_UP_MAX_INSTANCES,
+        "cpu_target": settings.PREDICTIVE_TARGET_CPU_PERCENT,
+        "memory_target": settings.PREDICTIVE_TARGET_MEMORY_PERCENT,
+        "margin": settings.CAPACITY_SAFETY_MARGIN,
+    }
+    return hashlib.sha1(json.dumps(policy, sort_keys=True).encode()).hexdigest()[:10]
+
+
+def quantize(value: Optional[float], bucket: float) -> int:
+    return int((value or 0.0) // bucket)
+
+
+def recommendation_key(stack_id: str, current_count: int, metrics: Dict[str, float]) -> Tuple:
+    bucket = settings.ADVISOR_CACHE_BUCKET_PERCENT
+    return (
+        stack_id,
+        current_count,
+        quantize(metrics.get("avg_cpu_percent"), bucket),
+        quantize(metrics.get("avg_memory_percent"), bucket),
+        quantize(metrics.get("max_cpu_percent"), bucket),
+        policy_version(),
+    )
+
+
+class RecommendationCache:
+    """Thread-safe TTL + LRU map of recommendations"""
+
+    def __init__(self, ttl_sec: float, max_entries: int):
+        self.ttl_sec = ttl_sec
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[1] >= self.ttl_sec:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[0])
+
+    def put(self, key: Hashable, recommendation: Dict[str, Any]):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (dict(recommendation), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_stack(self, stack_id: str):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == stack_id]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "ttl_sec": self.ttl_sec,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "policy_version": policy_version()
+            }
+
+
+# Global cache in front of the LLM advisor
+recommendation_cache = RecommendationCache(
+    ttl_sec=settings.ADVISOR_CACHE_TTL_SEC,
+    max_entries=settings.ADVISOR_CACHE_MAX_ENTRIES
+)
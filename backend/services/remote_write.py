@@ -0,0 +1,295 @@
+"""
+Remote Write - Nhận metrics do stack đẩy lên (Prometheus remote_write)
+
+- Giải mã WriteRequest (snappy block + protobuf) bằng decoder viết tay,
+  không cần thư viện protobuf / file .proto
+- Mẫu được ghi thẳng vào ring buffer theo (stack, series) trong bộ nhớ
+- remote_write giao ít nhất một lần (Prometheus gửi lại batch sau timeout):
+  mẫu có timestamp không mới hơn điểm cuối của series bị bỏ qua
+- get_stack_metrics ưu tiên dữ liệu push còn mới thay vì truy vấn Mimir qua NLB
+"""
+
+import struct
+import time
+import threading
+import numpy as np
+import cramjam
+from typing import Dict, Any, List, Optional, Tuple
+from .metrics_history import RingBuffer
+from ..core.config import settings
+
+# Series the receiver keeps; everything else in a push is counted and dropped
+ACCEPTED_METRICS = {
+    "node_cpu_seconds_total",
+    "node_memory_MemAvailable_bytes",
+    "node_memory_MemTotal_bytes",
+    "up",
+}
+
+# Labels that identify where a series comes from rather than what it measures
+_IDENTITY_LABELS = {"__name__", "instance", "job"}
+
+SeriesKey = Tuple[str, str, str, Tuple[Tuple[str, str], ...]]
+
+
+class RemoteWriteDecodeError(ValueError):
+    pass
+
+
+def _read_varint(buf: bytes, pos: int) -> Tuple[int, int]:
+    result = 0
+    shift = 0
+    while True:
+        if pos >= len(buf):
+            raise RemoteWriteDecodeError("truncated varint")
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+        if shift > 63:
+            raise RemoteWriteDecodeError("varint too long")
+
+
+def _iter_fields(buf: bytes):
+    """
+    Yield (field_number, wire_type, value) for one protobuf message.
+
+    LEN fields yield a memoryview slice, VARINT an int, I64 raw 8 bytes.
+    """
+    pos = 0
+    end = len(buf)
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x07
+        if wire_type == 0:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == 1:
+            value = buf[pos:pos + 8]
+            pos += 8
+        elif wire_type == 2:
+            length, pos = _read_varint(buf, pos)
+            value = buf[pos:pos + length]
+            pos += length
+        elif wire_type == 5:
+            value = buf[pos:pos + 4]
+            pos += 4
+        else:
+            raise RemoteWriteDecodeError(f"unsupported wire type {wire_type}")
+        if pos > end:
+            raise RemoteWriteDecodeError("truncated message")
+        yield field, wire_type, value
+
+
+def _decode_timeseries(buf: bytes) -> Tuple[Dict[str, str], List[Tuple[int, float]]]:
+    labels: Dict[str, str] = {}
+    samples: List[Tuple[int, float]] = []
+    for field, wire_type, value in _iter_fields(buf):
+        if field == 1 and wire_type == 2:
+            name = label_value = ""
+            for f, wt, v in _iter_fields(value):
+                try:
+                    if f == 1 and wt == 2:
+                        name = bytes(v).decode("utf-8")
+                    elif f == 2 and wt == 2:
+                        label_value = bytes(v).decode("utf-8")
+                except UnicodeDecodeError as e:
+                    raise RemoteWriteDecodeError(f"label is not valid UTF-8: {e}")
+            labels[name] = label_value
+        elif field == 2 and wire_type == 2:
+            sample_value = 0.0
+            ts_ms = 0
+            for f, wt, v in _iter_fields(value):
+                if f == 1 and wt == 1:
+                    try:
+                        sample_value = struct.unpack("<d", v)[0]
+                    except struct.error as e:
+                        raise RemoteWriteDecodeError(f"invalid sample value: {e}")
+                elif f == 2 and wt == 0:
+                    # int64 is two's complement on the wire
+                    ts_ms = v - (1 << 64) if v >= 1 << 63 else v
+            samples.append((ts_ms, sample_value))
+    return labels, samples
+
+
+def decode_write_request(body: bytes, compressed: bool = True) -> List[Tuple[Dict[str, str], List[Tuple[int, float]]]]:
+    """
+    Decode a Prometheus remote_write WriteRequest.
+
+    Args:
+        body: HTTP request body
+        compressed: Body is snappy (block format) compressed, as remote_write sends it
+
+    Returns:
+        [(labels, [(timestamp_ms, value), ...]), ...]
+    """
+    if compressed:
+        try:
+            body = bytes(cramjam.snappy.decompress_raw(body))
+        except Exception as e:
+            raise RemoteWriteDecodeError(f"invalid snappy payload: {e}")
+
+    buf = memoryview(body)
+    series = []
+    for field, wire_type, value in _iter_fields(buf):
+        if field == 1 and wire_type == 2:
+            series.append(_decode_timeseries(value))
+    return series
+
+
+class RemoteWriteStore:
+    """Pushed samples kept in fixed-size ring buffers per (stack, series)"""
+
+    def __init__(self, points_per_series: int, series_ttl_sec: float = 600.0):
+        self.points_per_series = points_per_series
+        self.series_ttl_sec = series_ttl_sec
+        self._series: Dict[SeriesKey, RingBuffer] = {}
+        self._last_push: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._last_gc = time.monotonic()
+        self.counters = {"requests": 0, "samples_accepted": 0, "samples_dropped": 0, "samples_duplicate": 0}
+
+    def ingest(self, series: List[Tuple[Dict[str, str], List[Tuple[int, float]]]],
+               default_stack_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Append decoded series to the buffers.
+
+        The stack comes from the METRICS_STACK_LABEL label, else `default_stack_id`.
+        Samples not newer than the last point of their series (a resent batch)
+        are skipped, so counters in the buffers only ever move forward in time.
+
+        Returns:
+            {"accepted": n, "dropped": n, "duplicate": n}
+        """
+        stack_label = settings.METRICS_STACK_LABEL
+        accepted = dropped = duplicate = 0
+        now = time.time()
+
+        with self._lock:
+            for labels, samples in series:
+                name = labels.get("__name__", "")
+                stack_id = labels.get(stack_label) if stack_label else None
+                stack_id = stack_id or default_stack_id
+                if name not in ACCEPTED_METRICS or not stack_id or not samples:
+                    dropped += len(samples)
+                    continue
+
+                extra = tuple(sorted(
+                    (k, v) for k, v in labels.items()
+                    if k not in _IDENTITY_LABELS and k != stack_label
+                ))
+                key = (stack_id, labels.get("instance", ""), name, extra)
+                buffer = self._series.get(key)
+                if buffer is None:
+                    buffer = RingBuffer(self.points_per_series)
+                    self._series[key] = buffer
+
+                points = np.array(samples, dtype=float)
+                points = points[np.argsort(points[:, 0], kind="stable")]
+                ts = points[:, 0] / 1000.0
+                latest = buffer.latest()
+                keep = np.concatenate(([True], np.diff(ts) > 0))
+                if latest is not None:
+                    keep &= ts > latest[0]
+                duplicate += len(samples) - int(keep.sum())
+                if keep.any():
+                    buffer.extend(ts[keep], points[keep, 1])
+                    accepted += int(keep.sum())
+                self._last_push[stack_id] = now
+
+            self.counters["requests"] += 1
+            self.counters["samples_accepted"] += accepted
+            self.counters["samples_dropped"] += dropped
+            self.counters["samples_duplicate"] += duplicate
+
+            if time.monotonic() - self._last_gc > 60:
+                self._gc(now)
+
+        return {"accepted": accepted, "dropped": dropped, "duplicate": duplicate}
+
+    def _gc(self, now: float):
+        cutoff = now - self.series_ttl_sec
+        for key in [k for k, b in self._series.items() if (b.latest() or (0.0, 0.0))[0] < cutoff]:
+            del self._series[key]
+        for stack_id in [s for s, ts in self._last_push.items() if ts < cutoff]:
+            del self._last_push[stack_id]
+        self._last_gc = time.monotonic()
+
+    def is_fresh(self, stack_id: str, max_age_sec: Optional[float] = None) -> bool:
+        max_age = settings.REMOTE_WRITE_FRESH_SEC if max_age_sec is None else max_age_sec
+        return time.time() - self._last_push.get(stack_id, 0.0) <= max_age
+
+    def instance_values(self, stack_id: str, window_sec: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Per-instance CPU %, memory % and up, computed like the PromQL queries
+        in metrics_service.stack_metric_queries().
+
+        Returns:
+            {"cpu": {instance: %}, "memory": {instance: %}, "up": {instance: 0/1}}
+        """
+        window = settings.REMOTE_WRITE_WINDOW_SEC if window_sec is None else window_sec
+        now = time.time()
+        cpu_idle: Dict[str, float] = {}
+        cpu_total: Dict[str, float] = {}
+        mem_available: Dict[str, float] = {}
+        mem_total: Dict[str, float] = {}
+        up: Dict[str, float] = {}
+
+        with self._lock:
+            series = [(k, b) for k, b in self._series.items() if k[0] == stack_id]
+            for (_, instance, name, extra), buffer in series:
+                if name == "node_cpu_seconds_total":
+                    ts, values = buffer.window(window, now)
+                    # Only points in increasing timestamp order count
+                    if len(ts) > 1:
+                        ordered = np.concatenate(([True], ts[1:] > np.maximum.accumulate(ts)[:-1]))
+                        values = values[ordered]
+                    if len(values) < 2:
+                        continue
+                    # Counter increase over the window, tolerating resets
+                    increase = float(np.sum(np.where(np.diff(values) >= 0, np.diff(values), values[1:])))
+                    cpu_total[instance] = cpu_total.get(instance, 0.0) + increase
+                    if dict(extra).get("mode") == "idle":
+                        cpu_idle[instance] = cpu_idle.get(instance, 0.0) + increase
+                    continue
+
+                latest = buffer.latest()
+                if latest is None or latest[0] < now - window:
+                    continue
+                if name == "node_memory_MemAvailable_bytes":
+                    mem_available[instance] = mem_available.get(instance, 0.0) + latest[1]
+                elif name == "node_memory_MemTotal_bytes":
+                    mem_total[instance] = mem_total.get(instance, 0.0) + latest[1]
+                elif name == "up":
+                    up[instance] = latest[1]
+
+        cpu = {
+            instance: 100.0 * (1.0 - cpu_idle.get(instance, 0.0) / total)
+            for instance, total in cpu_total.items() if total > 0
+        }
+        memory = {
+            instance: 100.0 * (1.0 - mem_available[instance] / total)
+            for instance, total in mem_total.items() if total > 0 and instance in mem_available
+        }
+        if not up:
+            # Agents pushing node_exporter series are up by definition
+            up = {instance: 1.0 for instance in set(cpu) | set(memory)}
+        return {"cpu": cpu, "memory": memory, "up": up}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            return {
+                "series": len(self._series),
+                "points_per_series": self.points_per_series,
+                "last_push_age_sec": {stack_id: round(now - ts, 1) for stack_id, ts in sorted(self._last_push.items())},
+                **self.counters
+            }
+
+
+# Global store for pushed samples
+remote_write_store = RemoteWriteStore(
+    points_per_series=settings.REMOTE_WRITE_BUFFER_POINTS,
+    series_ttl_sec=settings.REMOTE_WRITE_SERIES_TTL_SEC
+)
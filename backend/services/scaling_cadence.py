@@ -0,0 +1,240 @@
+"""
+Scaling Cadence - Nhịp đánh giá auto-scaling riêng cho từng stack
+
+- Sau mỗi lần đánh giá, stack được hẹn lần kế tiếp:
+  + sắp scale up, utilisation gần ngưỡng scale up hoặc biến động nhanh
+    -> AUTO_SCALING_MIN_INTERVAL_SEC
+  + đang tăng dần -> đánh giá ít nhất hai lần trước khi chạm ngưỡng
+  + ổn định -> giãn dần (x CADENCE_BACKOFF); đang ở mức tối thiểu và tải
+    thấp -> AUTO_SCALING_MAX_INTERVAL_SEC
+- Ngân sách chung AUTO_SCALING_MAX_EVALS_PER_MINUTE (token bucket); khi
+  vượt, stack có nhịp ngắn nhất / trễ lâu nhất được ưu tiên
+- Ghi đè theo stack trong deploy_metadata.json:
+  {"evaluation_cadence": {"min_interval_sec": 60, "max_interval_sec": 600}}
+  hoặc {"evaluation_cadence": {"interval_sec": 120}} để cố định nhịp
+"""
+
+import time
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+from .metrics_history import metrics_history, window_rate
+from .scaling_guard import cooldown_remaining
+from ..core.config import settings
+
+
+def _interval(value: Any, field: str) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 1 <= value <= 86400:
+        raise ValueError(f"evaluation_cadence.{field} must be a number of seconds in 1..86400")
+    return float(value)
+
+
+def normalize_cadence(raw: Any) -> Dict[str, Any]:
+    """
+    Validate a per-stack cadence override (missing fields use the global settings).
+
+    Raises:
+        ValueError: Invalid override
+    """
+    raw = raw or {}
+    if not isinstance(raw, dict):
+        raise ValueError("evaluation_cadence must be an object")
+    min_interval = _interval(raw.get("min_interval_sec"), "min_interval_sec")
+    max_interval = _interval(raw.get("max_interval_sec"), "max_interval_sec")
+    fixed = _interval(raw.get("interval_sec"), "interval_sec")
+    lower = settings.AUTO_SCALING_MIN_INTERVAL_SEC if min_interval is None else min_interval
+    upper = settings.AUTO_SCALING_MAX_INTERVAL_SEC if max_interval is None else max_interval
+    if lower > upper:
+        raise ValueError("evaluation_cadence.min_interval_sec must be <= max_interval_sec")
+    return {"min_interval_sec": lower, "max_interval_sec": upper, "interval_sec": fixed}
+
+
+def cadence_from_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Effective cadence bounds of a stack (the global ones if none / invalid is stored)
+    """
+    try:
+        return normalize_cadence(metadata.get("evaluation_cadence"))
+    except ValueError:
+        return normalize_cadence(None)
+
+
+def scale_up_thresholds(policy: Dict[str, Any]) -> Dict[str, float]:
+    """
+    {metric: value above which the policy scales up}
+    """
+    thresholds: Dict[str, float] = {}
+    for rule in policy["rules"]:
+        if rule["type"] == "target_tracking":
+            value = rule["target"] * (1.0 + rule["tolerance"])
+        else:
+            lowers = [step["lower"] for step in rule["steps"]
+                      if step["adjustment"] > 0 and step.get("lower") is not None]
+            if not lowers:
+                continue
+            value = min(lowers)
+        thresholds[rule["metric"]] = min(value, thresholds.get(rule["metric"], value))
+    return thresholds
+
+
+def _rates(stack_id: str, metrics: List[str]) -> Dict[str, float]:
+    rates = {}
+    for metric in metrics:
+        ts, values = metrics_history.window(stack_id, metric, settings.CADENCE_RATE_WINDOW_SEC)
+        rates[metric] = window_rate(ts, values) * 60.0
+    return rates
+
+
+def plan_interval(result: Dict[str, Any],
+                  previous: Optional[float] = None,
+                  rates: Optional[Dict[str, float]] = None,
+                  now: Optional[float] = None) -> Tuple[float, str]:
+    """
+    Seconds until the stack's next evaluation.
+
+    Args:
+        result: analyze_and_recommend() result of the evaluation just made
+        previous: Interval used before this evaluation
+        rates: {metric: change per minute} (default: from the metrics history)
+
+    Returns:
+        (interval_sec, reason)
+    """
+    cadence = result.get("cadence") or normalize_cadence(None)
+    lower, upper = cadence["min_interval_sec"], cadence["max_interval_sec"]
+    base = min(max(settings.AUTO_SCALING_INTERVAL_MINUTES * 60.0, lower), upper)
+
+    if cadence["interval_sec"]:
+        return cadence["interval_sec"], "fixed interval (stack override)"
+    if "error" in result or "policy" not in result:
+        return base, "metrics unavailable"
+
+    recommendation = result["recommendation"]
+    action = recommendation["action"]
+    policy = result["policy"]
+    metrics = result["metrics"]
+
+    if action != "no_change":
+        # Nothing can happen before the cooldown ends
+        wait = cooldown_remaining(policy, action, result.get("last_scaled_ts"), now)
+        if wait > 0:
+            return min(max(wait, lower), upper), f"{action} pending, cooldown {wait:.0f}s"
+        if action == "scale_up":
+            return lower, "scale_up pending"
+        # Scale-down waits for its stabilization window at the base pace
+        return base, "scale_down pending"
+
+    thresholds = scale_up_thresholds(policy)
+    if rates is None:
+        rates = _rates(result["stack_id"], list(thresholds))
+
+    interval = max(previous or base, base) * settings.CADENCE_BACKOFF
+    reason = "stable"
+    for metric, threshold in thresholds.items():
+        value = metrics.get(metric)
+        if value is None:
+            continue
+        rate = rates.get(metric, 0.0)
+        if value >= threshold * (1.0 - settings.CADENCE_NEAR_THRESHOLD):
+            return lower, f"{metric} {value:.1f} near scale-up threshold {threshold:.1f}"
+        if abs(rate) >= settings.CADENCE_FAST_CHANGE_PER_MIN:
+            return lower, f"{metric} changing {rate:+.1f}/min"
+        if rate > 0:
+            # Evaluate at least twice before the threshold is reached
+            until = (threshold - value) / rate * 60.0 / 2.0
+            if until < interval:
+                interval, reason = until, f"{metric} rising {rate:+.2f}/min"
+
+    if reason == "stable" and result["current_count"] <= policy["min_instances"]:
+        return upper, "stable at minimum capacity"
+    return min(max(interval, lower), upper), reason
+
+
+class CadencePlanner:
+    """Per-stack next evaluation times and the global evaluation budget"""
+
+    def __init__(self, evals_per_minute: int):
+        self.evals_per_minute = max(1, evals_per_minute)
+        self._tokens = float(self.evals_per_minute)
+        self._refilled_at = time.time()
+        # stack_id -> {"next_due", "interval_sec", "reason", "evaluated_at"}
+        self._plans: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def due(self, stack_ids: List[str], now: Optional[float] = None) -> Tuple[List[str], List[str]]:
+        """
+        Stacks to evaluate now, within the budget.
+
+        Stacks never evaluated are due immediately. When more stacks are due
+        than the budget allows, the ones with the shortest interval (then the
+        most overdue) go first.
+
+        Returns:
+            (due stack ids, stack ids deferred by the budget)
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._tokens = min(
+                float(self.evals_per_minute),
+                self._tokens + max(0.0, now - self._refilled_at) * self.evals_per_minute / 60.0
+            )
+            self._refilled_at = max(now, self._refilled_at)
+
+            due = [sid for sid in stack_ids if self._plans.get(sid, {}).get("next_due", 0.0) <= now]
+            due.sort(key=lambda sid: (
+                self._plans.get(sid, {}).get("interval_sec", 0.0),
+                self._plans.get(sid, {}).get("next_due", 0.0)
+            ))
+            allowed = min(len(due), int(self._tokens))
+            self._tokens -= allowed
+            return due[:allowed], due[allowed:]
+
+    def record(self, result: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Schedule the next evaluation of a stack from its latest result
+        """
+        now = time.time() if now is None else now
+        stack_id = result["stack_id"]
+        with self._lock:
+            previous = self._plans.get(stack_id, {}).get("interval_sec")
+        interval, reason = plan_interval(result, previous, now=now)
+        plan = {
+            "next_due": now + interval,
+            "interval_sec": round(interval, 1),
+            "reason": reason,
+            "evaluated_at": now
+        }
+        with self._lock:
+            self._plans[stack_id] = plan
+        return plan
+
+    def plan(self, stack_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            plan = self._plans.get(stack_id)
+            return dict(plan) if plan else None
+
+    def retain(self, stack_ids: List[str]):
+        """
+        Forget stacks that no longer exist
+        """
+        keep = set(stack_ids)
+        with self._lock:
+            for stack_id in [sid for sid in self._plans if sid not in keep]:
+                del self._plans[stack_id]
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                "evals_per_minute": self.evals_per_minute,
+                "tokens": round(self._tokens, 1),
+                "stacks": {
+                    stack_id: {**plan, "due_in_sec": round(plan["next_due"] - now, 1)}
+                    for stack_id, plan in self._plans.items()
+                }
+            }
+
+
+# Global planner used by the auto-scaling job
+cadence_planner = CadencePlanner(settings.AUTO_SCALING_MAX_EVALS_PER_MINUTE)
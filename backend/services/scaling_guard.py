@@ -0,0 +1,210 @@
+"""
+Scaling Guard - Chống scale liên tục (flapping) trước khi chạy terraform apply
+
+- Stabilization window: hướng scale phải giữ trong N lần đánh giá liên tiếp;
+  scale up lấy mức thấp nhất, scale down lấy mức cao nhất trong cửa sổ
+- Cooldown riêng cho scale up / scale down, tính từ lần scale gần nhất
+  (last_scaled_ts / last_scaled_at trong deploy_metadata.json)
+- Quyết định bị chặn được log kèm lý do và giữ lại để xem qua API; leader ghi
+  log ra SCALING_DECISION_LOG_FILE sau mỗi lượt để worker standby cũng đọc được
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from ..core.config import settings
+from ..core import telemetry
+
+logger = logging.getLogger(__name__)
+
+
+class ScalingCooldownError(ValueError):
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def last_scaled_timestamp(metadata: Dict[str, Any]) -> Optional[float]:
+    """
+    Unix time of the stack's last scaling (None if it was never scaled)
+    """
+    if metadata.get("last_scaled_ts"):
+        return float(metadata["last_scaled_ts"])
+    if metadata.get("last_scaled_at"):
+        try:
+            # Written with time.strftime (local time) by older versions
+            return time.mktime(time.strptime(metadata["last_scaled_at"], "%Y-%m-%d %H:%M:%S"))
+        except ValueError:
+            return None
+    return None
+
+
+def cooldown_remaining(policy: Dict[str, Any], direction: str, last_scaled_ts: Optional[float],
+                       now: Optional[float] = None) -> float:
+    """
+    Seconds until a scale in `direction` ("scale_up" / "scale_down") is allowed
+    """
+    if last_scaled_ts is None:
+        return 0.0
+    key = "scale_up_sec" if direction == "scale_up" else "scale_down_sec"
+    elapsed = (time.time() if now is None else now) - last_scaled_ts
+    return max(0.0, policy["cooldown"][key] - elapsed)
+
+
+class ScalingGuard:
+    """Per-stack recommendation windows and suppressed-decision log"""
+
+    def __init__(self, log_size: int = 100, log_file: Optional[Path] = None):
+        self._windows: Dict[str, deque] = {}
+        self._decisions: Dict[str, deque] = {}
+        self._log_size = log_size
+        self._log_file = log_file
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def review(self,
+               stack_id: str,
+               current_count: int,
+               recommendation: Dict[str, Any],
+               policy: Dict[str, Any],
+               last_scaled_ts: Optional[float],
+               min_confidence: float = 0.0) -> Dict[str, Any]:
+        """
+        Decide whether a recommendation may be executed now.
+
+        Every call counts as one evaluation sample for the stabilization window.
+
+        Returns:
+            {"execute": bool, "action", "target_count", "outcome", "reason"}
+            outcome: approved | no_change | low_confidence | stabilizing | cooldown
+        """
+        stabilization = policy["stabilization"]
+        size = max(stabilization["scale_up_samples"], stabilization["scale_down_samples"])
+        action = recommendation["action"]
+
+        with self._lock:
+            window = self._windows.get(stack_id)
+            if window is None or window.maxlen != size:
+                window = deque(window or (), maxlen=size)
+                self._windows[stack_id] = window
+            window.append(recommendation["target_count"])
+            samples = list(window)
+
+        if action == "no_change":
+            return self._decide(stack_id, action, current_count, "no_change", "No scaling needed")
+
+        if recommendation["confidence"] < min_confidence:
+            return self._decide(
+                stack_id, action, current_count, "low_confidence",
+                f"Confidence {recommendation['confidence']:.2f} < threshold {min_confidence:.2f}"
+            )
+
+        # Stabilization: the direction must hold for the last N evaluations
+        needed = stabilization["scale_up_samples"] if action == "scale_up" else stabilization["scale_down_samples"]
+        recent = samples[-needed:]
+        if action == "scale_up":
+            target = min(recent)
+            stable = len(recent) >= needed and target > current_count
+        else:
+            target = max(recent)
+            stable = len(recent) >= needed and target < current_count
+        if not stable:
+            agreeing = sum(1 for t in recent if (t > current_count if action == "scale_up" else t < current_count))
+            return self._decide(
+                stack_id, action, current_count, "stabilizing",
+                f"{action} to {recommendation['target_count']} held for {agreeing}/{needed} evaluation(s)"
+            )
+
+        remaining = cooldown_remaining(policy, action, last_scaled_ts)
+        if remaining > 0:
+            return self._decide(
+                stack_id, action, current_count, "cooldown",
+                f"{action} to {target} blocked by cooldown ({remaining:.0f}s left)"
+            )
+
+        return self._decide(stack_id, action, target, "approved", recommendation["reason"], execute=True)
+
+    def _decide(self, stack_id: str, action: str, target_count: int, outcome: str, reason: str,
+                execute: bool = False) -> Dict[str, Any]:
+        telemetry.observe_scaling_decision(action, outcome)
+        decision = {
+            "execute": execute,
+            "action": action,
+            "target_count": target_count,
+            "outcome": outcome,
+            "reason": reason
+        }
+        if outcome in ("stabilizing", "cooldown", "low_confidence"):
+            logger.info(f"Stack {stack_id}: suppressed {action} ({outcome}) - {reason}")
+            with self._lock:
+                log = self._decisions.setdefault(stack_id, deque(maxlen=self._log_size))
+                log.append({"at": time.time(), **decision})
+                self._dirty = True
+        return decision
+
+    def record_scaled(self, stack_id: str):
+        """
+        Reset the stack's window after a scale: old samples refer to the old count
+        """
+        with self._lock:
+            self._windows.pop(stack_id, None)
+
+    def suppressed(self, stack_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._decisions.get(stack_id, ()))[-limit:]
+
+    def save(self):
+        """
+        Write the suppressed-decision log to the log file if it changed
+        (atomic replace, so readers never see a partial file)
+        """
+        if self._log_file is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {stack_id: list(log) for stack_id, log in self._decisions.items()}
+            self._dirty = False
+        try:
+            self._log_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self._log_file.parent, prefix=".decisions-", suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp, self._log_file)
+            except Exception:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            logger.warning(f"Saving suppressed decisions to {self._log_file} failed: {e}")
+
+    def saved_suppressed(self, stack_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Suppressed decisions as last saved by the leader (readable from any worker)
+        """
+        if self._log_file is None:
+            return []
+        try:
+            data = json.loads(self._log_file.read_text())
+        except (OSError, ValueError):
+            return []
+        return (data.get(stack_id) or [])[-limit:]
+
+    def drop_stack(self, stack_id: str):
+        with self._lock:
+            self._windows.pop(stack_id, None)
+            if self._decisions.pop(stack_id, None) is not None:
+                self._dirty = True
+
+
+# Global guard used by the scheduler and the auto-scale endpoint
+scaling_guard = ScalingGuard(
+    log_size=settings.SCALING_DECISION_LOG_SIZE,
+    log_file=settings.SCALING_DECISION_LOG_FILE
+)
@@ -0,0 +1,380 @@
+"""
+Scaling Policy - Chính sách scaling khai báo theo từng stack
+
+Lưu trong deploy_metadata.json ("scaling_policy"), ví dụ:
+{
+  "min_instances": 2,
+  "max_instances": 12,
+  "combine": "max",
+  "cooldown": {"scale_up_sec": 300, "scale_down_sec": 900},
+  "stabilization": {"scale_up_samples": 1, "scale_down_samples": 3},
+  "rules": [
+    {"type": "target_tracking", "metric": "avg_cpu_percent", "target": 60, "tolerance": 0.1},
+    {"type": "step", "metric": "max_memory_percent", "steps": [
+      {"lower": 85, "adjustment": 2},
+      {"lower": 75, "upper": 85, "adjustment": 1},
+      {"upper": 40, "adjustment": -1}
+    ]}
+  ]
+}
+
+- Mỗi rule "bỏ phiếu" một số instance mong muốn; rule step không khớp band
+  nào thì phiếu = số hiện tại. combine="max" (mặc định): scale up khi bất kỳ
+  rule nào cần, scale down chỉ khi mọi rule đồng ý
+- Target tracking có hysteresis: metric lệch khỏi target không quá
+  tolerance (mặc định SCALING_TOLERANCE) thì giữ nguyên số instance
+- cooldown / stabilization được scaling_guard áp dụng trước khi scale
+- Policy của cả fleet được compile thành mảng NumPy và đánh giá một lượt
+"""
+
+import json
+import math
+import hashlib
+import numpy as np
+from typing import Dict, Any, List, Optional
+from .capacity import required_capacity
+from ..core.config import settings
+
+RULE_TYPES = ("target_tracking", "step")
+COMBINE_MODES = ("max", "min")
+
+
+def _default_cooldown() -> Dict[str, float]:
+    return {
+        "scale_up_sec": settings.SCALE_UP_COOLDOWN_SEC,
+        "scale_down_sec": settings.SCALE_DOWN_COOLDOWN_SEC
+    }
+
+
+def _default_stabilization() -> Dict[str, int]:
+    return {
+        "scale_up_samples": max(1, settings.SCALE_UP_STABILIZATION_SAMPLES),
+        "scale_down_samples": max(1, settings.SCALE_DOWN_STABILIZATION_SAMPLES)
+    }
+
+
+def default_policy() -> Dict[str, Any]:
+    """
+    Target tracking on the utilisation targets used by the capacity calculator
+    """
+    return {
+        "min_instances": settings.SCALE_DOWN_MIN_INSTANCES,
+        "max_instances": settings.SCALE_UP_MAX_INSTANCES,
+        "combine": "max",
+        "cooldown": _default_cooldown(),
+        "stabilization": _default_stabilization(),
+        "rules": [
+            {"type": "target_tracking", "metric": "avg_cpu_percent",
+             "target": settings.PREDICTIVE_TARGET_CPU_PERCENT, "tolerance": settings.SCALING_TOLERANCE},
+            {"type": "target_tracking", "metric": "avg_memory_percent",
+             "target": settings.PREDICTIVE_TARGET_MEMORY_PERCENT, "tolerance": settings.SCALING_TOLERANCE}
+        ]
+    }
+
+
+def _number(value: Any, field: str, allow_none: bool = False) -> Optional[float]:
+    if value is None and allow_none:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{field} must be a finite number")
+    return float(value)
+
+
+def normalize_policy(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate a policy and fill in defaults.
+
+    Raises:
+        ValueError: Invalid policy
+    """
+    if not isinstance(raw, dict):
+        raise ValueError("Policy must be an object")
+
+    min_instances = int(_number(raw.get("min_instances", settings.SCALE_DOWN_MIN_INSTANCES), "min_instances"))
+    max_instances = int(_number(raw.get("max_instances", settings.SCALE_UP_MAX_INSTANCES), "max_instances"))
+    if not settings.SCALE_DOWN_MIN_INSTANCES <= min_instances <= max_instances <= settings.SCALE_UP_MAX_INSTANCES:
+        raise ValueError(
+            f"Require {settings.SCALE_DOWN_MIN_INSTANCES} <= min_instances <= max_instances "
+            f"<= {settings.SCALE_UP_MAX_INSTANCES}"
+        )
+
+    combine = raw.get("combine", "max")
+    if combine not in COMBINE_MODES:
+        raise ValueError(f"combine must be one of {COMBINE_MODES}")
+
+    cooldown = _default_cooldown()
+    for field, value in (raw.get("cooldown") or {}).items():
+        if field not in cooldown:
+            raise ValueError(f"Unknown cooldown field: {field}")
+        cooldown[field] = _number(value, f"cooldown.{field}")
+        if cooldown[field] < 0:
+            raise ValueError(f"cooldown.{field} must be >= 0")
+
+    stabilization = _default_stabilization()
+    for field, value in (raw.get("stabilization") or {}).items():
+        if field not in stabilization:
+            raise ValueError(f"Unknown stabilization field: {field}")
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            raise ValueError(f"stabilization.{field} must be an integer >= 1")
+        stabilization[field] = value
+
+    rules = raw.get("rules") or []
+    if not isinstance(rules, list) or not rules:
+        raise ValueError("Policy needs at least one rule")
+
+    normalized_rules = []
+    for i, rule in enumerate(rules):
+        if not isinstance(rule, dict) or rule.get("type") not in RULE_TYPES:
+            raise ValueError(f"rules[{i}].type must be one of {RULE_TYPES}")
+        metric = rule.get("metric")
+        if not isinstance(metric, str) or not metric:
+            raise ValueError(f"rules[{i}].metric is required")
+
+        if rule["type"] == "target_tracking":
+            target = _number(rule.get("target"), f"rules[{i}].target")
+            if target <= 0:
+                raise ValueError(f"rules[{i}].target must be > 0")
+            tolerance = _number(rule.get("tolerance", settings.SCALING_TOLERANCE), f"rules[{i}].tolerance")
+            if not 0 <= tolerance < 1:
+                raise ValueError(f"rules[{i}].tolerance must be in [0, 1)")
+            normalized_rules.append({
+                "type": "target_tracking", "metric": metric, "target": target, "tolerance": tolerance
+            })
+            continue
+
+        steps = rule.get("steps") or []
+        if not isinstance(steps, list) or not steps:
+            raise ValueError(f"rules[{i}].steps must be a non-empty list")
+        bands = []
+        for j, step in enumerate(steps):
+            field = f"rules[{i}].steps[{j}]"
+            lower = _number(step.get("lower"), f"{field}.lower", allow_none=True)
+            upper = _number(step.get("upper"), f"{field}.upper", allow_none=True)
+            if lower is None and upper is None:
+                raise ValueError(f"{field} needs lower and/or upper")
+            if lower is not None and upper is not None and lower >= upper:
+                raise ValueError(f"{field}.lower must be < upper")
+            adjustment = step.get("adjustment")
+            if isinstance(adjustment, bool) or not isinstance(adjustment, int) or adjustment == 0:
+                raise ValueError(f"{field}.adjustment must be a non-zero integer")
+            bands.append({"lower": lower, "upper": upper, "adjustment": adjustment})
+
+        # Bands of one rule must not overlap, otherwise the vote is ambiguous
+        ordered = sorted(bands, key=lambda b: -math.inf if b["lower"] is None else b["lower"])
+        for a, b in zip(ordered, ordered[1:]):
+            a_upper = math.inf if a["upper"] is None else a["upper"]
+            b_lower = -math.inf if b["lower"] is None else b["lower"]
+            if b_lower < a_upper:
+                raise ValueError(f"rules[{i}].steps bands overlap")
+        normalized_rules.append({"type": "step", "metric": metric, "steps": bands})
+
+    return {
+        "min_instances": min_instances,
+        "max_instances": max_instances,
+        "combine": combine,
+        "cooldown": cooldown,
+        "stabilization": stabilization,
+        "rules": normalized_rules
+    }
+
+
+def policy_from_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Effective policy of a stack (the default policy if none / invalid is stored)
+    """
+    raw = metadata.get("scaling_policy")
+    if raw:
+        try:
+            return normalize_policy(raw)
+        except ValueError:
+            pass
+    return default_policy()
+
+
+def policy_hash(policy: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(policy, sort_keys=True).encode()).hexdigest()[:10]
+
+
+class CompiledPolicies:
+    """
+    Fleet policies flattened into arrays:
+    - one row per target-tracking rule
+    - one row per step band (with the rule it belongs to)
+    """
+
+    def __init__(self, policies: Dict[str, Dict[str, Any]]):
+        self.stack_ids = list(policies)
+        self.policies = policies
+        index = {stack_id: i for i, stack_id in enumerate(self.stack_ids)}
+
+        self.metrics = sorted({rule["metric"] for p in policies.values() for rule in p["rules"]})
+        metric_index = {m: i for i, m in enumerate(self.metrics)}
+
+        self.min_instances = np.array([p["min_instances"] for p in policies.values()], dtype=float)
+        self.max_instances = np.array([p["max_instances"] for p in policies.values()], dtype=float)
+        self.combine_max = np.array([p["combine"] == "max" for p in policies.values()], dtype=bool)
+
+        # Rule table: (stack row, metric column) per rule
+        self.rule_meta: List[Dict[str, Any]] = []
+        rule_stack, rule_metric = [], []
+        tt_rule, tt_target, tt_tolerance = [], [], []
+        band_rule, band_lower, band_upper, band_adjustment = [], [], [], []
+
+        for stack_id, policy in policies.items():
+            for rule in policy["rules"]:
+                rule_id = len(self.rule_meta)
+                self.rule_meta.append({"stack_id": stack_id, **rule})
+                rule_stack.append(index[stack_id])
+                rule_metric.append(metric_index[rule["metric"]])
+                if rule["type"] == "target_tracking":
+                    tt_rule.append(rule_id)
+                    tt_target.append(rule["target"])
+                    tt_tolerance.append(rule["tolerance"])
+                else:
+                    for band in rule["steps"]:
+                        band_rule.append(rule_id)
+                        band_lower.append(-np.inf if band["lower"] is None else band["lower"])
+                        band_upper.append(np.inf if band["upper"] is None else band["upper"])
+                        band_adjustment.append(band["adjustment"])
+
+        self.rule_stack = np.array(rule_stack, dtype=int)
+        self.rule_metric = np.array(rule_metric, dtype=int)
+        self.tt_rule = np.array(tt_rule, dtype=int)
+        self.tt_target = np.array(tt_target, dtype=float)
+        self.tt_tolerance = np.array(tt_tolerance, dtype=float)
+        self.band_rule = np.array(band_rule, dtype=int)
+        self.band_lower = np.array(band_lower, dtype=float)
+        self.band_upper = np.array(band_upper, dtype=float)
+        self.band_adjustment = np.array(band_adjustment, dtype=float)
+
+    def evaluate(self, counts: Dict[str, int], metrics: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Evaluate every stack's policy in one pass.
+
+        Args:
+            counts: {stack_id: current instance count}
+            metrics: {stack_id: {metric name: value}}
+
+        Returns:
+            {stack_id: {"target_count", "action", "votes": [...]}}
+        """
+        n = len(self.stack_ids)
+        count = np.array([counts.get(s, 0) for s in self.stack_ids], dtype=float)
+        values = np.full((n, len(self.metrics)), np.nan)
+        for i, stack_id in enumerate(self.stack_ids):
+            stack_metrics = metrics.get(stack_id, {})
+            for j, metric in enumerate(self.metrics):
+                value = stack_metrics.get(metric)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values[i, j] = value
+
+        rule_values = values[self.rule_stack, self.rule_metric] if len(self.rule_meta) else np.array([])
+        rule_count = count[self.rule_stack] if len(self.rule_meta) else np.array([])
+
+        # Step rules vote "current count" unless a band matches; missing metric -> no vote
+        votes = rule_count.copy()
+        if len(self.band_rule):
+            band_values = rule_values[self.band_rule]
+            matched = (band_values >= self.band_lower) & (band_values < self.band_upper)
+            votes[self.band_rule[matched]] = rule_count[self.band_rule[matched]] + self.band_adjustment[matched]
+
+        # Target tracking: jump straight to the capacity that puts the metric on
+        # its target (plus safety margin), unless it is within the tolerance band
+        if len(self.tt_rule):
+            votes[self.tt_rule] = required_capacity(
+                rule_count[self.tt_rule], rule_values[self.tt_rule], self.tt_target, tolerance=self.tt_tolerance
+            )
+
+        votes[np.isnan(rule_values)] = np.nan
+
+        combined_max = np.full(n, np.nan)
+        combined_min = np.full(n, np.nan)
+        if len(votes):
+            np.fmax.at(combined_max, self.rule_stack, votes)
+            np.fmin.at(combined_min, self.rule_stack, votes)
+        desired = np.where(self.combine_max, combined_max, combined_min)
+        desired = np.where(np.isnan(desired), count, desired)
+        target = np.clip(desired, self.min_instances, self.max_instances).astype(int)
+
+        results = {}
+        for i, stack_id in enumerate(self.stack_ids):
+            results[stack_id] = {
+                "target_count": int(target[i]),
+                "action": "scale_up" if target[i] > count[i] else "scale_down" if target[i] < count[i] else "no_change",
+                "votes": []
+            }
+        for rule_id, meta in enumerate(self.rule_meta):
+            vote = votes[rule_id]
+            results[meta["stack_id"]]["votes"].append({
+                "type": meta["type"],
+                "metric": meta["metric"],
+                "value": None if np.isnan(rule_values[rule_id]) else round(float(rule_values[rule_id]), 2),
+                "desired": None if np.isnan(vote) else int(vote)
+            })
+        return results
+
+
+_compiled: Optional[CompiledPolicies] = None
+_compiled_key: Optional[str] = None
+
+
+def compile_policies(policies: Dict[str, Dict[str, Any]]) -> CompiledPolicies:
+    """
+    Compile fleet policies, reusing the last compilation while nothing changed
+    """
+    global _compiled, _compiled_key
+    key = json.dumps(policies, sort_keys=True)
+    compiled = _compiled
+    if compiled is None or _compiled_key != key:
+        compiled = CompiledPolicies(policies)
+        _compiled, _compiled_key = compiled, key
+    return compiled
+
+
+def describe_decision(decision: Dict[str, Any]) -> str:
+    parts = [
+        f"{v['type']} {v['metric']}={v['value']} -> {v['desired']}"
+        for v in decision["votes"] if v["desired"] is not None
+    ]
+    return f"Policy: {'; '.join(parts) or 'no metric data'} => {decision['target_count']} instance(s)"
+
+
+def evaluate_policies(states: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Policy recommendations for many stacks (same shape as the AI advisor's).
+
+    Args:
+        states: [{"stack_id", "current_count", "metrics", "policy"}]
+    """
+    if not states:
+        return {}
+    compiled = compile_policies({s["stack_id"]: s["policy"] for s in states})
+    decisions = compiled.evaluate(
+        {s["stack_id"]: s["current_count"] for s in states},
+        {s["stack_id"]: s["metrics"] for s in states}
+    )
+    recommendations = {}
+    for stack_id, decision in decisions.items():
+        recommendations[stack_id] = {
+            "action": decision["action"],
+            "target_count": decision["target_count"],
+            "reason": describe_decision(decision),
+            "confidence": 0.9 if decision["action"] != "no_change" else 0.6,
+            "source": "policy",
+            "votes": decision["votes"]
+        }
+    return recommendations
+
+
+def clamp_to_policy(recommendation: Dict[str, Any], current_count: int, policy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Apply a stack's min/max bounds to a recommendation from any advisor
+    """
+    target = max(policy["min_instances"], min(policy["max_instances"], recommendation["target_count"]))
+    if target == recommendation["target_count"]:
+        return recommendation
+    recommendation = dict(recommendation)
+    recommendation["target_count"] = target
+    recommendation["action"] = "scale_up" if target > current_count else "scale_down" if target < current_count else "no_change"
+    recommendation["reason"] += f" (bounded to {policy['min_instances']}-{policy['max_instances']} by stack policy)"
+    return recommendation
@@ -0,0 +1,287 @@
+"""
+Scaling Schedule - Lịch capacity tối thiểu và pre-scaling theo mùa vụ
+
+Lưu trong deploy_metadata.json:
+{
+  "scaling_schedules": [
+    {"name": "office-hours", "cron": "30 7 * * mon-fri", "duration_minutes": 600,
+     "timezone": "Asia/Ho_Chi_Minh", "min_instances": 4}
+  ],
+  "seasonality": {"enabled": true, "lead_minutes": 15}
+}
+
+- Schedule: từ mỗi lần cron kích hoạt, trong duration_minutes stack giữ ít
+  nhất min_instances (cron job scale lên ngay lúc bắt đầu, advisor không
+  scale down dưới mức này trong cửa sổ)
+- Seasonality: học profile tải theo giờ trong tuần (hoặc trong ngày khi lịch
+  sử ngắn) từ Mimir range query / metrics archive, rồi nâng mức tối thiểu
+  trước đỉnh dự đoán lead_minutes
+"""
+
+import time
+import logging
+import threading
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from apscheduler.triggers.cron import CronTrigger
+from .capacity import required_capacity
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+WEEK_SEC = 7 * 86400
+DAY_SEC = 86400
+
+
+def cron_trigger(schedule: Dict[str, Any]) -> CronTrigger:
+    return CronTrigger.from_crontab(schedule["cron"], timezone=schedule["timezone"])
+
+
+def normalize_schedules(raw: Any) -> List[Dict[str, Any]]:
+    """
+    Validate per-stack schedules.
+
+    Raises:
+        ValueError: Invalid schedule
+    """
+    if not isinstance(raw, list):
+        raise ValueError("schedules must be a list")
+
+    schedules = []
+    names = set()
+    for i, item in enumerate(raw):
+        if not isinstance(item, dict):
+            raise ValueError(f"schedules[{i}] must be an object")
+        name = item.get("name") or f"schedule-{i}"
+        if name in names:
+            raise ValueError(f"Duplicate schedule name: {name}")
+        names.add(name)
+
+        schedule = {
+            "name": name,
+            "cron": item.get("cron", ""),
+            "duration_minutes": item.get("duration_minutes"),
+            "timezone": item.get("timezone") or settings.SCHEDULE_DEFAULT_TIMEZONE,
+            "min_instances": item.get("min_instances")
+        }
+        try:
+            cron_trigger(schedule)
+        except Exception as e:
+            raise ValueError(f"schedules[{i}]: invalid cron / timezone - {e}")
+        duration = schedule["duration_minutes"]
+        if isinstance(duration, bool) or not isinstance(duration, int) or not 1 <= duration <= 7 * 24 * 60:
+            raise ValueError(f"schedules[{i}].duration_minutes must be an integer in 1..10080")
+        min_instances = schedule["min_instances"]
+        if (isinstance(min_instances, bool) or not isinstance(min_instances, int)
+                or not settings.SCALE_DOWN_MIN_INSTANCES <= min_instances <= settings.SCALE_UP_MAX_INSTANCES):
+            raise ValueError(
+                f"schedules[{i}].min_instances must be in "
+                f"{settings.SCALE_DOWN_MIN_INSTANCES}..{settings.SCALE_UP_MAX_INSTANCES}"
+            )
+        schedules.append(schedule)
+    return schedules
+
+
+def normalize_seasonality(raw: Any) -> Dict[str, Any]:
+    raw = raw or {}
+    if not isinstance(raw, dict):
+        raise ValueError("seasonality must be an object")
+    lead = raw.get("lead_minutes", settings.SEASONALITY_LEAD_MINUTES)
+    if isinstance(lead, bool) or not isinstance(lead, int) or not 0 <= lead <= 24 * 60:
+        raise ValueError("seasonality.lead_minutes must be an integer in 0..1440")
+    return {"enabled": bool(raw.get("enabled", False)), "lead_minutes": lead}
+
+
+def active_schedules(schedules: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Schedules whose window contains `now` (window = cron fire time + duration)
+    """
+    now = now or datetime.now(timezone.utc)
+    active = []
+    for schedule in schedules:
+        window = timedelta(minutes=schedule["duration_minutes"])
+        fired = cron_trigger(schedule).get_next_fire_time(None, now - window)
+        if fired is not None and fired <= now:
+            active.append({**schedule, "started_at": fired.isoformat(), "ends_at": (fired + window).isoformat()})
+    return active
+
+
+def capacity_floor(metadata: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Minimum instance count imposed by schedules and the learned seasonal floor.
+
+    Returns:
+        {"min_instances": int or 0, "sources": [...]}
+    """
+    now = time.time() if now is None else now
+    sources = []
+    try:
+        schedules = normalize_schedules(metadata.get("scaling_schedules") or [])
+    except ValueError:
+        schedules = []
+    for schedule in active_schedules(schedules, datetime.fromtimestamp(now, timezone.utc)):
+        sources.append({
+            "type": "schedule",
+            "name": schedule["name"],
+            "min_instances": schedule["min_instances"],
+            "until": schedule["ends_at"]
+        })
+
+    seasonal = metadata.get("seasonal_floor") or {}
+    if seasonal.get("until_ts", 0) > now and seasonal.get("min_instances"):
+        sources.append({
+            "type": "seasonality",
+            "name": "seasonality",
+            "min_instances": int(seasonal["min_instances"]),
+            "until": datetime.fromtimestamp(seasonal["until_ts"], timezone.utc).isoformat()
+        })
+
+    return {
+        "min_instances": max((s["min_instances"] for s in sources), default=0),
+        "sources": sources
+    }
+
+
+def apply_floor(policy: Dict[str, Any], floor: int) -> Dict[str, Any]:
+    """
+    Policy with min_instances raised to the floor (never above max_instances)
+    """
+    if floor <= policy["min_instances"]:
+        return policy
+    return {**policy, "min_instances": min(floor, policy["max_instances"])}
+
+
+# ---------------------------------------------------------------- seasonality
+
+def _demand_history(stack_id: str, start: float, end: float) -> Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Hourly (timestamps, CPU demand, memory demand) in instance-equivalents.
+
+    The metrics archive is used when it covers the range, otherwise the
+    stack's Mimir is range-queried.
+    """
+    if settings.METRICS_ARCHIVE_ENABLED:
+        from .metrics_archive import metrics_archive
+        series = {}
+        for metric in ("avg_cpu_percent", "avg_memory_percent", "instance_count"):
+            points = metrics_archive.query(stack_id, metric, start, end, resolution="1h")["points"]
+            if points:
+                array = np.array(points, dtype=float)
+                series[metric] = (array[:, 0], array[:, 1])
+        if "avg_cpu_percent" in series and "instance_count" in series:
+            ts, cpu = series["avg_cpu_percent"]
+            if ts[-1] - ts[0] >= settings.SEASONALITY_MIN_DAYS * DAY_SEC:
+                counts = np.interp(ts, *series["instance_count"])
+                memory = np.interp(ts, *series["avg_memory_percent"]) if "avg_memory_percent" in series else np.zeros_like(cpu)
+                return ts, cpu * counts / 100.0, memory * counts / 100.0
+
+    from .metrics_service import query_custom_range_many, stack_metric_queries
+    queries = stack_metric_queries(stack_id)
+    results = query_custom_range_many(
+        stack_id, {name: f"sum({queries[name]}) / 100" for name in ("cpu", "memory")}, start, end, 3600
+    )
+    demand = {}
+    for name, (result, _) in results.items():
+        if result.get("status") != "success" or not result["series"]:
+            return None
+        _, ts, values = result["series"][0]
+        keep = ~np.isnan(values)
+        demand[name] = (ts[keep], values[keep])
+    ts, cpu = demand["cpu"]
+    if len(ts) == 0:
+        return None
+    memory = np.interp(ts, *demand["memory"]) if len(demand["memory"][0]) else np.zeros_like(cpu)
+    return ts, cpu, memory
+
+
+def seasonal_profile(ts: np.ndarray, values: np.ndarray, percentile: float) -> Optional[Dict[str, Any]]:
+    """
+    Percentile of `values` per hour-of-week, or per hour-of-day when the
+    history does not cover every hour of the week at least twice.
+    """
+    if len(ts) == 0:
+        return None
+    hours = (ts // 3600).astype(int)
+    for period, buckets in (("weekly", 168), ("daily", 24)):
+        # Unix epoch started on a Thursday; only the bucket index matters here
+        bucket = hours % buckets
+        counts = np.bincount(bucket, minlength=buckets)
+        if counts.min() >= 2:
+            order = np.argsort(bucket, kind="stable")
+            groups = np.split(values[order], np.cumsum(counts)[:-1])
+            return {
+                "period": period,
+                "buckets": buckets,
+                "values": np.array([np.percentile(g, percentile) for g in groups])
+            }
+    return None
+
+
+def predicted_demand(profile: Dict[str, Any], start: float, end: float) -> float:
+    """
+    Highest profile value over the hours touching [start, end]
+    """
+    hours = np.arange(int(start // 3600), int(end // 3600) + 1)
+    return float(profile["values"][hours % profile["buckets"]].max())
+
+
+class SeasonalityModel:
+    """Per-stack CPU / memory profiles, relearned every SEASONALITY_RELEARN_HOURS"""
+
+    def __init__(self):
+        self._profiles: Dict[str, Tuple[float, Optional[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def profiles(self, stack_id: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            cached = self._profiles.get(stack_id)
+        if cached and now - cached[0] < settings.SEASONALITY_RELEARN_HOURS * 3600:
+            return cached[1], cached[2]
+
+        history = _demand_history(stack_id, now - settings.SEASONALITY_LOOKBACK_DAYS * DAY_SEC, now)
+        if history is None:
+            cpu_profile = memory_profile = None
+        else:
+            ts, cpu, memory = history
+            cpu_profile = seasonal_profile(ts, cpu, settings.SEASONALITY_PERCENTILE)
+            memory_profile = seasonal_profile(ts, memory, settings.SEASONALITY_PERCENTILE)
+        with self._lock:
+            self._profiles[stack_id] = (now, cpu_profile, memory_profile)
+        return cpu_profile, memory_profile
+
+    def forecast_floor(self, stack_id: str, lead_minutes: int, window_sec: float,
+                       now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """
+        Instances needed for the predicted peak in [now + lead, now + lead + window]
+        """
+        now = time.time() if now is None else now
+        cpu_profile, memory_profile = self.profiles(stack_id, now)
+        if cpu_profile is None:
+            return None
+        start = now + lead_minutes * 60
+        cpu = predicted_demand(cpu_profile, start, start + window_sec)
+        memory = predicted_demand(memory_profile, start, start + window_sec) if memory_profile else 0.0
+        # Demand is in instance-equivalents: capacity for one instance at demand x 100 %
+        need = max(
+            required_capacity(np.array([1.0]), np.array([cpu * 100.0]),
+                              np.array([settings.PREDICTIVE_TARGET_CPU_PERCENT]), tolerance=0.0)[0],
+            required_capacity(np.array([1.0]), np.array([memory * 100.0]),
+                              np.array([settings.PREDICTIVE_TARGET_MEMORY_PERCENT]), tolerance=0.0)[0]
+        )
+        return {
+            "min_instances": int(np.clip(need, settings.SCALE_DOWN_MIN_INSTANCES, settings.SCALE_UP_MAX_INSTANCES)),
+            "period": cpu_profile["period"],
+            "predicted_cpu_demand": round(cpu, 2),
+            "predicted_memory_demand": round(memory, 2),
+            "until_ts": start + window_sec
+        }
+
+    def drop_stack(self, stack_id: str):
+        with self._lock:
+            self._profiles.pop(stack_id, None)
+
+
+# Global seasonality model used by the pre-scaling job
+seasonality_model = SeasonalityModel()
@@ -1,9 +1,129 @@
+import os
 import json
+import time
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Callable
 from .terraform import run, build_aws_env, render_tf, TEMPLATE_AWS_MAIN
+from .scaling_policy import policy_from_metadata
+from .scaling_guard import ScalingCooldownError, cooldown_remaining, last_scaled_timestamp
 from ..core.config import settings
 
+try:
+    import fcntl
+except ImportError:  # Windows: in-process guard only
+    fcntl = None
+
+
+# Terraform outputs per stack, keyed by the tfstate file signature so any
+# apply / destroy (which rewrites terraform.tfstate) invalidates the entry
+_outputs_cache: Dict[str, tuple] = {}
+_outputs_cache_lock = threading.Lock()
+
+# Serializes read-modify-write of deploy_metadata.json (policy API vs. scaling)
+_metadata_lock = threading.Lock()
+
+# Stacks with a scale operation (terraform apply) running
+_operations_in_flight: Dict[str, float] = {}
+_operations_lock = threading.Lock()
+
+
+class ScalingInProgressError(ValueError):
+    pass
+
+
+def _lock_stack_dir(stack_id: str) -> Optional[int]:
+    """
+    Exclusive flock on the stack's .scale.lock so other workers' scale
+    operations on the stack fail fast instead of running a second apply.
+    
+    Returns:
+        Locked file descriptor (None if flock is unavailable / no stack dir)
+    
+    Raises:
+        ScalingInProgressError: Another process holds the lock
+    """
+    workdir = settings.TF_WORK_ROOT / stack_id
+    if fcntl is None or not workdir.is_dir():
+        return None
+    fd = os.open(workdir / ".scale.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        raise ScalingInProgressError(f"Stack {stack_id} is being scaled by another worker")
+    return fd
+
+
+@contextmanager
+def stack_operation(stack_id: str):
+    """
+    Mark a stack as busy for the duration of a scale operation, within this
+    process and across workers sharing TF_WORK_ROOT.
+    
+    Raises:
+        ScalingInProgressError: Another operation on the stack is running
+    """
+    with _operations_lock:
+        if stack_id in _operations_in_flight:
+            raise ScalingInProgressError(f"Stack {stack_id} already has a scaling operation in progress")
+        _operations_in_flight[stack_id] = time.time()
+    fd = None
+    try:
+        fd = _lock_stack_dir(stack_id)
+        yield
+    finally:
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        with _operations_lock:
+            _operations_in_flight.pop(stack_id, None)
+
+
+def operations_in_flight() -> Dict[str, float]:
+    """
+    {stack_id: start time} of running scale operations
+    """
+    with _operations_lock:
+        return dict(_operations_in_flight)
+
+
+def _tfstate_signature(workdir: Path) -> Optional[tuple]:
+    try:
+        stat = (workdir / "terraform.tfstate").stat()
+        return (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return None
+
+
+def get_terraform_outputs(stack_id: str, region: str) -> Dict[str, Any]:
+    """
+    `terraform output -json` for a stack, cached until terraform.tfstate changes.
+    
+    Avoids forking Terraform on every stack lookup (dashboard, metrics,
+    advisor, scheduler all need the NLB DNS / instance IPs).
+    """
+    workdir = settings.TF_WORK_ROOT / stack_id
+    signature = _tfstate_signature(workdir)
+    
+    with _outputs_cache_lock:
+        cached = _outputs_cache.get(stack_id)
+    if signature is not None and cached and cached[0] == signature:
+        return cached[1]
+    
+    aws_env = build_aws_env(region=region)
+    try:
+        p = run([settings.TF_BIN, "output", "-json"], cwd=workdir, extra_env=aws_env)
+        outputs = json.loads(p.stdout) if p.returncode == 0 else {}
+    except Exception:
+        return {}
+    
+    if signature is not None and p.returncode == 0:
+        with _outputs_cache_lock:
+            _outputs_cache[stack_id] = (signature, outputs)
+    return outputs
+
 
 def get_stack_info(stack_id: str) -> Dict[str, Any]:
     """
@@ -25,15 +145,9 @@ def get_stack_info(stack_id: str) -> Dict[str, Any]:
     with open(metadata_file, 'r') as f:
         metadata = json.load(f)
     
-    # Get current outputs from Terraform
+    # Get current outputs from Terraform (cached until tfstate changes)
     region = metadata.get("region", settings.DEFAULT_REGION)
-    aws_env = build_aws_env(region=region)
-    
-    try:
-        p = run([settings.TF_BIN, "output", "-json"], cwd=workdir, extra_env=aws_env)
-        outputs = json.loads(p.stdout) if p.returncode == 0 else {}
-    except Exception as e:
-        outputs = {}
+    outputs = get_terraform_outputs(stack_id, region)
     
     # Extract instance information
     instance_ips = outputs.get("instance_public_ip", {}).get("value", [])
@@ -80,7 +194,27 @@ def list_active_stacks() -> List[Dict[str, Any]]:
     return stacks
 
 
-def scale_stack(stack_id: str, target_count: int, reason: Optional[str] = None) -> Dict[str, Any]:
+def update_stack_metadata(stack_id: str, mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """
+    Load a stack's deploy_metadata.json, apply `mutate` in place and write it back.
+    
+    Returns:
+        The updated metadata
+    """
+    metadata_file = settings.TF_WORK_ROOT / stack_id / "deploy_metadata.json"
+    if not metadata_file.exists():
+        raise ValueError(f"Stack {stack_id} metadata not found")
+    
+    with _metadata_lock:
+        with open(metadata_file, 'r') as f:
+            metadata = json.load(f)
+        mutate(metadata)
+        with open(metadata_file, 'w') as f:
+            json.dump(metadata, f, indent=2)
+    return metadata
+
+
+def scale_stack(stack_id: str, target_count: int, reason: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
     """
     Scale a stack to target_count instances by re-rendering Terraform and applying.
     
@@ -94,11 +228,21 @@ def scale_stack(stack_id: str, target_count: int, reason: Optional[str] = None)
         stack_id: Stack identifier
         target_count: Desired number of instances
         reason: Optional reason for scaling
+        force: Ignore the stack's scale up / scale down cooldown
     
     Returns:
         Dict with success status, old/new counts, logs
+    
+    Raises:
+        ScalingCooldownError: The stack was scaled too recently (unless force)
+        ScalingInProgressError: The stack is already being scaled
     """
-    from .keypair_manager import create_keypair_for_instance, delete_keypair_for_instance
+    with stack_operation(stack_id):
+        return _scale_stack(stack_id, target_count, reason, force)
+
+
+def _scale_stack(stack_id: str, target_count: int, reason: Optional[str], force: bool) -> Dict[str, Any]:
+    from .keypair_manager import create_keypairs_for_instances, delete_keypairs_for_instances
     
     workdir = settings.TF_WORK_ROOT / stack_id
     
@@ -120,6 +264,13 @@ def scale_stack(stack_id: str, target_count: int, reason: Optional[str] = None)
     with open(metadata_file, 'r') as f:
         metadata = json.load(f)
     
+    # Per-stack bounds from the stack's scaling policy
+    policy = policy_from_metadata(metadata)
+    if not policy["min_instances"] <= target_count <= policy["max_instances"]:
+        raise ValueError(
+            f"target_count must be within {policy['min_instances']}-{policy['max_instances']} (stack policy)"
+        )
+    
     # Get current and new counts
     context = metadata["context"]
     old_count = context.get("instance_count", 1)
@@ -137,38 +288,45 @@ def scale_stack(stack_id: str, target_count: int, reason: Optional[str] = None)
             "message": "Instance count already at target"
         }
     
+    if not force:
+        direction = "scale_up" if target_count > old_count else "scale_down"
+        remaining = cooldown_remaining(policy, direction, last_scaled_timestamp(metadata))
+        if remaining > 0:
+            raise ScalingCooldownError(
+                f"Stack {stack_id} is in {direction} cooldown for another {remaining:.0f}s",
+                retry_after=remaining
+            )
+    
     # Manage keypairs
     keypairs_added = []
     keypairs_deleted = []
     keypair_errors = []
     
-    # Scale up: create keypairs for new instances
+    # Scale up: create keypairs for new instances (generated in parallel)
     if target_count > old_count:
-        for i in range(old_count + 1, target_count + 1):
-            result = create_keypair_for_instance(
-                stack_id=stack_id,
-                instance_index=i,
-                name_prefix=name_prefix,
-                region=region
-            )
-            if result.get("success"):
-                keypairs_added.append(result["key_name"])
-            else:
-                keypair_errors.append(f"Failed to create {result.get('key_name')}: {result.get('error')}")
+        result = create_keypairs_for_instances(
+            stack_id=stack_id,
+            instance_indices=range(old_count + 1, target_count + 1),
+            name_prefix=name_prefix,
+            region=region,
+            key_type=context.get("key_type", "rsa")
+        )
+        keypairs_added = [r["key_name"] for r in result["created"]]
+        for f in result["failed"]:
+            keypair_errors.append(f"Failed to create {f['key_name']}: {f['error']}")
+        keypair_errors.extend(f"Rollback failed for {e}" for e in result["rollback_errors"])
     
     # Scale down: delete keypairs for removed instances
     elif target_count < old_count:
-        for i in range(target_count + 1, old_count + 1):
-            result = delete_keypair_for_instance(
-                stack_id=stack_id,
-                instance_index=i,
-                name_prefix=name_prefix,
-                region=region
-            )
-            if result.get("success"):
-                keypairs_deleted.append(result["key_name"])
-            else:
-                keypair_errors.append(f"Failed to delete {result.get('key_name')}: {result.get('error')}")
+        result = delete_keypairs_for_instances(
+            stack_id=stack_id,
+            instance_indices=range(target_count + 1, old_count + 1),
+            name_prefix=name_prefix,
+            region=region
+        )
+        keypairs_deleted = result["deleted"]
+        for f in result["failed"]:
+            keypair_errors.append(f"Failed to delete {f['key_name']}: {f['error']}")
     
     # If there were keypair errors, return error (don't proceed with terraform)
     if keypair_errors:
@@ -220,27 +378,29 @@ def scale_stack(stack_id: str, target_count: int, reason: Optional[str] = None)
         }
     
     # Update metadata with new context and scaling history
+    # (re-read under the lock so concurrent policy edits are kept)
     import time
-    metadata["context"] = context
-    metadata["last_scaled_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-    metadata["last_scale_reason"] = reason
-    
-    # Track scaling history
-    if "scaling_history" not in metadata:
-        metadata["scaling_history"] = []
-    
-    metadata["scaling_history"].append({
-        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "old_count": old_count,
-        "new_count": target_count,
-        "action": "scale_up" if target_count > old_count else "scale_down",
-        "reason": reason,
-        "keypairs_added": keypairs_added,
-        "keypairs_deleted": keypairs_deleted
-    })
+    def record_scaling(current: Dict[str, Any]):
+        current["context"] = context
+        current["last_scaled_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        current["last_scaled_ts"] = time.time()
+        current["last_scale_reason"] = reason
+        
+        # Track scaling history
+        if "scaling_history" not in current:
+            current["scaling_history"] = []
+        
+        current["scaling_history"].append({
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "old_count": old_count,
+            "new_count": target_count,
+            "action": "scale_up" if target_count > old_count else "scale_down",
+            "reason": reason,
+            "keypairs_added": keypairs_added,
+            "keypairs_deleted": keypairs_deleted
+        })
     
-    with open(metadata_file, 'w') as f:
-        json.dump(metadata, f, indent=2)
+    update_stack_metadata(stack_id, record_scaling)
     
     action = "scale_up" if target_count > old_count else "scale_down"
     
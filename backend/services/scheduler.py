@@ -1,9 +1,37 @@
+import time
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
-from .scaling_service import list_active_stacks, scale_stack
-from .ai_advisor import analyze_and_recommend
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.events import EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED, EVENT_JOB_ERROR, EVENT_JOB_MISSED
+from .scaling_service import (
+    list_active_stacks,
+    scale_stack,
+    get_stack_info,
+    update_stack_metadata,
+    operations_in_flight,
+    ScalingInProgressError
+)
+from .scaling_policy import policy_from_metadata
+from .scaling_schedule import (
+    normalize_schedules,
+    normalize_seasonality,
+    capacity_floor,
+    cron_trigger,
+    seasonality_model
+)
+from .ai_advisor import analyze_and_recommend_many
+from .scaling_guard import scaling_guard, ScalingCooldownError
+from .scaling_cadence import cadence_planner
+from .leader_election import scheduler_lease
+from .metrics_service import get_stack_metrics
+from .metrics_history import metrics_history
+from .metrics_archive import metrics_archive
 from ..core.config import settings
+from ..core import telemetry
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -11,6 +39,128 @@ logger = logging.getLogger(__name__)
 
 # Create scheduler instance
 scheduler = BackgroundScheduler()
+scheduler.add_listener(
+    telemetry.scheduler_listener,
+    EVENT_JOB_SUBMITTED | EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+)
+
+
+# Scale operations run here so one stack's terraform apply never delays the others
+_apply_executor = ThreadPoolExecutor(
+    max_workers=max(1, settings.AUTO_SCALING_APPLY_WORKERS),
+    thread_name_prefix="scale-apply"
+)
+# Stacks dispatched to _apply_executor and not finished yet
+_dispatched: Dict[str, float] = {}
+_dispatched_lock = threading.Lock()
+# Summary of the last auto_scale_all_stacks run
+last_autoscale_run: Dict[str, Any] = {}
+
+
+def _stack_busy(stack_id: str) -> bool:
+    with _dispatched_lock:
+        if stack_id in _dispatched:
+            return True
+    return stack_id in operations_in_flight()
+
+
+def _run_scale(stack_id: str, target_count: int, reason: str, force: bool = False):
+    try:
+        scale_result = scale_stack(stack_id=stack_id, target_count=target_count, reason=reason, force=force)
+        if scale_result.get("success"):
+            scaling_guard.record_scaled(stack_id)
+            logger.info(
+                f"Stack {stack_id}: Successfully scaled from "
+                f"{scale_result['old_count']} to {scale_result['new_count']} instances"
+            )
+        else:
+            logger.error(
+                f"Stack {stack_id}: Scaling failed - {scale_result.get('error', 'Unknown error')}"
+            )
+    except ScalingInProgressError as e:
+        telemetry.AUTOSCALE_SKIPS.labels("in_flight").inc()
+        logger.info(f"Stack {stack_id}: {e}")
+    except ScalingCooldownError as e:
+        # Another path scaled the stack between the guard's review and this apply
+        telemetry.AUTOSCALE_SKIPS.labels("cooldown").inc()
+        logger.info(f"Stack {stack_id}: {e}")
+    except Exception as e:
+        logger.error(f"Stack {stack_id}: Scaling error - {str(e)}", exc_info=True)
+    finally:
+        with _dispatched_lock:
+            _dispatched.pop(stack_id, None)
+        telemetry.SCALE_OPERATIONS_IN_FLIGHT.dec()
+
+
+def dispatch_scale(stack_id: str, target_count: int, reason: str, force: bool = False) -> bool:
+    """
+    Run scale_stack on the apply pool without waiting for it.
+    
+    Args:
+        force: Ignore the stack's scale up / scale down cooldown
+    
+    Returns:
+        False if the stack already has an operation queued or running
+    """
+    with _dispatched_lock:
+        if stack_id in _dispatched:
+            return False
+        _dispatched[stack_id] = time.time()
+    telemetry.SCALE_OPERATIONS_IN_FLIGHT.inc()
+    _apply_executor.submit(_run_scale, stack_id, target_count, reason, force)
+    return True
+
+
+def _review_stack(result: Dict[str, Any]) -> str:
+    """
+    Guard one stack's recommendation and dispatch the scale if approved.
+    
+    Returns:
+        "dispatched", "skipped_in_flight", "error" or the guard outcome
+    """
+    stack_id = result["stack_id"]
+    
+    if "error" in result:
+        logger.warning(f"Stack {stack_id}: Error getting recommendation - {result['error']}")
+        return "error"
+    
+    recommendation = result["recommendation"]
+    action = recommendation["action"]
+    confidence = recommendation["confidence"]
+    current_count = result["current_count"]
+    
+    logger.info(
+        f"Stack {stack_id}: "
+        f"Action={action}, "
+        f"Current={current_count}, "
+        f"Target={recommendation['target_count']}, "
+        f"Confidence={confidence:.2f}, "
+        f"Reason={recommendation['reason']}"
+    )
+    
+    # Confidence, stabilization window and cooldown
+    decision = scaling_guard.review(
+        stack_id,
+        current_count,
+        recommendation,
+        result["policy"],
+        result["last_scaled_ts"],
+        min_confidence=settings.AUTO_SCALING_CONFIDENCE_THRESHOLD
+    )
+    
+    if not decision["execute"]:
+        if decision["outcome"] == "no_change":
+            logger.info(f"Stack {stack_id}: No scaling needed")
+        return decision["outcome"]
+    
+    logger.info(
+        f"Stack {stack_id}: Dispatching {action} to {decision['target_count']} "
+        f"(confidence {confidence:.2f} >= threshold {settings.AUTO_SCALING_CONFIDENCE_THRESHOLD:.2f})"
+    )
+    if not dispatch_scale(stack_id, decision["target_count"], f"AI Auto-scale: {recommendation['reason']}"):
+        telemetry.AUTOSCALE_SKIPS.labels("in_flight").inc()
+        return "skipped_in_flight"
+    return "dispatched"
 
 
 def auto_scale_all_stacks():
@@ -18,134 +168,439 @@ def auto_scale_all_stacks():
     Check all active stacks and scale if AI recommends with high confidence.
     
     This function:
-    1. Lists all active stacks
-    2. For each stack, gets AI recommendation
-    3. If confidence > threshold and action != no_change, executes scaling
-    4. Logs all actions
+    1. Lists all active stacks, skipping those with a scale operation in flight
+    2. Gets recommendations for the rest in one batch (forecast or LLM),
+       fetching stack state on AUTO_SCALING_EVAL_WORKERS threads
+    3. Passes each recommendation through the scaling guard (confidence,
+       stabilization window, cooldown) and dispatches the approved scale
+       operations to the apply pool without waiting for them
+    4. Logs all actions, including suppressed and skipped ones with the reason
+    
+    The run therefore takes about as long as one evaluation, however many
+    stacks exist or how long their terraform applies take.
+    
+    With AUTO_SCALING_ADAPTIVE_CADENCE the job runs every AUTO_SCALING_TICK_SEC
+    and only evaluates the stacks whose own interval has elapsed, within the
+    AUTO_SCALING_MAX_EVALS_PER_MINUTE budget; each result sets the stack's
+    next evaluation time.
     """
     if not settings.AUTO_SCALING_ENABLED:
         logger.debug("Auto-scaling is disabled, skipping check")
         return
     
-    logger.info("Starting auto-scaling check for all stacks")
+    # Per-stack cadence ticks every few seconds; only evaluations are worth INFO
+    log = logger.debug if settings.AUTO_SCALING_ADAPTIVE_CADENCE else logger.info
+    log("Starting auto-scaling check for all stacks")
+    started = time.perf_counter()
+    outcomes: Dict[str, int] = {}
     
     try:
         stacks = list_active_stacks()
-        logger.info(f"Found {len(stacks)} active stack(s)")
+        log(f"Found {len(stacks)} active stack(s)")
         
+        if settings.AUTO_SCALING_ADAPTIVE_CADENCE:
+            cadence_planner.retain([stack["stack_id"] for stack in stacks])
+        
+        stack_ids = []
         for stack in stacks:
-            stack_id = stack["stack_id"]
-            
+            if _stack_busy(stack["stack_id"]):
+                log(f"Stack {stack['stack_id']}: scale operation in flight, skipping evaluation")
+                telemetry.AUTOSCALE_SKIPS.labels("in_flight").inc()
+                outcomes["skipped_in_flight"] = outcomes.get("skipped_in_flight", 0) + 1
+            else:
+                stack_ids.append(stack["stack_id"])
+        
+        if settings.AUTO_SCALING_ADAPTIVE_CADENCE:
+            stack_ids, deferred = cadence_planner.due(stack_ids)
+            if deferred:
+                logger.info(f"Evaluation budget reached, deferring {len(deferred)} due stack(s)")
+                telemetry.AUTOSCALE_SKIPS.labels("budget").inc(len(deferred))
+                outcomes["deferred_budget"] = len(deferred)
+            if not stack_ids:
+                logger.debug("No stack due for evaluation")
+        
+        # One vectorized forecast pass / batched LLM call for the whole fleet
+        results = analyze_and_recommend_many(stack_ids) if stack_ids else {}
+        
+        for stack_id in stack_ids:
             try:
-                logger.info(f"Analyzing stack: {stack_id}")
-                
-                # Get AI recommendation
-                result = analyze_and_recommend(stack_id)
-                
-                if "error" in result:
-                    logger.warning(f"Stack {stack_id}: Error getting recommendation - {result['error']}")
-                    continue
-                
-                recommendation = result["recommendation"]
-                action = recommendation["action"]
-                confidence = recommendation["confidence"]
-                target_count = recommendation["target_count"]
-                current_count = result["current_count"]
-                
-                logger.info(
-                    f"Stack {stack_id}: "
-                    f"Action={action}, "
-                    f"Current={current_count}, "
-                    f"Target={target_count}, "
-                    f"Confidence={confidence:.2f}, "
-                    f"Reason={recommendation['reason']}"
-                )
-                
-                # Check if we should execute
-                should_execute = (
-                    action != "no_change" and
-                    confidence >= settings.AUTO_SCALING_CONFIDENCE_THRESHOLD
-                )
-                
-                if should_execute:
-                    logger.info(
-                        f"Stack {stack_id}: Executing {action} "
-                        f"(confidence {confidence:.2f} >= threshold {settings.AUTO_SCALING_CONFIDENCE_THRESHOLD:.2f})"
-                    )
-                    
-                    scale_result = scale_stack(
-                        stack_id=stack_id,
-                        target_count=target_count,
-                        reason=f"AI Auto-scale: {recommendation['reason']}"
-                    )
-                    
-                    if scale_result.get("success"):
-                        logger.info(
-                            f"Stack {stack_id}: Successfully scaled from "
-                            f"{scale_result['old_count']} to {scale_result['new_count']} instances"
-                        )
-                    else:
-                        logger.error(
-                            f"Stack {stack_id}: Scaling failed - {scale_result.get('error', 'Unknown error')}"
-                        )
-                else:
-                    if action == "no_change":
-                        logger.info(f"Stack {stack_id}: No scaling needed")
-                    else:
-                        logger.info(
-                            f"Stack {stack_id}: Skipping {action} "
-                            f"(confidence {confidence:.2f} < threshold {settings.AUTO_SCALING_CONFIDENCE_THRESHOLD:.2f})"
-                        )
-            
+                outcome = _review_stack(results[stack_id])
             except Exception as e:
                 logger.error(f"Stack {stack_id}: Unexpected error - {str(e)}", exc_info=True)
-                continue
+                outcome = "error"
+            if settings.AUTO_SCALING_ADAPTIVE_CADENCE:
+                plan = cadence_planner.record(results.get(stack_id) or {"stack_id": stack_id, "error": outcome})
+                logger.debug(f"Stack {stack_id}: next evaluation in {plan['interval_sec']}s ({plan['reason']})")
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
         
-        logger.info("Auto-scaling check completed")
+        (logger.info if outcomes else log)(f"Auto-scaling check completed: {outcomes}")
     
     except Exception as e:
         logger.error(f"Auto-scaling check failed: {str(e)}", exc_info=True)
+        outcomes["failed"] = 1
+    
+    # Standby workers answer /decisions from the saved log
+    scaling_guard.save()
+    
+    last_autoscale_run.clear()
+    last_autoscale_run.update({
+        "finished_at": time.time(),
+        "duration_sec": round(time.perf_counter() - started, 3),
+        "outcomes": outcomes
+    })
+
+
+def scheduler_status() -> Dict[str, Any]:
+    """
+    Leader lease, jobs with next run times, last run lag / duration,
+    in-flight scale operations
+    """
+    now = time.time()
+    with _dispatched_lock:
+        dispatched = {stack_id: round(now - ts, 1) for stack_id, ts in _dispatched.items()}
+    return {
+        "running": scheduler.running,
+        "leader": scheduler_lease.status(),
+        "jobs": [
+            {
+                "id": job.id,
+                "name": job.name,
+                "next_run_time": job.next_run_time.isoformat() if getattr(job, "next_run_time", None) else None,
+                "max_instances": job.max_instances,
+                "coalesce": job.coalesce
+            }
+            for job in scheduler.get_jobs()
+        ],
+        "last_runs": telemetry.last_job_runs(),
+        "last_autoscale_run": dict(last_autoscale_run),
+        "cadence": cadence_planner.status() if settings.AUTO_SCALING_ADAPTIVE_CADENCE else None,
+        "dispatched_age_sec": dispatched,
+        "operations_in_flight_age_sec": {
+            stack_id: round(now - ts, 1) for stack_id, ts in operations_in_flight().items()
+        }
+    }
+
+
+def _collect_stack(stack_id: str):
+    metrics_data = get_stack_metrics(stack_id)
+    if "error" in metrics_data:
+        logger.debug(f"Stack {stack_id}: metrics collection skipped - {metrics_data['error']}")
+        return
+    now = time.time()
+    metrics_history.record(stack_id, metrics_data.get("metrics", {}), ts=now)
+    if settings.METRICS_ARCHIVE_ENABLED:
+        metrics_archive.record(stack_id, metrics_data.get("metrics", {}), ts=now)
+
+
+def collect_metrics_all_stacks():
+    """
+    Append the current metrics of every active stack to the history ring buffers.
+    
+    Stacks that disappeared are dropped from the history.
+    """
+    try:
+        stack_ids = [stack["stack_id"] for stack in list_active_stacks()]
+    except Exception as e:
+        logger.error(f"Metrics collection failed to list stacks: {str(e)}", exc_info=True)
+        return
+    
+    for stale_id in set(metrics_history.stacks()) - set(stack_ids):
+        metrics_history.drop_stack(stale_id)
+        scaling_guard.drop_stack(stale_id)
+        seasonality_model.drop_stack(stale_id)
+    
+    if not stack_ids:
+        return
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(settings.METRICS_COLLECT_WORKERS, len(stack_ids))), thread_name_prefix="metrics-collect") as executor:
+        for stack_id, future in [(sid, executor.submit(_collect_stack, sid)) for sid in stack_ids]:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"Stack {stack_id}: metrics collection error - {str(e)}")
+
+
+def prune_metrics_archive():
+    """
+    Apply the archive retention policies
+    """
+    try:
+        deleted = metrics_archive.prune()
+        if any(deleted.values()):
+            logger.info(f"Metrics archive pruned: {deleted}")
+    except Exception as e:
+        logger.error(f"Metrics archive prune failed: {str(e)}", exc_info=True)
+
+
+def apply_capacity_floor(stack_id: str, trigger: str) -> str:
+    """
+    Dispatch a scale up to the stack's scheduled / seasonal minimum if it is below it.
+    
+    Scheduled capacity is deliberate, so the scaling cooldown does not apply.
+    The apply runs on the apply pool like auto-scaling ones, so cron jobs and
+    the seasonal loop return at once; a stack with an operation in flight is
+    skipped (the next schedule / seasonal run picks it up again).
+    
+    Returns:
+        "dispatched", "skipped_in_flight" or "at_floor"
+    """
+    stack_info = get_stack_info(stack_id)
+    metadata = stack_info["metadata"]
+    floor = capacity_floor(metadata)
+    target = min(floor["min_instances"], policy_from_metadata(metadata)["max_instances"])
+    current_count = stack_info["current_instance_count"]
+    
+    if target <= current_count:
+        return "at_floor"
+    
+    sources = ", ".join(f"{source['type']}:{source['name']}" for source in floor["sources"])
+    if _stack_busy(stack_id) or not dispatch_scale(stack_id, target, f"Scheduled capacity ({sources})", force=True):
+        logger.info(f"Stack {stack_id}: scale operation in flight, pre-scaling to {target} skipped ({trigger})")
+        telemetry.AUTOSCALE_SKIPS.labels("in_flight").inc()
+        return "skipped_in_flight"
+    logger.info(f"Stack {stack_id}: pre-scaling {current_count} -> {target} dispatched ({trigger}; {sources})")
+    return "dispatched"
+
+
+def run_capacity_schedule(stack_id: str, name: str):
+    """
+    Cron job body: a schedule window of the stack just started
+    """
+    try:
+        apply_capacity_floor(stack_id, f"schedule {name}")
+    except Exception as e:
+        logger.error(f"Stack {stack_id}: schedule {name} failed - {str(e)}", exc_info=True)
+
+
+def prescale_seasonal_all_stacks():
+    """
+    Raise the minimum capacity of seasonality-enabled stacks ahead of their
+    predicted peak (the floor is stored as seasonal_floor in the metadata).
+    """
+    window_sec = settings.SEASONALITY_INTERVAL_MINUTES * 60
+    try:
+        stacks = list_active_stacks()
+    except Exception as e:
+        logger.error(f"Seasonal pre-scaling failed to list stacks: {str(e)}", exc_info=True)
+        return
+    
+    for stack in stacks:
+        stack_id = stack["stack_id"]
+        try:
+            seasonality = normalize_seasonality(stack["metadata"].get("seasonality"))
+            if not seasonality["enabled"]:
+                continue
+            
+            forecast = seasonality_model.forecast_floor(stack_id, seasonality["lead_minutes"], window_sec)
+            if forecast is None:
+                logger.debug(f"Stack {stack_id}: not enough history for seasonality")
+                continue
+            
+            update_stack_metadata(stack_id, lambda metadata: metadata.update(seasonal_floor=forecast))
+            apply_capacity_floor(stack_id, f"seasonality ({forecast['period']})")
+        except Exception as e:
+            logger.error(f"Stack {stack_id}: seasonal pre-scaling error - {str(e)}", exc_info=True)
+
+
+def sync_schedule_jobs():
+    """
+    Register one cron job per stack schedule and remove jobs of deleted
+    schedules / stacks. Called at startup, periodically and when schedules change.
+    
+    Only the scheduler leader registers jobs; a change made through another
+    worker is picked up by the leader's periodic sync.
+    """
+    if not settings.SCHEDULED_SCALING_ENABLED:
+        return
+    if settings.SCHEDULER_LEADER_ELECTION and not scheduler_lease.is_leader:
+        return
+    
+    wanted = {}
+    for stack in list_active_stacks():
+        try:
+            schedules = normalize_schedules(stack["metadata"].get("scaling_schedules") or [])
+        except ValueError as e:
+            logger.warning(f"Stack {stack['stack_id']}: invalid schedules ignored - {e}")
+            continue
+        for schedule in schedules:
+            wanted[f"schedule:{stack['stack_id']}:{schedule['name']}"] = (stack["stack_id"], schedule)
+    
+    for job in scheduler.get_jobs():
+        if job.id.startswith("schedule:") and job.id not in wanted:
+            try:
+                scheduler.remove_job(job.id)
+            except JobLookupError:
+                pass
+    
+    for job_id, (stack_id, schedule) in wanted.items():
+        scheduler.add_job(
+            run_capacity_schedule,
+            trigger=cron_trigger(schedule),
+            args=[stack_id, schedule["name"]],
+            id=job_id,
+            name=f"Scheduled capacity {schedule['min_instances']} for {stack_id} ({schedule['cron']} {schedule['timezone']})",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
 
 
 def start_scheduler():
     """
-    Start the auto-scaling scheduler.
+    Start the background scheduler in the leader worker only.
     
-    Schedules auto_scale_all_stacks() to run at configured interval.
+    With SCHEDULER_LEADER_ELECTION every worker contends for the lease file;
+    the holder registers and runs the jobs, the others stay standby and take
+    over (within SCHEDULER_LEADER_POLL_SEC) when the leader process dies.
+    The in-memory state the jobs build (metrics history, guard windows,
+    cadence plans) exists in the leader only; see leader_election.require_state.
     """
-    if not settings.AUTO_SCALING_ENABLED:
-        logger.info("Auto-scaling is disabled, scheduler will not start")
+    if not settings.SCHEDULER_LEADER_ELECTION:
+        _start_jobs()
         return
+    scheduler_lease.start(on_elected=_become_leader, on_demoted=_step_down)
+
+
+def _become_leader():
+    if scheduler.running:
+        # Leadership regained after a demotion: jobs are still registered
+        sync_schedule_jobs()
+        scheduler.resume()
+        logger.info("Background scheduler resumed")
+    else:
+        _start_jobs()
+
+
+def _step_down():
+    if scheduler.running:
+        scheduler.pause()
+        logger.info("Background scheduler paused (no longer leader)")
+
+
+def _start_jobs():
+    """
+    Register the background jobs and start the scheduler.
     
-    interval_minutes = settings.AUTO_SCALING_INTERVAL_MINUTES
+    - Metrics collector every METRICS_COLLECT_INTERVAL_SEC (if METRICS_COLLECT_ENABLED),
+      plus hourly archive retention (if METRICS_ARCHIVE_ENABLED)
+    - auto_scale_all_stacks() every AUTO_SCALING_INTERVAL_MINUTES, or every
+      AUTO_SCALING_TICK_SEC with per-stack cadence (if AUTO_SCALING_ENABLED)
+    - Per-stack capacity schedules (cron) and seasonal pre-scaling every
+      SEASONALITY_INTERVAL_MINUTES (if SCHEDULED_SCALING_ENABLED)
+    """
+    if settings.METRICS_COLLECT_ENABLED:
+        logger.info(f"Scheduling metrics collector (interval: {settings.METRICS_COLLECT_INTERVAL_SEC}s)")
+        scheduler.add_job(
+            collect_metrics_all_stacks,
+            trigger=IntervalTrigger(seconds=settings.METRICS_COLLECT_INTERVAL_SEC),
+            id="collect_metrics_all_stacks",
+            name="Collect stack metrics into history buffers",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        
+        if settings.METRICS_ARCHIVE_ENABLED:
+            scheduler.add_job(
+                prune_metrics_archive,
+                trigger=IntervalTrigger(hours=1),
+                id="prune_metrics_archive",
+                name="Apply metrics archive retention",
+                max_instances=1,
+                coalesce=True,
+                replace_existing=True
+            )
     
-    logger.info(
-        f"Starting auto-scaling scheduler "
-        f"(interval: {interval_minutes} minutes, "
-        f"confidence threshold: {settings.AUTO_SCALING_CONFIDENCE_THRESHOLD})"
-    )
+    if settings.AUTO_SCALING_ENABLED:
+        if settings.AUTO_SCALING_ADAPTIVE_CADENCE:
+            # Each stack keeps its own interval; the job only picks the due ones
+            interval_sec = settings.AUTO_SCALING_TICK_SEC
+            cadence = (
+                f"per-stack {settings.AUTO_SCALING_MIN_INTERVAL_SEC:.0f}-"
+                f"{settings.AUTO_SCALING_MAX_INTERVAL_SEC:.0f}s, tick {interval_sec}s, "
+                f"budget {settings.AUTO_SCALING_MAX_EVALS_PER_MINUTE}/min"
+            )
+        else:
+            interval_sec = settings.AUTO_SCALING_INTERVAL_MINUTES * 60
+            cadence = f"{settings.AUTO_SCALING_INTERVAL_MINUTES} minutes"
+        
+        logger.info(
+            f"Scheduling auto-scaling "
+            f"(interval: {cadence}, "
+            f"confidence threshold: {settings.AUTO_SCALING_CONFIDENCE_THRESHOLD})"
+        )
+        
+        # Add job with interval trigger
+        # One run at a time; runs missed while one was going are merged, not queued
+        scheduler.add_job(
+            auto_scale_all_stacks,
+            trigger=IntervalTrigger(seconds=interval_sec),
+            id="auto_scale_all_stacks",
+            name="Auto-scale all stacks based on AI recommendations",
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=max(1, interval_sec // 2),
+            replace_existing=True
+        )
+    else:
+        logger.info("Auto-scaling is disabled")
     
-    # Add job with interval trigger
-    scheduler.add_job(
-        auto_scale_all_stacks,
-        trigger=IntervalTrigger(minutes=interval_minutes),
-        id="auto_scale_all_stacks",
-        name="Auto-scale all stacks based on AI recommendations",
-        replace_existing=True
-    )
+    if settings.SCHEDULED_SCALING_ENABLED:
+        logger.info(f"Scheduling capacity schedules and seasonal pre-scaling (interval: {settings.SEASONALITY_INTERVAL_MINUTES} minutes)")
+        try:
+            sync_schedule_jobs()
+        except Exception as e:
+            logger.error(f"Loading capacity schedules failed: {str(e)}", exc_info=True)
+        
+        # Picks up stacks deployed later / schedules edited on disk
+        scheduler.add_job(
+            sync_schedule_jobs,
+            trigger=IntervalTrigger(minutes=10),
+            id="sync_schedule_jobs",
+            name="Sync per-stack capacity schedules",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+        scheduler.add_job(
+            prescale_seasonal_all_stacks,
+            trigger=IntervalTrigger(minutes=settings.SEASONALITY_INTERVAL_MINUTES),
+            id="prescale_seasonal_all_stacks",
+            name="Pre-scale stacks ahead of seasonal peaks",
+            max_instances=1,
+            coalesce=True,
+            replace_existing=True
+        )
+    
+    if not scheduler.get_jobs():
+        logger.info("No background jobs enabled, scheduler will not start")
+        return
     
     # Start scheduler
     scheduler.start()
-    logger.info("Auto-scaling scheduler started successfully")
+    logger.info("Background scheduler started successfully")
 
 
 def stop_scheduler():
     """
-    Stop the auto-scaling scheduler gracefully.
+    Stop the background scheduler gracefully.
     """
+    # A standby must not take over while this worker is shutting down
+    scheduler_lease.stop()
     if scheduler.running:
-        logger.info("Stopping auto-scaling scheduler")
+        logger.info("Stopping background scheduler")
         scheduler.shutdown(wait=True)
-        logger.info("Auto-scaling scheduler stopped")
+        logger.info("Background scheduler stopped")
+    # Let running terraform applies finish, drop queued ones
+    _apply_executor.shutdown(wait=True, cancel_futures=True)
+    # Cancelled futures never reach _run_scale's finally block
+    with _dispatched_lock:
+        cancelled = list(_dispatched)
+        _dispatched.clear()
+    if cancelled:
+        logger.info(f"Dropped queued scale operations for: {', '.join(cancelled)}")
+        telemetry.SCALE_OPERATIONS_IN_FLIGHT.dec(len(cancelled))
+    # Hand over only once no apply of this worker is left
+    scheduler_lease.release()
 
 
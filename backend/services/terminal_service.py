@@ -11,6 +11,44 @@ import time
 from typing import Optional, Dict, Any
 from pathlib import Path
 from ..core.config import settings
+from ..core import telemetry
+
+
+# Thứ tự thử khi không biết trước loại key
+_KEY_CLASSES = {
+    "rsa": paramiko.RSAKey,
+    "ed25519": paramiko.Ed25519Key,
+    "ecdsa": paramiko.ECDSAKey,
+}
+
+
+def load_private_key(private_key_path: str, key_type: Optional[str] = None) -> paramiko.PKey:
+    """
+    Load a private key file, detecting its type
+    
+    Args:
+        private_key_path: Path to private key file (PEM or OpenSSH format)
+        key_type: Optional hint ("rsa", "ed25519", ...) tried first
+    
+    Returns:
+        paramiko key object
+    
+    Raises:
+        paramiko.SSHException if no supported key type can load the file
+    """
+    candidates = list(_KEY_CLASSES)
+    if key_type in _KEY_CLASSES:
+        candidates.remove(key_type)
+        candidates.insert(0, key_type)
+    
+    errors = []
+    for name in candidates:
+        try:
+            return _KEY_CLASSES[name].from_private_key_file(private_key_path)
+        except paramiko.SSHException as e:
+            errors.append(f"{name}: {str(e)}")
+    
+    raise paramiko.SSHException(f"Unsupported private key ({'; '.join(errors)})")
 
 
 class SSHSession:
@@ -21,7 +59,8 @@ class SSHSession:
                  username: str,
                  private_key_path: str,
                  port: int = 22,
-                 timeout: int = 30):
+                 timeout: int = 30,
+                 key_type: Optional[str] = None):
         """
         Initialize SSH session
         
@@ -31,10 +70,12 @@ class SSHSession:
             private_key_path: Path to private key file
             port: SSH port (default 22)
             timeout: Connection timeout in seconds
+            key_type: Key type hint ("rsa", "ed25519"); detected if None
         """
         self.hostname = hostname
         self.username = username
         self.private_key_path = private_key_path
+        self.key_type = key_type
         self.port = port
         self.timeout = timeout
         self.client = None
@@ -64,10 +105,8 @@ class SSHSession:
             self.client = paramiko.SSHClient()
             self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
             
-            # Load private key
-            private_key = paramiko.RSAKey.from_private_key_file(
-                self.private_key_path
-            )
+            # Load private key (RSA / Ed25519 / ECDSA)
+            private_key = load_private_key(self.private_key_path, self.key_type)
             
             # Connect to EC2
             self.client.connect(
@@ -200,7 +239,8 @@ class TerminalSessionManager:
                        session_id: str,
                        hostname: str,
                        username: str,
-                       private_key_path: str) -> Dict[str, Any]:
+                       private_key_path: str,
+                       key_type: Optional[str] = None) -> Dict[str, Any]:
         """
         Create and connect a new SSH session
         
@@ -219,7 +259,8 @@ class TerminalSessionManager:
             session = SSHSession(
                 hostname=hostname,
                 username=username,
-                private_key_path=private_key_path
+                private_key_path=private_key_path,
+                key_type=key_type
             )
             
             # Connect
@@ -229,6 +270,7 @@ class TerminalSessionManager:
             
             # Store session
             self.sessions[session_id] = session
+            telemetry.SSH_SESSIONS.set(len(self.sessions))
             return {
                 "success": True,
                 "session_id": session_id
@@ -262,6 +304,7 @@ class TerminalSessionManager:
         """Close a session"""
         with self.lock:
             session = self.sessions.pop(session_id, None)
+            telemetry.SSH_SESSIONS.set(len(self.sessions))
             if not session:
                 return {"success": False, "error": f"Session {session_id} not found"}
             
@@ -295,6 +338,7 @@ class TerminalSessionManager:
             for session_id in inactive_sessions:
                 self.sessions[session_id].disconnect()
                 del self.sessions[session_id]
+            telemetry.SSH_SESSIONS.set(len(self.sessions))
             
             return len(inactive_sessions)
 
@@ -9,6 +9,7 @@ from typing import Dict, Any, Optional
 
 from jinja2 import Environment, FileSystemLoader, StrictUndefined
 from ..core.config import settings
+from ..core import telemetry
 
 TEMPLATE_AWS_MAIN = "main.tf.j2"
 
@@ -84,8 +85,10 @@ def run(cmd: list[str], cwd: Path, extra_env: Optional[Dict[str, str]] = None, t
     env = os.environ.copy()
     if extra_env:
         env.update(extra_env)
+    subcommand = cmd[1] if len(cmd) > 1 else "unknown"
+    start = time.perf_counter()
     try:
-        return subprocess.run(
+        p = subprocess.run(
             cmd,
             cwd=str(cwd),
             env=env,
@@ -93,7 +96,13 @@ def run(cmd: list[str], cwd: Path, extra_env: Optional[Dict[str, str]] = None, t
             text=True,
             timeout=timeout or settings.TF_TIMEOUT_SEC,
         )
+        telemetry.observe_terraform(subcommand, "success" if p.returncode == 0 else "error", time.perf_counter() - start)
+        return p
+    except subprocess.TimeoutExpired:
+        telemetry.observe_terraform(subcommand, "timeout", time.perf_counter() - start)
+        raise
     except FileNotFoundError:
+        telemetry.observe_terraform(subcommand, "not_found", time.perf_counter() - start)
         suggested = shutil.which("terraform") or "/usr/bin/terraform"
         raise RuntimeError(
             f"Terraform binary not found at configured TF_BIN: {settings.TF_BIN}. "
@@ -133,6 +142,7 @@ def deploy_aws_from_template(payload: Dict[str, Any]) -> Dict[str, Any]:
       region, vpc_cidr, subnet_cidr, az, name_prefix, key_name (deprecated, not used),
       instance_count, ami, instance_type, user_data_inline/user_data_path
       auto_install_monitoring (bool): tự cài Grafana+Mimir+Loki nếu không có user_data_inline
+      key_type: "rsa" | "ed25519" (mặc định DEFAULT_KEY_TYPE)
     
     Keypairs sẽ được tạo tự động: <name_prefix>-vm-1, <name_prefix>-vm-2, ...
     """
@@ -363,6 +373,7 @@ echo "   - Loki: http://loki:3100"
         "ami":             payload["ami"],
         "instance_type":   payload.get("instance_type", settings.DEFAULT_INSTANCE_TYPE),
         "user_data_path":  user_data_path,
+        "key_type":        payload.get("key_type") or settings.DEFAULT_KEY_TYPE,
     }
 
     render_tf(TEMPLATE_AWS_MAIN, context, workdir)
@@ -384,39 +395,40 @@ echo "   - Loki: http://loki:3100"
         return {"phase": "FAILED_CREDENTIALS", "error": str(e), "stack_id": stack_id}
 
     # Create keypairs for all instances before terraform apply
-    from .keypair_manager import create_keypair_for_instance
+    from .keypair_manager import create_keypairs_for_instances
     
     instance_count = int(payload["instance_count"])
-    keypairs_created = {}
-    keypairs_failed = []
-    
-    for i in range(1, instance_count + 1):
-        result = create_keypair_for_instance(
-            stack_id=stack_id,
-            instance_index=i,
-            name_prefix=name_prefix,
-            region=region
-        )
-        if result.get("success"):
-            keypairs_created[f"{name_prefix}-vm-{i}"] = {
-                "key_name": result["key_name"],
-                "key_id": result.get("key_id"),
-                "pem_path": result["pem_path"]
-            }
-        else:
-            keypairs_failed.append({
-                "key_name": result.get("key_name"),
-                "error": result.get("error")
-            })
+    keypair_result = create_keypairs_for_instances(
+        stack_id=stack_id,
+        instance_indices=range(1, instance_count + 1),
+        name_prefix=name_prefix,
+        region=region,
+        key_type=context["key_type"]
+    )
     
-    # If any keypair creation failed, return error
-    if keypairs_failed:
+    # If any keypair creation failed, return error (created keys were rolled back)
+    if not keypair_result["success"]:
+        keypairs_failed = [
+            {"key_name": f["key_name"], "error": f["error"]}
+            for f in keypair_result["failed"]
+        ]
         return {
             "phase": "FAILED_KEYPAIR_CREATION",
             "error": f"Failed to create {len(keypairs_failed)} keypairs",
             "failed_keypairs": keypairs_failed,
+            "rolled_back_keypairs": keypair_result["rolled_back"],
+            "rollback_errors": keypair_result["rollback_errors"],
             "stack_id": stack_id
         }
+    
+    keypairs_created = {
+        r["key_name"]: {
+            "key_name": r["key_name"],
+            "key_id": r.get("key_id"),
+            "pem_path": r["pem_path"]
+        }
+        for r in keypair_result["created"]
+    }
 
     res = tf_init_apply(workdir, aws_env)
     res["stack_id"] = stack_id
@@ -0,0 +1,472 @@
+"""
+Backtest - Chạy lại trace metrics đã ghi qua logic scaling để so sánh tham số
+
+- Trace: CSV (timestamp, avg_cpu_percent, avg_memory_percent[, instance_count]),
+  file export range query (Prometheus query_range hoặc /scaling/stack/metrics/query_range),
+  metrics archive SQLite của backend, hoặc trace tổng hợp (--synthetic)
+- Tải được quy về "instance-equivalent" (utilisation x số instance lúc ghi)
+  rồi phát lại với số instance mô phỏng
+- Logic quyết định là bản vector hóa của ai_advisor.fallback_recommendation
+  (ngưỡng, capacity calculator) + cooldown up / down, chu kỳ đánh giá
+- Mô hình thời gian apply của Terraform và thời gian warm-up của instance mới
+- Mọi (trace x policy) chạy cùng lúc trên mảng NumPy: vòng lặp chỉ theo thời gian
+
+Usage:
+    python -m backend.simulation.backtest --synthetic 50 --hours 48 \\
+        --up-cpu 60,70,80 --cooldown-up 0,300 --cooldown-down 300,900 --step-mode capacity,single
+    python -m backend.simulation.backtest --trace stack-a.csv --trace export.json --output report.json
+    python -m backend.simulation.backtest --archive stack-a --hours 168
+
+Báo cáo theo policy: phút thiếu tài nguyên, instance-hour dư thừa, số lần apply.
+"""
+
+import csv
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+from ..services.ai_advisor import FALLBACK_THRESHOLDS, fallback_recommendation
+from ..services.capacity import required_capacity
+from ..core.config import settings
+
+
+class Trace:
+    """Demand of one workload on a regular grid, in instance-equivalents"""
+
+    def __init__(self, name: str, ts: np.ndarray, cpu: np.ndarray, memory: np.ndarray, counts: np.ndarray):
+        counts = np.maximum(np.asarray(counts, dtype=float), 1.0)
+        self.name = name
+        self.ts = np.asarray(ts, dtype=float)
+        # Observed utilisation saturates at 100%, so demand above capacity is a lower bound
+        self.cpu_demand = np.asarray(cpu, dtype=float) * counts / 100.0
+        self.memory_demand = np.asarray(memory, dtype=float) * counts / 100.0
+        self.initial_count = int(counts[0])
+
+    def resample(self, step: float) -> "Trace":
+        grid = np.arange(self.ts[0], self.ts[-1] + step / 2, step)
+        trace = Trace.__new__(Trace)
+        trace.name = self.name
+        trace.ts = grid
+        trace.cpu_demand = np.interp(grid, self.ts, self.cpu_demand)
+        trace.memory_demand = np.interp(grid, self.ts, self.memory_demand)
+        trace.initial_count = self.initial_count
+        return trace
+
+
+def _series_points(entry: Dict[str, Any]):
+    if "values" in entry and "timestamps" not in entry:
+        points = np.array([[float(ts), float(v)] for ts, v in entry["values"]], dtype=float)
+        return points[:, 0], points[:, 1]
+    return np.asarray(entry["timestamps"], dtype=float), np.array(
+        [np.nan if v is None else float(v) for v in entry["values"]], dtype=float
+    )
+
+
+def _export_series(export: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Series of a Prometheus query_range response or a /scaling/stack/metrics/query_range export
+    """
+    if "series" in export:
+        return export["series"]
+    return export.get("data", {}).get("result", [])
+
+
+def load_trace_file(path: Path, default_count: int) -> List[Trace]:
+    """
+    Load traces from a CSV or range-query export file.
+
+    JSON may be a plain export (CPU only, one trace per series) or
+    {"cpu": export, "memory": export, "instance_count": n} with memory series
+    matched to CPU series by labels.
+    """
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        if not rows:
+            return []
+        ts = np.array([float(r["timestamp"]) for r in rows])
+        cpu = np.array([float(r.get("avg_cpu_percent") or 0.0) for r in rows])
+        memory = np.array([float(r.get("avg_memory_percent") or 0.0) for r in rows])
+        counts = np.array([float(r.get("instance_count") or default_count) for r in rows])
+        return [Trace(path.stem, ts, cpu, memory, counts)]
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    cpu_export = data.get("cpu", data)
+    memory_series = {
+        json.dumps(s.get("metric", {}), sort_keys=True): s for s in _export_series(data.get("memory", {}))
+    }
+    count = int(data.get("instance_count", default_count))
+
+    traces = []
+    for i, series in enumerate(_export_series(cpu_export)):
+        ts, cpu = _series_points(series)
+        keep = ~np.isnan(cpu)
+        ts, cpu = ts[keep], cpu[keep]
+        if len(ts) < 2:
+            continue
+        memory = np.zeros_like(cpu)
+        mem_entry = memory_series.get(json.dumps(series.get("metric", {}), sort_keys=True))
+        if mem_entry is not None:
+            mem_ts, mem_values = _series_points(mem_entry)
+            keep = ~np.isnan(mem_values)
+            if keep.any():
+                memory = np.interp(ts, mem_ts[keep], mem_values[keep])
+        labels = series.get("metric", {})
+        name = labels.get(settings.METRICS_STACK_LABEL) or labels.get("instance") or f"{path.stem}[{i}]"
+        traces.append(Trace(name, ts, cpu, memory, np.full(len(ts), count)))
+    return traces
+
+
+def load_archive_trace(stack_id: str, start: float, end: float) -> Optional[Trace]:
+    """
+    Trace of a stack from the backend's metrics archive (avg CPU / memory / instance count)
+    """
+    from ..services.metrics_archive import metrics_archive
+
+    series = {}
+    for metric in ("avg_cpu_percent", "avg_memory_percent", "instance_count"):
+        points = metrics_archive.query(stack_id, metric, start, end)["points"]
+        if points:
+            array = np.array(points, dtype=float)
+            series[metric] = (array[:, 0], array[:, 1])
+    if "avg_cpu_percent" not in series or len(series["avg_cpu_percent"][0]) < 2:
+        return None
+
+    ts = series["avg_cpu_percent"][0]
+    def on_grid(metric, default):
+        return np.interp(ts, *series[metric]) if metric in series else np.full(len(ts), default)
+    return Trace(
+        stack_id, ts, series["avg_cpu_percent"][1],
+        on_grid("avg_memory_percent", 0.0), np.round(on_grid("instance_count", 1.0))
+    )
+
+
+def synthetic_traces(n: int, hours: float, step: float, seed: int = 0) -> List[Trace]:
+    """
+    Daily cycles with random peaks, noise and short spikes
+    """
+    rng = np.random.default_rng(seed)
+    ts = np.arange(0.0, hours * 3600.0, step)
+    traces = []
+    for i in range(n):
+        base = rng.uniform(1.0, 4.0)
+        peak = base * rng.uniform(1.5, 4.0)
+        phase = rng.uniform(0, 2 * np.pi)
+        daily = base + (peak - base) * 0.5 * (1 + np.sin(2 * np.pi * ts / 86400.0 + phase))
+        spikes = np.zeros_like(ts)
+        for start in rng.integers(0, len(ts), size=max(1, int(hours // 12))):
+            width = int(rng.integers(5, 40))
+            spikes[start:start + width] += peak * rng.uniform(0.5, 1.5)
+        cpu_demand = np.maximum(0.05, daily + spikes + rng.normal(0, 0.1 * base, len(ts)))
+        memory_demand = 0.6 * cpu_demand + rng.uniform(0.2, 1.0)
+        count = max(1, int(np.ceil(base / 0.5)))
+        # Express as the utilisation a fixed-size stack would have reported
+        traces.append(Trace(
+            f"synthetic-{i}", ts,
+            np.minimum(100.0, 100.0 * cpu_demand / count), np.minimum(100.0, 100.0 * memory_demand / count),
+            np.full(len(ts), count)
+        ))
+        traces[-1].cpu_demand = cpu_demand
+        traces[-1].memory_demand = memory_demand
+    return traces
+
+
+def policy_grid(args) -> List[Dict[str, Any]]:
+    """
+    Cartesian product of the swept parameters
+    """
+    axes = {
+        "scale_up_cpu": args.up_cpu,
+        "scale_up_memory": args.up_memory,
+        "scale_down_cpu": args.down_cpu,
+        "scale_down_memory": args.down_memory,
+        "cooldown_up_sec": args.cooldown_up,
+        "cooldown_down_sec": args.cooldown_down,
+        "interval_sec": args.interval,
+        "margin": args.margin,
+        "step_mode": args.step_mode,
+    }
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def decide_targets(counts: np.ndarray, cpu: np.ndarray, memory: np.ndarray, p: Dict[str, np.ndarray],
+                   min_instances: int, max_instances: int) -> np.ndarray:
+    """
+    Vectorized fallback_recommendation: target count for every (trace, policy) lane.
+
+    step_mode "capacity" jumps to the computed capacity; "single" moves +-1.
+    """
+    need = np.maximum(
+        required_capacity(counts, cpu, settings.PREDICTIVE_TARGET_CPU_PERCENT, margin=p["margin"]),
+        required_capacity(counts, memory, settings.PREDICTIVE_TARGET_MEMORY_PERCENT, margin=p["margin"])
+    )
+    need = np.clip(need, min_instances, max_instances)
+
+    up = ((cpu > p["scale_up_cpu"]) | (memory > p["scale_up_memory"])) & (counts < max_instances)
+    down = (cpu < p["scale_down_cpu"]) & (memory < p["scale_down_memory"]) & (counts > min_instances)
+
+    up_target = np.where(p["single"], counts + 1, np.minimum(np.maximum(counts + 1, need), max_instances))
+    down_target = np.where(p["single"], counts - 1, need)
+    down = down & (down_target < counts)
+    return np.where(up, up_target, np.where(down, down_target, counts)).astype(int)
+
+
+def verify_against_fallback(samples: int = 5000, seed: int = 1) -> int:
+    """
+    Compare decide_targets (default thresholds, capacity mode) with
+    fallback_recommendation on random states; returns the mismatch count
+    """
+    rng = np.random.default_rng(seed)
+    lower, upper = settings.SCALE_DOWN_MIN_INSTANCES, settings.SCALE_UP_MAX_INSTANCES
+    counts = rng.integers(lower, upper + 1, samples)
+    cpu = rng.uniform(0, 100, samples)
+    memory = rng.uniform(0, 100, samples)
+    params = {key: np.full(samples, value) for key, value in FALLBACK_THRESHOLDS.items()}
+    params["margin"] = np.full(samples, settings.CAPACITY_SAFETY_MARGIN)
+    params["single"] = np.zeros(samples, dtype=bool)
+    vector = decide_targets(counts, cpu, memory, params, lower, upper)
+    scalar = np.array([
+        fallback_recommendation(int(c), float(x), float(m))["target_count"] for c, x, m in zip(counts, cpu, memory)
+    ])
+    return int(np.sum(vector != scalar))
+
+
+def simulate(traces: List[Trace], policies: List[Dict[str, Any]], step: float,
+             apply_sec: float, warmup_sec: float, saturation: float = 100.0) -> Dict[str, Any]:
+    """
+    Replay every trace under every policy at once.
+
+    Model per lane:
+    - the scheduler evaluates every interval_sec using the utilisation the
+      serving (warm) instances would report
+    - one terraform apply at a time, taking apply_sec; the cooldown runs from
+      its completion, like last_scaled_ts in scale_stack
+    - instances added by a scale-up serve only after warmup_sec
+    - scale-down removes warming instances first
+
+    Returns:
+        {"lanes": [...], "policies": [...]} with under-provisioned minutes,
+        over-provisioned / total instance-hours and applies
+    """
+    traces = [trace.resample(step) for trace in traces]
+    length = max(len(trace.ts) for trace in traces)
+    n_traces, n_policies = len(traces), len(policies)
+    lanes = n_traces * n_policies
+    lower, upper = settings.SCALE_DOWN_MIN_INSTANCES, settings.SCALE_UP_MAX_INSTANCES
+
+    # (lane, time) demand; lanes are trace-major, padded with NaN past each trace's end
+    cpu_demand = np.full((n_traces, length), np.nan)
+    memory_demand = np.full((n_traces, length), np.nan)
+    for i, trace in enumerate(traces):
+        cpu_demand[i, :len(trace.ts)] = trace.cpu_demand
+        memory_demand[i, :len(trace.ts)] = trace.memory_demand
+    cpu_demand = np.repeat(cpu_demand, n_policies, axis=0)
+    memory_demand = np.repeat(memory_demand, n_policies, axis=0)
+
+    def per_lane(key, dtype=float):
+        return np.tile(np.array([policy[key] for policy in policies], dtype=dtype), n_traces)
+
+    params = {key: per_lane(key) for key in (
+        "scale_up_cpu", "scale_up_memory", "scale_down_cpu", "scale_down_memory", "margin"
+    )}
+    params["single"] = per_lane("step_mode", dtype=object) == "single"
+    interval_steps = np.maximum(1, np.round(per_lane("interval_sec") / step)).astype(int)
+    cooldown_up = np.ceil(per_lane("cooldown_up_sec") / step)
+    cooldown_down = np.ceil(per_lane("cooldown_down_sec") / step)
+    apply_steps = max(1, int(np.ceil(apply_sec / step)))
+    warmup_steps = int(np.ceil(warmup_sec / step))
+
+    provisioned = np.clip(np.repeat([t.initial_count for t in traces], n_policies), lower, upper).astype(int)
+    warming = np.zeros(lanes, dtype=int)
+    warm_ready = np.zeros(lanes, dtype=int)
+    apply_end = np.full(lanes, -1)
+    apply_target = provisioned.copy()
+    last_scaled = np.full(lanes, -10 ** 9)
+
+    under_steps = np.zeros(lanes)
+    over_instance_steps = np.zeros(lanes)
+    instance_steps = np.zeros(lanes)
+    applies = np.zeros(lanes, dtype=int)
+    peak = provisioned.copy()
+
+    for t in range(length):
+        warming[warm_ready <= t] = 0
+
+        done = apply_end == t
+        if done.any():
+            delta = apply_target[done] - provisioned[done]
+            added = np.maximum(delta, 0)
+            removed_warm = np.minimum(warming[done], np.maximum(-delta, 0))
+            warming[done] = warming[done] - removed_warm + added
+            warm_ready[done] = np.where(added > 0, t + warmup_steps, warm_ready[done])
+            provisioned[done] = apply_target[done]
+            last_scaled[done] = t
+            apply_end[done] = -1
+            if warmup_steps == 0:
+                warming[done] = 0
+
+        active = ~np.isnan(cpu_demand[:, t])
+        serving = np.maximum(provisioned - warming, 1)
+        cpu_load = np.nan_to_num(cpu_demand[:, t]) * 100.0 / serving
+        memory_load = np.nan_to_num(memory_demand[:, t]) * 100.0 / serving
+
+        under_steps += active & ((cpu_load > saturation) | (memory_load > saturation))
+        ideal = np.clip(np.ceil(np.maximum(
+            np.nan_to_num(cpu_demand[:, t]) * 100.0 / settings.PREDICTIVE_TARGET_CPU_PERCENT,
+            np.nan_to_num(memory_demand[:, t]) * 100.0 / settings.PREDICTIVE_TARGET_MEMORY_PERCENT
+        )), lower, upper)
+        over_instance_steps += np.where(active, np.maximum(provisioned - ideal, 0), 0)
+        instance_steps += np.where(active, provisioned, 0)
+
+        evaluate = active & (t % interval_steps == 0) & (apply_end < 0)
+        if not evaluate.any():
+            continue
+        idx = np.flatnonzero(evaluate)
+        lane_params = {key: value[idx] for key, value in params.items()}
+        target = decide_targets(
+            provisioned[idx], np.minimum(cpu_load[idx], 100.0), np.minimum(memory_load[idx], 100.0),
+            lane_params, lower, upper
+        )
+        cooldown = np.where(target > provisioned[idx], cooldown_up[idx], cooldown_down[idx])
+        start = (target != provisioned[idx]) & (t - last_scaled[idx] >= cooldown)
+        idx = idx[start]
+        apply_end[idx] = t + apply_steps
+        apply_target[idx] = target[start]
+        applies[idx] += 1
+        peak[idx] = np.maximum(peak[idx], target[start])
+
+    minutes, hours = step / 60.0, step / 3600.0
+    lane_results = []
+    for lane in range(lanes):
+        lane_results.append({
+            "trace": traces[lane // n_policies].name,
+            "policy": lane % n_policies,
+            "under_provisioned_min": round(float(under_steps[lane] * minutes), 1),
+            "over_provisioned_instance_h": round(float(over_instance_steps[lane] * hours), 2),
+            "instance_h": round(float(instance_steps[lane] * hours), 2),
+            "applies": int(applies[lane]),
+            "peak_instances": int(peak[lane])
+        })
+
+    by_policy = []
+    shape = (n_traces, n_policies)
+    for p, policy in enumerate(policies):
+        by_policy.append({
+            "policy": p,
+            "params": policy,
+            "under_provisioned_min": round(float(under_steps.reshape(shape)[:, p].sum() * minutes), 1),
+            "over_provisioned_instance_h": round(float(over_instance_steps.reshape(shape)[:, p].sum() * hours), 2),
+            "instance_h": round(float(instance_steps.reshape(shape)[:, p].sum() * hours), 2),
+            "applies": int(applies.reshape(shape)[:, p].sum())
+        })
+    return {"lanes": lane_results, "policies": by_policy}
+
+
+def print_report(report: Dict[str, Any], top: int):
+    header = (f"{'#':>4} {'up cpu/mem':>11} {'down cpu/mem':>13} {'cd up/down(s)':>14} {'int(s)':>7} "
+              f"{'margin':>7} {'mode':>9} {'under(min)':>11} {'over(inst-h)':>13} {'inst-h':>9} {'applies':>8}")
+    print(header)
+    print("-" * len(header))
+    ranked = sorted(report["policies"], key=lambda r: (r["under_provisioned_min"], r["over_provisioned_instance_h"], r["applies"]))
+    for r in ranked[:top]:
+        p = r["params"]
+        print(f"{r['policy']:>4} {p['scale_up_cpu']:>5.0f}/{p['scale_up_memory']:<5.0f} "
+              f"{p['scale_down_cpu']:>6.0f}/{p['scale_down_memory']:<6.0f} "
+              f"{p['cooldown_up_sec']:>6.0f}/{p['cooldown_down_sec']:<7.0f} {p['interval_sec']:>7.0f} "
+              f"{p['margin']:>7.2f} {p['step_mode']:>9} {r['under_provisioned_min']:>11.1f} "
+              f"{r['over_provisioned_instance_h']:>13.2f} {r['instance_h']:>9.1f} {r['applies']:>8}")
+
+
+def _floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Offline backtest of scaling parameters on recorded metric traces")
+    parser.add_argument("--trace", action="append", default=[], help="CSV or range-query JSON export (repeatable)")
+    parser.add_argument("--archive", action="append", default=[], help="Stack id to load from the metrics archive (repeatable)")
+    parser.add_argument("--synthetic", type=int, default=0, help="Add N synthetic traces")
+    parser.add_argument("--hours", type=float, default=24.0, help="Synthetic / archive trace length")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--instances", type=int, default=2, help="Instance count for traces that do not record it")
+    parser.add_argument("--step", type=float, default=60.0, help="Simulation step in seconds")
+    parser.add_argument("--apply-sec", type=float, default=300.0, help="terraform apply duration")
+    parser.add_argument("--warmup-sec", type=float, default=120.0, help="New instance warm-up before it serves")
+    parser.add_argument("--saturation", type=float, default=100.0,
+                        help="Utilisation %% of serving instances counted as under-provisioned")
+    defaults = FALLBACK_THRESHOLDS
+    parser.add_argument("--up-cpu", type=_floats, default=[defaults["scale_up_cpu"]])
+    parser.add_argument("--up-memory", type=_floats, default=[defaults["scale_up_memory"]])
+    parser.add_argument("--down-cpu", type=_floats, default=[defaults["scale_down_cpu"]])
+    parser.add_argument("--down-memory", type=_floats, default=[defaults["scale_down_memory"]])
+    parser.add_argument("--cooldown-up", type=_floats, default=[settings.SCALE_UP_COOLDOWN_SEC])
+    parser.add_argument("--cooldown-down", type=_floats, default=[settings.SCALE_DOWN_COOLDOWN_SEC])
+    parser.add_argument("--interval", type=_floats, default=[settings.AUTO_SCALING_INTERVAL_MINUTES * 60.0],
+                        help="Scheduler evaluation interval(s) in seconds")
+    parser.add_argument("--margin", type=_floats, default=[settings.CAPACITY_SAFETY_MARGIN])
+    parser.add_argument("--step-mode", type=lambda v: [m.strip() for m in v.split(",") if m.strip()],
+                        default=["capacity"], help="capacity (jump to target) and/or single (+-1)")
+    parser.add_argument("--top", type=int, default=20, help="Policies to print")
+    parser.add_argument("--output", default=None, help="Write JSON report to this file")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check the vectorized rules against fallback_recommendation first")
+    args = parser.parse_args(argv)
+    for mode in args.step_mode:
+        if mode not in ("capacity", "single"):
+            parser.error(f"unknown step mode: {mode}")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    if args.verify:
+        mismatches = verify_against_fallback()
+        print(f"Vectorized rules vs fallback_recommendation: {mismatches} mismatch(es)")
+        if mismatches:
+            return 1
+
+    traces: List[Trace] = []
+    for path in args.trace:
+        traces.extend(load_trace_file(Path(path), args.instances))
+    end = time.time()
+    for stack_id in args.archive:
+        trace = load_archive_trace(stack_id, end - args.hours * 3600.0, end)
+        if trace is None:
+            print(f"Warning: no archived history for {stack_id}")
+        else:
+            traces.append(trace)
+    if args.synthetic:
+        traces.extend(synthetic_traces(args.synthetic, args.hours, args.step, args.seed))
+    if not traces:
+        print("No traces: use --trace, --archive or --synthetic")
+        return 1
+
+    policies = policy_grid(args)
+    started = time.perf_counter()
+    report = simulate(traces, policies, args.step, args.apply_sec, args.warmup_sec, args.saturation)
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(traces)} trace(s) x {len(policies)} policy(ies) simulated in {elapsed:.2f}s\n")
+    print_report(report, args.top)
+
+    if args.output:
+        report["config"] = {
+            "traces": [trace.name for trace in traces],
+            "step": args.step,
+            "apply_sec": args.apply_sec,
+            "warmup_sec": args.warmup_sec,
+            "saturation": args.saturation
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())